@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Load test of the Zoe API: measures the latency of cheap requests while other clients keep requesting the full execution list.
+
+Run it against a running Zoe API process, with a user that can see many executions, for example:
+
+    python3 scripts/api_load_test.py --url http://localhost:5001 --user admin --password admin --execution-id 1
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from zoe_lib.version import ZOE_API_VERSION  # pylint: disable=wrong-import-position
+
+
+def _percentile(samples, percent):
+    if len(samples) == 0:
+        return float('nan')
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+def _heavy_client(args, stop, counter):
+    session = requests.Session()
+    session.auth = (args.user, args.password)
+    while not stop.is_set():
+        session.get(args.url + '/api/' + ZOE_API_VERSION + '/execution')
+        counter.append(1)
+
+
+def _measure(args, path):
+    session = requests.Session()
+    session.auth = (args.user, args.password)
+    latencies = []
+    time_end = time.time() + args.duration
+    while time.time() < time_end:
+        time_start = time.time()
+        reply = session.get(args.url + '/api/' + ZOE_API_VERSION + path)
+        latencies.append(time.time() - time_start)
+        if reply.status_code != 200:
+            print('{} returned {}: {}'.format(path, reply.status_code, reply.text))
+            break
+        time.sleep(args.interval)
+    return latencies
+
+
+def main():
+    """The main entrypoint."""
+    parser = argparse.ArgumentParser(description='Zoe API load test')
+    parser.add_argument('--url', default='http://localhost:5001', help='Base URL of the Zoe API')
+    parser.add_argument('--user', required=True, help='User name')
+    parser.add_argument('--password', required=True, help='Password')
+    parser.add_argument('--execution-id', type=int, help='Execution used for the single execution requests')
+    parser.add_argument('--heavy-clients', type=int, default=8, help='Number of clients requesting the full execution list')
+    parser.add_argument('--duration', type=float, default=20, help='Duration of each measurement, in seconds')
+    parser.add_argument('--interval', type=float, default=0.05, help='Pause between two cheap requests, in seconds')
+    args = parser.parse_args()
+
+    cheap_paths = ['/info']
+    if args.execution_id is not None:
+        cheap_paths.append('/execution/{}'.format(args.execution_id))
+
+    for heavy_clients in [0, args.heavy_clients]:
+        stop = threading.Event()
+        counter = []
+        threads = [threading.Thread(target=_heavy_client, args=(args, stop, counter)) for _ in range(heavy_clients)]
+        for thread in threads:
+            thread.start()
+        for path in cheap_paths:
+            latencies = _measure(args, path)
+            print('{:<20} {:>2} heavy clients {:>6} requests p50 {:>8.1f} ms p99 {:>8.1f} ms max {:>8.1f} ms'.format(
+                path, heavy_clients, len(latencies), _percentile(latencies, 50) * 1000, _percentile(latencies, 99) * 1000, max(latencies, default=0) * 1000))
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if heavy_clients > 0:
+            print('{:<20} {:>6} full execution lists served'.format('', len(counter)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of the scheduler queue operations with many queued executions, without back-end and database.
+
+The list implementation reproduces the way the scheduler used a plain list: sorting it at every pass and checking that each examined
+execution is still in the queue with a linear search. It is quadratic in the queue length, run it with fewer executions, for example:
+
+    python3 scripts/queue_benchmark.py --executions 50000 --policy SIZE
+    python3 scripts/queue_benchmark.py --executions 5000 --policy SIZE --implementation list
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from zoe_lib.state import Execution  # pylint: disable=wrong-import-position
+from zoe_master.scheduler.execution_queue import ExecutionQueue  # pylint: disable=wrong-import-position
+
+
+class _ListQueue:
+    """The list based queue used by the scheduler before ExecutionQueue."""
+    def __init__(self, policy):
+        self.policy = policy
+        self.queue = []
+
+    def push(self, execution):
+        """Append to the list."""
+        self.queue.append(execution)
+
+    def remove(self, execution):
+        """Linear search and removal."""
+        try:
+            self.queue.remove(execution)
+        except ValueError:
+            return False
+        return True
+
+    def update(self, execution):
+        """The list is sorted again at the next pass."""
+
+    def __iter__(self):
+        if self.policy != 'FIFO':
+            self.queue.sort(key=lambda execution: execution.size)
+        return iter(list(self.queue))
+
+    def __contains__(self, execution):
+        return execution in self.queue
+
+
+def _executions(count):
+    executions = []
+    for exec_id in range(count):
+        executions.append(Execution({'id': exec_id, 'name': 'bench', 'user_id': 'bench', 'description': {}, 'status': Execution.SCHEDULED_STATUS,
+                                     'size': random.randint(1, 1000), 'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(),
+                                     'time_start': None, 'time_end': None, 'error_message': None}, None))
+    return executions
+
+
+def _timed(timings, name, func, *args):
+    time_start = time.time()
+    ret = func(*args)
+    timings[name] = timings.get(name, 0) + time.time() - time_start
+    return ret
+
+
+def _scheduling_pass(queue, examined, launched, examine_all):
+    """Examine the first executions in queue order, start some of them and check that the others are still queued."""
+    jobs = []
+    for execution in queue:
+        if len(jobs) == examined and not examine_all:
+            break  # the placement simulation stops at the first execution that does not fit
+        jobs.append(execution)
+    for execution in jobs[:launched]:
+        queue.remove(execution)
+    for execution in jobs[launched:]:
+        assert execution in queue
+
+
+def _dynsize_refresh(queue, executions):
+    for execution in executions:
+        execution.size -= random.random()
+        queue.update(execution)
+
+
+def main():
+    """The main entrypoint."""
+    parser = argparse.ArgumentParser(description='Zoe scheduler queue benchmark')
+    parser.add_argument('--executions', type=int, default=50000, help='Number of queued executions')
+    parser.add_argument('--policy', choices=['FIFO', 'SIZE', 'DYNSIZE'], default='SIZE', help='Scheduler policy')
+    parser.add_argument('--implementation', choices=['heap', 'list'], default='heap', help='Queue implementation')
+    parser.add_argument('--passes', type=int, default=10, help='Number of scheduling passes')
+    parser.add_argument('--examined', type=int, default=100, help='Executions examined at each pass')
+    parser.add_argument('--launched', type=int, default=20, help='Executions started at each pass')
+    parser.add_argument('--terminated', type=int, default=1000, help='Executions terminated by users while queued')
+    args = parser.parse_args()
+
+    random.seed(1)
+    executions = _executions(args.executions)
+    queue = ExecutionQueue(args.policy) if args.implementation == 'heap' else _ListQueue(args.policy)
+    examine_all = args.implementation == 'list'  # the list based scheduler locked and examined all the queued executions at each pass
+
+    timings = {}
+    for execution in executions:
+        _timed(timings, 'push', queue.push, execution)
+    for pass_ in range(args.passes):
+        if args.policy == 'DYNSIZE':
+            _timed(timings, 'size refresh', _dynsize_refresh, queue, executions)
+        _timed(timings, 'scheduling pass', _scheduling_pass, queue, args.examined, args.launched, examine_all)
+    for execution in random.sample(executions, args.terminated):
+        _timed(timings, 'terminate', queue.remove, execution)
+    _timed(timings, 'stats', lambda: [execution.id for execution in queue])
+
+    print('{} queue, {} executions, {} policy:'.format(args.implementation, args.executions, args.policy))
+    for name, elapsed in timings.items():
+        print('  {:<16} {:8.3f} s'.format(name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
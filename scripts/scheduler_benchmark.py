@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of a scheduler pass: the placement simulation of the elastic scheduler on a synthetic platform, without back-end and database.
+
+All the executions of the queue are placed on the simulated platform, as the scheduler does when the cluster is large enough. Run it on two
+versions of the code to compare them, for example:
+
+    python3 scripts/scheduler_benchmark.py --nodes 500 --services 5000 --services-per-execution 5
+"""
+
+import argparse
+from argparse import Namespace
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import zoe_lib.config as config  # pylint: disable=wrong-import-position
+from zoe_lib.state import Execution, Service  # pylint: disable=wrong-import-position
+from zoe_master.stats import ClusterStats, NodeStats  # pylint: disable=wrong-import-position
+from zoe_master.image_catalog import ImageCatalog  # pylint: disable=wrong-import-position
+import zoe_master.scheduler.simulated_platform as simulated_platform  # pylint: disable=wrong-import-position
+from zoe_master.scheduler.elastic_scheduler import simulate_placement  # pylint: disable=wrong-import-position
+
+IMAGES = [{'names': ['bench']}]
+
+
+class _NullTable:
+    """Elastic services record their simulated status, there is no database in the benchmark."""
+    def __init__(self):
+        self.updates = 0
+
+    def update(self, record_id, **kwargs):
+        """Count and discard the update."""
+        self.updates += 1
+
+
+class _NullState:
+    """Stands for the SQLManager used by the records."""
+    services = _NullTable()
+    executions = _NullTable()
+
+
+def _platform(nodes):
+    stats = ClusterStats()
+    for i in range(nodes):
+        node = NodeStats('node{}'.format(i))
+        node.status = 'online'
+        node.memory_total = 256 * 1024 ** 3
+        node.cores_total = 64
+        node.images = IMAGES
+        stats.nodes.append(node)
+    return stats
+
+
+def _executions(services, services_per_execution, elastic_per_execution):
+    state = _NullState()
+    executions = []
+    service_id = 0
+    for exec_id in range(services // services_per_execution):
+        execution = Execution({'id': exec_id, 'name': 'bench', 'user_id': 'bench', 'description': {}, 'status': Execution.SCHEDULED_STATUS,
+                               'size': 1, 'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(), 'time_start': None, 'time_end': None,
+                               'error_message': None}, state)
+        execution.prefetched_services = []
+        for i in range(services_per_execution):
+            description = {'image': 'bench', 'resources': {'memory': {'min': 1024 ** 3, 'max': 1024 ** 3}, 'cores': {'min': 1, 'max': 1}}}
+            execution.prefetched_services.append(Service({
+                'id': service_id, 'name': 's{}'.format(i), 'status': Service.CREATED_STATUS, 'error_message': None, 'execution_id': exec_id,
+                'description': description, 'service_group': 'bench', 'backend_id': None, 'backend_status': Service.BACKEND_UNDEFINED_STATUS,
+                'backend_host': None, 'ip_address': None, 'essential': i >= elastic_per_execution, 'restart_count': 0
+            }, state))
+            service_id += 1
+        executions.append(execution)
+    return executions
+
+
+def main():
+    """The main entrypoint."""
+    parser = argparse.ArgumentParser(description='Zoe scheduler pass benchmark')
+    parser.add_argument('--nodes', type=int, default=500, help='Number of nodes of the simulated platform')
+    parser.add_argument('--services', type=int, default=5000, help='Total number of services in the queue')
+    parser.add_argument('--services-per-execution', type=int, default=5, help='Number of services of each execution')
+    parser.add_argument('--elastic-per-execution', type=int, default=0, help='How many of the services of each execution are elastic')
+    parser.add_argument('--placement-policy', choices=['average', 'waterfill', 'random'], default='average', help='Placement policy')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of scheduler passes, the best time is reported')
+    args = parser.parse_args()
+
+    config.load_configuration(Namespace(placement_policy=args.placement_policy))
+
+    platform_state = _platform(args.nodes)
+    catalog = ImageCatalog()  # the catalog would be kept up to date by the back-end
+    for node in platform_state.nodes:
+        catalog.update_node(node.name, [name for image in node.images for name in image['names']])
+    simulated_platform.image_catalog = lambda: catalog
+    best = None
+    for repetition_ in range(args.repeat):
+        executions = _executions(args.services, args.services_per_execution, args.elastic_per_execution)
+        time_start = time.time()
+        snapshot = simulated_platform.SimulatedPlatform(platform_state)
+        launched = simulate_placement(snapshot, executions)
+        snapshot.save_elastic_marks()
+        elapsed = time.time() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print('{} nodes, {} executions, {} services: {} executions placed, {} service updates, best pass {:.3f} s'.format(
+        args.nodes, len(executions), args.services, len(launched), _NullState.services.updates // args.repeat, best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark of the state layer: reports the number of queries sent to the database (round trips) and the time for the common record operations.
+
+It uses the standard Zoe configuration options and DESTROYS the tables of the configured deployment, use a dedicated deployment name, for example:
+
+    python3 scripts/state_benchmark.py --deployment-name bench --dbhost localhost --dbuser zoe
+"""
+
+import os
+import sys
+import time
+
+import psycopg2.extras
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import zoe_lib.config as config  # pylint: disable=wrong-import-position
+from zoe_lib.state.sql_manager import SQLManager  # pylint: disable=wrong-import-position
+
+ITERATIONS = 500
+
+SERVICE_DESCRIPTION = {
+    'image': 'bench',
+    'monitor': True,
+    'startup_order': 0,
+    'environment': [],
+    'command': None,
+    'volumes': [],
+    'resources': {'memory': {'min': 1024, 'max': 1024}, 'cores': {'min': 1, 'max': 1}},
+    'ports': [{'name': 'port{}'.format(i), 'port_number': 8000 + i, 'protocol': 'tcp', 'url_template': 'http://{ip_port}/'} for i in range(3)]
+}
+
+_query_count = 0
+
+
+def _counting_execute(orig_execute):
+    def execute(self, query, args=None):
+        """Count the queries sent to the database."""
+        global _query_count
+        _query_count += 1
+        return orig_execute(self, query, args)
+    return execute
+
+
+def _measure(name, operation):
+    global _query_count
+    _query_count = 0
+    time_start = time.time()
+    for i in range(ITERATIONS):
+        operation(i)
+    elapsed = time.time() - time_start
+    print('{:<30} {:>8.2f} queries/op {:>8.3f} ms/op'.format(name, _query_count / ITERATIONS, elapsed * 1000 / ITERATIONS))
+
+
+def main():
+    """The main entrypoint."""
+    config.load_configuration()
+    state = SQLManager(config.get_conf())
+    state.init_db(force=True)
+
+    exec_id = state.executions.insert('bench', 'bench', {'name': 'bench', 'size': 1, 'services': []})
+    service_id = state.services.insert(exec_id, 'bench0', 'bench', SERVICE_DESCRIPTION, True)
+    for port in SERVICE_DESCRIPTION['ports']:
+        state.ports.insert(service_id, '{}/{}'.format(port['port_number'], port['protocol']), port)
+    service = state.services.select(only_one=True, id=service_id)
+    ports = {'{}/tcp'.format(8000 + i): 30000 + i for i in range(3)}
+
+    psycopg2.extras.DictCursor.execute = _counting_execute(psycopg2.extras.DictCursor.execute)
+
+    _measure('select execution by id', lambda i: state.executions.select(only_one=True, id=exec_id))
+    _measure('select services of execution', lambda i: state.services.select(execution_id=exec_id))
+    _measure('service status update', lambda i: service.set_starting())
+    _measure('service activation', lambda i: service.set_active('bench{}'.format(i), '10.0.0.1', ports))
+
+    state.init_db(force=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of the time needed to store the services and ports of a new execution, versus the ZApp size.
+
+It compares one INSERT and commit per row with the bulk insert path used by the master. It uses the standard Zoe configuration options and
+DESTROYS the tables of the configured deployment, use a dedicated deployment name, for example:
+
+    python3 scripts/submission_benchmark.py --deployment-name bench --dbhost localhost --dbuser zoe
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import zoe_lib.config as config  # pylint: disable=wrong-import-position
+from zoe_lib.state.sql_manager import SQLManager  # pylint: disable=wrong-import-position
+
+ZAPP_SIZES = [1, 10, 50, 200, 1000]
+PORTS_PER_SERVICE = 3
+
+SERVICE_DESCRIPTION = {
+    'name': 'worker',
+    'image': 'bench',
+    'monitor': False,
+    'startup_order': 0,
+    'environment': [],
+    'command': None,
+    'volumes': [],
+    'resources': {'memory': {'min': 1024, 'max': 1024}, 'cores': {'min': 1, 'max': 1}},
+    'ports': [{'name': 'port{}'.format(i), 'port_number': 8000 + i, 'protocol': 'tcp', 'url_template': 'http://{ip_port}/'} for i in range(PORTS_PER_SERVICE)]
+}
+
+
+def _row_by_row(state, exec_id, size):
+    for i in range(size):
+        sid = state.services.insert(exec_id, 'worker{}'.format(i), 'worker', SERVICE_DESCRIPTION, False)
+        for port in SERVICE_DESCRIPTION['ports']:
+            state.ports.insert(sid, '{}/{}'.format(port['port_number'], port['protocol']), port)
+
+
+def _bulk(state, exec_id, size):
+    with state.transaction():
+        service_ids = state.services.insert_many(exec_id, [('worker{}'.format(i), 'worker', SERVICE_DESCRIPTION, False) for i in range(size)])
+        ports = []
+        for sid in service_ids:
+            for port in SERVICE_DESCRIPTION['ports']:
+                ports.append((sid, '{}/{}'.format(port['port_number'], port['protocol']), port))
+        state.ports.insert_many(ports)
+
+
+def main():
+    """The main entrypoint."""
+    config.load_configuration()
+    state = SQLManager(config.get_conf())
+    state.init_db(force=True)
+
+    print('{:>10} {:>16} {:>16}'.format('services', 'row by row (ms)', 'bulk (ms)'))
+    for size in ZAPP_SIZES:
+        times = []
+        for method in [_row_by_row, _bulk]:
+            exec_id = state.executions.insert('bench', 'bench', {'name': 'bench', 'size': 1, 'services': [SERVICE_DESCRIPTION]})
+            time_start = time.time()
+            method(state, exec_id, size)
+            times.append((time.time() - time_start) * 1000)
+        print('{:>10} {:>16.1f} {:>16.1f}'.format(size, times[0], times[1]))
+
+    state.init_db(force=True)
+
+
+if __name__ == '__main__':
+    main()
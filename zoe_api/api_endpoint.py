@@ -15,6 +15,8 @@
 
 """The real API, exposed as web pages or REST API."""
 
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import logging
 import os
 from typing import Mapping
@@ -44,7 +46,8 @@ class APIEndpoint:
 
     def execution_by_id(self, uid, role, execution_id) -> zoe_lib.state.Execution:
         """Lookup an execution by its ID."""
-        e = self.sql.executions.select(id=execution_id, only_one=True)
+        with self.sql.replica_reads(uid):
+            e = self.sql.executions.select(id=execution_id, only_one=True)
         if e is None:
             raise zoe_api.exceptions.ZoeNotFoundException('No such execution')
         assert isinstance(e, zoe_lib.state.Execution)
@@ -56,16 +59,42 @@ class APIEndpoint:
         """Generate a optionally filtered list of executions."""
         if role != 'admin':
             filters['user_id'] = uid
-        execs = self.sql.executions.select(**filters)
+        with self.sql.replica_reads(uid):
+            execs = self.sql.executions.select(**filters)
         return execs
 
     def execution_count(self, uid: str, role: str, **filters: Mapping[str, str]):
         """Count the number of executions optionally filtered."""
         if role != 'admin':
             filters['user_id'] = uid
-        execs = self.sql.executions.count(**filters)
+        with self.sql.replica_reads(uid):
+            execs = self.sql.executions.count(**filters)
         return execs
 
+    def execution_count_by_status(self, uid: str, role: str, **filters: Mapping[str, str]):
+        """Count the executions in each status, optionally filtered."""
+        if role != 'admin':
+            filters['user_id'] = uid
+        with self.sql.replica_reads(uid):
+            return self.sql.executions.count_by_status(**filters)
+
+    def execution_reservations(self, uid: str, role: str, **filters: Mapping[str, str]):
+        """Sum the resources reserved by the executions optionally filtered."""
+        if role != 'admin':
+            filters['user_id'] = uid
+        with self.sql.replica_reads(uid):
+            return self.sql.executions.total_reservations(**filters)
+
+    def execution_latency_report(self, uid: str, role: str, group_by=None, **filters: Mapping[str, str]):
+        """Percentiles of the queueing and startup latencies of the executions optionally filtered, see ExecutionTable.latency_report()."""
+        if role != 'admin':
+            filters['user_id'] = uid
+        try:
+            with self.sql.replica_reads(uid):
+                return self.sql.executions.latency_report(group_by, **filters)
+        except ValueError as e:
+            raise zoe_api.exceptions.ZoeException(str(e))
+
     def zapp_validate(self, application_description):
         """Validates the passed ZApp description against the supported schema."""
         try:
@@ -82,15 +111,12 @@ class APIEndpoint:
 
         # quota check
         if role == "guest":
-            running_execs = self.execution_list(uid, role, **{'status': 'running'})
-            running_execs += self.execution_list(uid, role, **{'status': 'starting'})
-            running_execs += self.execution_list(uid, role, **{'status': 'scheduled'})
-            running_execs += self.execution_list(uid, role, **{'status': 'image download'})
-            running_execs += self.execution_list(uid, role, **{'status': 'submitted'})
-            if len(running_execs) >= GUEST_QUOTA_MAX_EXECUTIONS:
+            running_execs = self.execution_count(uid, role, status=['running', 'starting', 'scheduled', 'image download', 'submitted'])
+            if running_execs >= GUEST_QUOTA_MAX_EXECUTIONS:
                 raise zoe_api.exceptions.ZoeException('Guest users cannot run more than one execution at a time, quota exceeded.')
 
         new_id = self.sql.executions.insert(exec_name, uid, application_description)
+        self.sql.note_write(uid)
         success, message = self.master.execution_start(new_id)
         if not success:
             raise zoe_api.exceptions.ZoeException('The Zoe master is unavailable, execution will be submitted automatically when the master is back up ({}).'.format(message))
@@ -108,6 +134,7 @@ class APIEndpoint:
             raise zoe_api.exceptions.ZoeAuthException()
 
         if e.is_active:
+            self.sql.note_write(uid)
             return self.master.execution_terminate(exec_id)
         else:
             raise zoe_api.exceptions.ZoeException('Execution is not running')
@@ -128,6 +155,7 @@ class APIEndpoint:
         if e.is_active:
             raise zoe_api.exceptions.ZoeException('Cannot delete an active execution')
 
+        self.sql.note_write(uid)
         status, message = self.master.execution_delete(exec_id)
         if status:
             self.sql.executions.delete(exec_id)
@@ -137,18 +165,29 @@ class APIEndpoint:
 
     def service_by_id(self, uid, role, service_id) -> zoe_lib.state.Service:
         """Lookup a service by its ID."""
-        service = self.sql.services.select(id=service_id, only_one=True)
-        if service is None:
-            raise zoe_api.exceptions.ZoeNotFoundException('No such execution')
-        if service.user_id != uid and role != 'admin':
-            raise zoe_api.exceptions.ZoeAuthException()
+        with self.sql.replica_reads(uid):
+            service = self.sql.services.select(id=service_id, only_one=True)
+            if service is None:
+                raise zoe_api.exceptions.ZoeNotFoundException('No such execution')
+            if service.user_id != uid and role != 'admin':
+                raise zoe_api.exceptions.ZoeAuthException()
         return service
 
     def service_list(self, uid, role, **filters):
         """Generate a optionally filtered list of services."""
-        services = self.sql.services.select(**filters)
-        ret = [s for s in services if s.user_id == uid or role == 'admin']
-        return ret
+        if role != 'admin':
+            filters['user_id'] = uid
+        with self.sql.replica_reads(uid):
+            services = self.sql.services.select(**filters)
+        return services
+
+    def services_per_node(self, uid, role, nodes):
+        """List the services started on each of the given nodes, only the columns needed by the status page are loaded."""
+        if role != 'admin':
+            raise zoe_api.exceptions.ZoeAuthException()
+        columns = ('id', 'name', 'execution_id', 'essential', 'backend_status')
+        with self.sql.replica_reads(uid):
+            return {node: self.sql.services.select_columns(columns, backend_host=node, backend_status='started') for node in nodes}
 
     def service_logs(self, uid, role, service_id):
         """Retrieve the logs for the given service.
@@ -179,15 +218,46 @@ class APIEndpoint:
 
     def execution_endpoints(self, uid: str, role: str, execution: zoe_lib.state.Execution):
         """Return a list of the services and public endpoints available for a certain execution."""
-        services_info = []
+        if execution.user_id != uid and role != 'admin':
+            raise zoe_api.exceptions.ZoeAuthException()
+
+        with self.sql.replica_reads(uid):
+            services_info = self.sql.services.select(execution_id=execution.id, prefetch=('ports',))
         endpoints = []
-        for service in execution.services:
-            services_info.append(self.service_by_id(uid, role, service.id))
+        for service in services_info:
+            backend_ports = {p.internal_name: p for p in service.ports}
             for port in service.description['ports']:
                 port_key = str(port['port_number']) + "/" + port['protocol']
-                backend_port = self.sql.ports.select(only_one=True, service_id=service.id, internal_name=port_key)
+                backend_port = backend_ports.get(port_key)
                 if backend_port is not None and backend_port.external_ip is not None:
                     endpoint = port['url_template'].format(**{"ip_port": backend_port.external_ip + ":" + str(backend_port.external_port)})
                     endpoints.append((port['name'], endpoint))
 
         return services_info, endpoints
+
+
+class AsyncAPIEndpoint:
+    """
+    Non-blocking variant of the APIEndpoint class, used by the Tornado request handlers.
+
+    All the APIEndpoint methods are available and return a future: they run in a bounded thread pool, so that database queries and
+    requests to the master do not stall the IOLoop.
+    """
+    def __init__(self, api_endpoint: APIEndpoint, workers: int):
+        self.api = api_endpoint
+        self.executor = ThreadPoolExecutor(workers)
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if not callable(attr):  # the state handles belong to the thread that uses them, they must be reached only from the pool
+            raise AttributeError('{} is not an API method'.format(name))
+        return functools.partial(self.run, attr)
+
+    def run(self, func, *args, **kwargs):
+        """Run a blocking function in the thread pool, for example to serialize records that load other records from the database."""
+        return self.executor.submit(self._traced, func, *args, **kwargs)
+
+    def _traced(self, func, *args, **kwargs):
+        """Calls are traced one by one: the pool threads serve many requests and Python 3.4 has no context variables to follow a request."""
+        with self.api.sql.trace('API ' + getattr(func, '__name__', 'call')):
+            return func(*args, **kwargs)
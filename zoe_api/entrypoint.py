@@ -57,11 +57,11 @@ def zoe_web_main(test_conf=None) -> int:
         log.error("LDAP authentication requested, but 'pyldap' module not installed.")
         return 1
 
-    sql_manager = zoe_lib.state.SQLManager(config.get_conf())
+    sql_manager = zoe_lib.state.SQLManager(config.get_conf(), read_replica=True)
     sql_manager.init_db()
 
     master_api = zoe_api.master_api.APIManager()
-    api_endpoint = zoe_api.api_endpoint.APIEndpoint(master_api, sql_manager)
+    api_endpoint = zoe_api.api_endpoint.AsyncAPIEndpoint(zoe_api.api_endpoint.APIEndpoint(master_api, sql_manager), args.api_workers)
 
     app_settings = {
         'static_path': os.path.join(os.path.dirname(__file__), "web", "static"),
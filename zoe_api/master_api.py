@@ -16,6 +16,7 @@
 """The client side of the ZeroMQ API."""
 
 import logging
+import threading
 from typing import Dict, Any, Tuple
 
 import zmq
@@ -37,6 +38,7 @@ class APIManager:
         self.zmq_s = None
         self.poll = zmq.Poller()
         self.master_uri = config.get_conf().master_url  # type: str
+        self.lock = threading.Lock()  # ZeroMQ sockets cannot be shared between threads
         self._connect()
 
     def _connect(self):
@@ -56,6 +58,10 @@ class APIManager:
         """
         Implements the Lazy Pirate Pattern for a reliable client communication.
         """
+        with self.lock:
+            return self._request_reply_locked(message)
+
+    def _request_reply_locked(self, message: Dict[str, Any]) -> APIReturnType:
         self._connect()  # Make sure we are connected
         retries_left = self.REQUEST_RETRIES
         while retries_left:
@@ -16,8 +16,9 @@
 """The Discovery API endpoint."""
 
 from tornado.web import RequestHandler
+import tornado.gen
 
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.rest_api.utils import catch_exceptions, manage_cors_headers
 
 
@@ -26,7 +27,7 @@ class DiscoveryAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -38,13 +39,14 @@ class DiscoveryAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id: int, service_group: str):
         """HTTP GET method."""
-        self.api_endpoint.execution_by_id(0, 'admin', execution_id)
+        yield self.api_endpoint.execution_by_id(0, 'admin', execution_id)
         if service_group != 'all':
-            services = self.api_endpoint.service_list(0, 'admin', service_group=service_group, execution_id=execution_id)
+            services = yield self.api_endpoint.service_list(0, 'admin', service_group=service_group, execution_id=execution_id)
         else:
-            services = self.api_endpoint.service_list(0, 'admin', execution_id=execution_id)
+            services = yield self.api_endpoint.service_list(0, 'admin', execution_id=execution_id)
         ret = {
             'service_type': service_group,
             'execution_id': execution_id,
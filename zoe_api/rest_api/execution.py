@@ -17,10 +17,11 @@
 
 from tornado.web import RequestHandler
 import tornado.escape
+import tornado.gen
 
 from zoe_api.rest_api.utils import catch_exceptions, get_auth, manage_cors_headers
 import zoe_api.exceptions
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 
 
 class ExecutionAPI(RequestHandler):
@@ -28,7 +29,7 @@ class ExecutionAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -40,15 +41,18 @@ class ExecutionAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id):
         """GET a single execution by its ID."""
         uid, role = get_auth(self)
 
-        e = self.api_endpoint.execution_by_id(uid, role, execution_id)
+        e = yield self.api_endpoint.execution_by_id(uid, role, execution_id)
 
-        self.write(e.serialize())
+        ret = yield self.api_endpoint.run(e.serialize)
+        self.write(ret)
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def delete(self, execution_id: int):
         """
         Terminate an execution.
@@ -57,7 +61,7 @@ class ExecutionAPI(RequestHandler):
         """
         uid, role = get_auth(self)
 
-        success, message = self.api_endpoint.execution_terminate(uid, role, execution_id)
+        success, message = yield self.api_endpoint.execution_terminate(uid, role, execution_id)
         if not success:
             raise zoe_api.exceptions.ZoeRestAPIException(message, 400)
 
@@ -73,7 +77,7 @@ class ExecutionDeleteAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -86,6 +90,7 @@ class ExecutionDeleteAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def delete(self, execution_id: int):
         """
         Delete an execution.
@@ -94,7 +99,7 @@ class ExecutionDeleteAPI(RequestHandler):
         """
         uid, role = get_auth(self)
 
-        success, message = self.api_endpoint.execution_delete(uid, role, execution_id)
+        success, message = yield self.api_endpoint.execution_delete(uid, role, execution_id)
         if not success:
             raise zoe_api.exceptions.ZoeRestAPIException(message, 400)
 
@@ -110,7 +115,7 @@ class ExecutionCollectionAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -123,6 +128,7 @@ class ExecutionCollectionAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self):
         """
         Returns a list of all active executions.
@@ -133,6 +139,9 @@ class ExecutionCollectionAPI(RequestHandler):
         * name: execution mane
         * user_id: user_id owning the execution (admin only)
         * limit: limit the number of returned entries
+        * before_id: only executions with a smaller ID, the newest first, used with limit to get the next page
+        * after_id: only executions with a greater ID, the closest to after_id, used with limit to get the previous page
+        * include_archive: set to 1 to include also the executions moved to the archive tables
         * earlier_than_submit: all execution that where submitted earlier than this timestamp
         * earlier_than_start: all execution that started earlier than this timestamp
         * earlier_than_end: all execution that ended earlier than this timestamp
@@ -155,6 +164,9 @@ class ExecutionCollectionAPI(RequestHandler):
             ('name', str),
             ('user_id', str),
             ('limit', int),
+            ('before_id', int),
+            ('after_id', int),
+            ('include_archive', int),
             ('earlier_than_submit', int),
             ('earlier_than_start', int),
             ('earlier_than_end', int),
@@ -169,11 +181,15 @@ class ExecutionCollectionAPI(RequestHandler):
                 else:
                     filt_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
 
-        execs = self.api_endpoint.execution_list(uid, role, **filt_dict)
+        execs = yield self.api_endpoint.execution_list(uid, role, prefetch=('services',), **filt_dict)
 
-        self.write(dict([(e.id, e.serialize()) for e in execs]))
+        # long lists take a while to encode, do it out of the IOLoop
+        ret = yield self.api_endpoint.run(lambda: tornado.escape.json_encode(dict([(e.id, e.serialize()) for e in execs])))
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(ret)
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def post(self):
         """
         Starts an execution, given an application description. Takes a JSON object.
@@ -190,7 +206,7 @@ class ExecutionCollectionAPI(RequestHandler):
         application_description = data['application']
         exec_name = data['name']
 
-        new_id = self.api_endpoint.execution_start(uid, role, exec_name, application_description)
+        new_id = yield self.api_endpoint.execution_start(uid, role, exec_name, application_description)
 
         self.set_status(201)
         self.write({'execution_id': new_id})
@@ -205,7 +221,7 @@ class ExecutionEndpointsAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -218,6 +234,7 @@ class ExecutionEndpointsAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """
         Get a list of execution endpoints.
@@ -226,8 +243,8 @@ class ExecutionEndpointsAPI(RequestHandler):
         """
         uid, role = get_auth(self)
 
-        execution = self.api_endpoint.execution_by_id(uid, role, execution_id)
-        services_, endpoints = self.api_endpoint.execution_endpoints(uid, role, execution)
+        execution = yield self.api_endpoint.execution_by_id(uid, role, execution_id)
+        services_, endpoints = yield self.api_endpoint.execution_endpoints(uid, role, execution)
 
         self.write({'endpoints': endpoints})
 
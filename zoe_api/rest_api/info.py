@@ -18,7 +18,7 @@
 from tornado.web import RequestHandler
 
 from zoe_api.rest_api.utils import catch_exceptions, manage_cors_headers
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 
 from zoe_lib.config import get_conf
 from zoe_lib.version import ZOE_API_VERSION, ZOE_APPLICATION_FORMAT_VERSION, ZOE_VERSION
@@ -29,7 +29,7 @@ class InfoAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
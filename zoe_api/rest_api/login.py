@@ -17,7 +17,7 @@
 
 from tornado.web import RequestHandler
 from zoe_api.rest_api.utils import get_auth, catch_exceptions, manage_cors_headers
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 
 
 class LoginAPI(RequestHandler):
@@ -25,7 +25,7 @@ class LoginAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
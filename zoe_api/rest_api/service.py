@@ -23,7 +23,7 @@ import tornado.gen
 import tornado.iostream
 
 from zoe_api.rest_api.utils import catch_exceptions, get_auth, manage_cors_headers
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 
 log = logging.getLogger(__name__)
 
@@ -35,7 +35,7 @@ class ServiceAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -48,13 +48,15 @@ class ServiceAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, service_id):
         """HTTP GET method."""
         uid, role = get_auth(self)
 
-        service = self.api_endpoint.service_by_id(uid, role, service_id)
+        service = yield self.api_endpoint.service_by_id(uid, role, service_id)
 
-        self.write(service.serialize())
+        ret = yield self.api_endpoint.run(service.serialize)
+        self.write(ret)
 
     def data_received(self, chunk):
         """Not implemented as we do not use stream uploads"""
@@ -66,7 +68,7 @@ class ServiceLogsAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
         self.connection_closed = False
         self.service_id = None
         self.stream = None
@@ -95,7 +97,7 @@ class ServiceLogsAPI(RequestHandler):
 
         uid, role = get_auth(self)
 
-        log_obj = self.api_endpoint.service_logs(uid, role, service_id)
+        log_obj = yield self.api_endpoint.service_logs(uid, role, service_id)
 
         while not self.connection_closed:
             try:
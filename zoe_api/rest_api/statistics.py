@@ -16,9 +16,10 @@
 """The Scheduler Statistics API endpoint."""
 
 from tornado.web import RequestHandler
+import tornado.gen
 
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
-from zoe_api.rest_api.utils import catch_exceptions, manage_cors_headers
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
+from zoe_api.rest_api.utils import catch_exceptions, get_auth, manage_cors_headers
 
 
 class SchedulerStatsAPI(RequestHandler):
@@ -26,7 +27,7 @@ class SchedulerStatsAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -39,11 +40,78 @@ class SchedulerStatsAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self):
         """HTTP GET method."""
-        statistics = self.api_endpoint.statistics_scheduler(0, 'guest')
+        statistics = yield self.api_endpoint.statistics_scheduler(0, 'guest')
         self.write(statistics)
 
     def data_received(self, chunk):
         """Not implemented as we do not use stream uploads"""
         pass
+
+
+class ExecutionLatencyStatsAPI(RequestHandler):
+    """The Execution Latency Statistics API endpoint."""
+
+    def initialize(self, **kwargs):
+        """Initializes the request handler."""
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
+
+    def set_default_headers(self):
+        """Set up the headers for enabling CORS."""
+        manage_cors_headers(self)
+
+    @catch_exceptions
+    def options(self):
+        """Needed for CORS."""
+        self.set_status(204)
+        self.finish()
+
+    @catch_exceptions
+    @tornado.gen.coroutine
+    def get(self):
+        """
+        Returns the percentiles of the queue wait (scheduled to starting), start latency (starting to running) and total latency
+        (submitted to running) of the executions of the calling user, of all users if the user is admin.
+
+        The following arguments are supported:
+
+        * group_by: one of zapp, user, hour, day, week (time windows are by submission time), by default there is a single group
+        * name: only executions with this name
+        * user_id: only executions owned by this user (admin only)
+        * include_archive: set to 1 to include also the executions moved to the archive tables
+        * earlier_than_submit: only executions that where submitted earlier than this timestamp
+        * later_than_submit: only executions that where submitted later than this timestamp
+
+        All timestamps should be passed as number of seconds since the epoch (UTC timezone).
+
+        example:  curl -u 'username:password' -X GET 'http://bf5:8080/api/0.6/statistics/execution_latency?group_by=zapp&later_than_submit=1514764800'
+
+        :return: a list with one entry per group
+        """
+        uid, role = get_auth(self)
+
+        filt_dict = {}
+
+        filters = [
+            ('group_by', str),
+            ('name', str),
+            ('user_id', str),
+            ('include_archive', int),
+            ('earlier_than_submit', int),
+            ('later_than_submit', int)
+        ]
+        for filt in filters:
+            if filt[0] in self.request.arguments:
+                if filt[1] == str:
+                    filt_dict[filt[0]] = self.request.arguments[filt[0]][0].decode('utf-8')
+                else:
+                    filt_dict[filt[0]] = filt[1](self.request.arguments[filt[0]][0])
+
+        report = yield self.api_endpoint.execution_latency_report(uid, role, **filt_dict)
+        self.write({'report': report})
+
+    def data_received(self, chunk):
+        """Not implemented as we do not use stream uploads"""
+        pass
@@ -19,6 +19,7 @@ import base64
 import logging
 import functools
 
+import tornado.gen
 import tornado.web
 
 from zoe_lib.config import get_conf
@@ -37,34 +38,51 @@ def catch_exceptions(func):
     :param func:
     :return:
     """
+    if tornado.gen.is_coroutine_function(func):
+        @functools.wraps(func)
+        @tornado.gen.coroutine
+        def coroutine_wrapper(*args, **kwargs):
+            """The actual decorator, for coroutines."""
+            try:
+                yield func(*args, **kwargs)
+            except Exception as e:
+                _handle_exception(args[0], e)
+
+        return coroutine_wrapper
+
     @functools.wraps(func)
     def func_wrapper(*args, **kwargs):
         """The actual decorator."""
-        self = args[0]
         try:
             return func(*args, **kwargs)
-        except ZoeRestAPIException as e:
-            if e.status_code != 401:
-                log.exception(e.message)
-            self.set_status(e.status_code)
-            self.write({'message': e.message})
-        except ZoeNotFoundException as e:
-            self.set_status(404)
-            self.write({'message': e.message})
-        except ZoeAuthException as e:
-            self.set_status(401)
-            self.write({'message': e.message})
-        except ZoeException as e:
-            self.set_status(400)
-            self.write({'message': e.message})
         except Exception as e:
-            self.set_status(500)
-            log.exception(str(e))
-            self.write({'message': str(e)})
+            _handle_exception(args[0], e)
 
     return func_wrapper
 
 
+def _handle_exception(handler: tornado.web.RequestHandler, e: Exception):
+    """Translate an exception into an HTTP error reply."""
+    if isinstance(e, ZoeRestAPIException):
+        if e.status_code != 401:
+            log.exception(e.message)
+        handler.set_status(e.status_code)
+        handler.write({'message': e.message})
+    elif isinstance(e, ZoeNotFoundException):
+        handler.set_status(404)
+        handler.write({'message': e.message})
+    elif isinstance(e, ZoeAuthException):
+        handler.set_status(401)
+        handler.write({'message': e.message})
+    elif isinstance(e, ZoeException):
+        handler.set_status(400)
+        handler.write({'message': e.message})
+    else:
+        handler.set_status(500)
+        log.exception(str(e))
+        handler.write({'message': str(e)})
+
+
 def get_auth(handler: tornado.web.RequestHandler):
     """Try to authenticate a request."""
     if handler.get_secure_cookie('zoe'):
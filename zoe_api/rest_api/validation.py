@@ -17,9 +17,10 @@
 
 from tornado.web import RequestHandler
 import tornado.escape
+import tornado.gen
 
 from zoe_api.rest_api.utils import catch_exceptions, manage_cors_headers
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 import zoe_api.exceptions
 
 
@@ -28,7 +29,7 @@ class ZAppValidateAPI(RequestHandler):
 
     def initialize(self, **kwargs):
         """Initializes the request handler."""
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     def set_default_headers(self):
         """Set up the headers for enabling CORS."""
@@ -40,6 +41,7 @@ class ZAppValidateAPI(RequestHandler):
         self.finish()
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def post(self):
         """HTTP GET method."""
         try:
@@ -49,7 +51,7 @@ class ZAppValidateAPI(RequestHandler):
 
         application_description = data['application']
 
-        self.api_endpoint.zapp_validate(application_description)
+        yield self.api_endpoint.zapp_validate(application_description)
 
         self.write({'validation': 'ok'})
 
@@ -15,12 +15,32 @@
 
 """Test module for the API endpoint."""
 
+import datetime
+
 import pytest
 
 from zoe_api.api_endpoint import APIEndpoint
 from zoe_api.exceptions import ZoeException
 from zoe_api.tests.mock_master_api import MockAPIManager
-from zoe_lib.state.tests.mock_sql_manager import MockSQLManager
+from zoe_lib.state import Execution, Service
+from zoe_lib.state.tests.mock_sql_manager import MockSQLManager, MockTablesSQLManager
+from zoe_lib.state.tests.query_count import assert_query_count
+
+
+def _tables(count):
+    """Executions of the user 'test', each one with two services."""
+    executions = []
+    services = []
+    for exec_id in range(count):
+        executions.append({'id': exec_id, 'name': 'test', 'user_id': 'test', 'description': {}, 'status': Execution.RUNNING_STATUS, 'size': 1,
+                           'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(), 'time_start': None, 'time_end': None,
+                           'error_message': None})
+        for i in range(2):
+            services.append({'id': exec_id * 2 + i, 'name': 's{}'.format(i), 'status': Service.ACTIVE_STATUS, 'error_message': None,
+                             'execution_id': exec_id, 'description': {}, 'service_group': 'test', 'backend_id': None,
+                             'backend_status': Service.BACKEND_START_STATUS, 'backend_host': None, 'ip_address': None, 'essential': i == 0,
+                             'restart_count': 0})
+    return {'execution': executions, 'service': services, 'port': []}
 
 
 class TestAPIEndpoint:
@@ -47,3 +67,14 @@ class TestAPIEndpoint:
         else:
             ret = api.statistics_scheduler('nouser', 'norole')
             assert isinstance(ret, dict)
+
+    @pytest.mark.parametrize('count', [5, 50])
+    def test_listing_query_count(self, count):
+        """The execution and service listings of a user run the same number of queries whatever the number of executions."""
+        api = APIEndpoint(MockAPIManager(), MockTablesSQLManager(_tables(count)))
+        with assert_query_count(2):
+            executions = api.execution_list('test', 'user', prefetch=('services',))
+            assert sum(len(e.serialize()['services']) for e in executions) == count * 2
+        with assert_query_count(2):
+            services = api.service_list('test', 'user', prefetch=('ports',))
+            assert len([s.serialize() for s in services]) == count * 2
@@ -17,14 +17,15 @@
 
 import datetime
 import json
-import math
 import time
 
+import tornado.gen
+
 from zoe_lib.config import get_conf
 
 import zoe_api.exceptions
 from zoe_api.web.utils import get_auth, catch_exceptions
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.web.custom_request_handler import ZoeRequestHandler
 
 
@@ -33,9 +34,10 @@ class ExecutionStartWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def post(self):
         """Start an execution."""
         uid, role = get_auth(self)
@@ -47,7 +49,7 @@ class ExecutionStartWeb(ZoeRequestHandler):
         app_descr = json.loads(app_descr_json)
         exec_name = self.get_argument('exec_name')
 
-        new_id = self.api_endpoint.execution_start(uid, role, exec_name, app_descr)
+        new_id = yield self.api_endpoint.execution_start(uid, role, exec_name, app_descr)
 
         self.redirect(self.reverse_url('execution_inspect', new_id))
 
@@ -59,9 +61,10 @@ class ExecutionListWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, page=0):
         """Home page with authentication."""
         uid, role = get_auth(self)
@@ -69,17 +72,33 @@ class ExecutionListWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        page = int(page)
-        executions_count = self.api_endpoint.execution_count(uid, role)
-        executions = self.api_endpoint.execution_list(uid, role, base=page*self.PAGINATION_ITEM_COUNT, limit=self.PAGINATION_ITEM_COUNT)
+        page_size = self.PAGINATION_ITEM_COUNT
+        before_id = self.get_argument('before_id', None)
+        after_id = self.get_argument('after_id', None)
+        executions_count = yield self.api_endpoint.execution_count(uid, role, approximate=True)
+        if before_id is not None:
+            executions = yield self.api_endpoint.execution_list(uid, role, before_id=int(before_id), limit=page_size + 1)
+            has_newer = True
+            has_older = len(executions) > page_size
+            executions = executions[:page_size]
+        elif after_id is not None:
+            executions = yield self.api_endpoint.execution_list(uid, role, after_id=int(after_id), limit=page_size + 1)
+            has_newer = len(executions) > page_size
+            has_older = True
+            executions = executions[-page_size:]
+        else:  # old-style page number, uses an offset
+            executions = yield self.api_endpoint.execution_list(uid, role, base=int(page) * page_size, limit=page_size + 1)
+            has_newer = int(page) > 0
+            has_older = len(executions) > page_size
+            executions = executions[:page_size]
 
         template_vars = {
             "uid": uid,
             "role": role,
-            'executions': sorted(executions, key=lambda e: e.id, reverse=True),
-            'current_page': page,
-            'max_page': math.ceil(executions_count / self.PAGINATION_ITEM_COUNT),
-            'last_page': len(executions) < self.PAGINATION_ITEM_COUNT
+            'executions': executions,
+            'executions_count': executions_count,
+            'newer_id': executions[0].id if has_newer and len(executions) > 0 else None,
+            'older_id': executions[-1].id if has_older and len(executions) > 0 else None
         }
         self.render('execution_list.html', **template_vars)
 
@@ -89,9 +108,10 @@ class ExecutionRestartWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """Restart an already defined (and not running) execution."""
         uid, role = get_auth(self)
@@ -99,8 +119,8 @@ class ExecutionRestartWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        e = self.api_endpoint.execution_by_id(uid, role, execution_id)
-        new_id = self.api_endpoint.execution_start(uid, role, e.name, e.description)
+        e = yield self.api_endpoint.execution_by_id(uid, role, execution_id)
+        new_id = yield self.api_endpoint.execution_start(uid, role, e.name, e.description)
 
         self.redirect(self.reverse_url('execution_inspect', new_id))
 
@@ -110,9 +130,10 @@ class ExecutionTerminateWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id: int):
         """Terminate an execution."""
         uid, role = get_auth(self)
@@ -120,7 +141,7 @@ class ExecutionTerminateWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        success, message = self.api_endpoint.execution_terminate(uid, role, execution_id)
+        success, message = yield self.api_endpoint.execution_terminate(uid, role, execution_id)
         if not success:
             raise zoe_api.exceptions.ZoeException(message)
 
@@ -132,9 +153,10 @@ class ExecutionInspectWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, execution_id):
         """Gather details about an execution."""
         uid, role = get_auth(self)
@@ -142,11 +164,9 @@ class ExecutionInspectWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        e = self.api_endpoint.execution_by_id(uid, role, execution_id)
-
-        services_info, endpoints = self.api_endpoint.execution_endpoints(uid, role, e)
+        e = yield self.api_endpoint.execution_by_id(uid, role, execution_id)
 
-        endpoints = self.api_endpoint.execution_endpoints(uid, role, e)[1]
+        services_info, endpoints = yield self.api_endpoint.execution_endpoints(uid, role, e)
 
         template_vars = {
             "uid": uid,
@@ -173,9 +193,10 @@ class ServiceLogsWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self, service_id):
         """Gather details about an execution."""
         uid, role = get_auth(self)
@@ -183,7 +204,7 @@ class ServiceLogsWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        service = self.api_endpoint.service_by_id(uid, role, service_id)
+        service = yield self.api_endpoint.service_by_id(uid, role, service_id)
 
         template_vars = {
             "uid": uid,
@@ -15,7 +15,9 @@
 
 """Main points of entry for the Zoe web interface."""
 
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+import tornado.gen
+
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.web.utils import get_auth_login, get_auth, catch_exceptions
 from zoe_api.web.custom_request_handler import ZoeRequestHandler
 
@@ -25,7 +27,7 @@ class RootWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self):
@@ -38,7 +40,7 @@ class LoginWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self):
@@ -63,7 +65,7 @@ class LogoutWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self):
@@ -77,9 +79,10 @@ class HomeWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self):
         """Home page with authentication."""
         uid, role = get_auth(self)
@@ -91,35 +94,16 @@ class HomeWeb(ZoeRequestHandler):
             "user_id": uid,
             "limit": 5
         }
-        last_executions = self.api_endpoint.execution_list(uid, role, **filters)
-
-        filters = {
-            "user_id": uid,
-            "status": "running"
-        }
-        last_running_executions = self.api_endpoint.execution_list(uid, role, **filters)
-
-        filters = {
-            "user_id": uid,
-            "status": "submitted"
-        }
-        last_running_executions += self.api_endpoint.execution_list(uid, role, **filters)
+        last_executions = yield self.api_endpoint.execution_list(uid, role, **filters)
 
         filters = {
             "user_id": uid,
-            "status": "scheduled"
+            "status": ["running", "submitted", "scheduled", "starting"]
         }
-        last_running_executions += self.api_endpoint.execution_list(uid, role, **filters)
-
-        filters = {
-            "user_id": uid,
-            "status": "starting"
-        }
-        last_running_executions += self.api_endpoint.execution_list(uid, role, **filters)
-
-        running_reservations = [e.total_reservations for e in last_running_executions]
-        total_memory = sum([r.memory.max for r in running_reservations])
-        total_cores = sum([r.cores.max for r in running_reservations])
+        last_running_executions = yield self.api_endpoint.execution_list(uid, role, **filters)
+        reservations = yield self.api_endpoint.execution_reservations(uid, role, **filters)
+        total_memory = reservations.memory.max
+        total_cores = reservations.cores.max
 
         template_vars = {
             "uid": uid,
@@ -15,7 +15,9 @@
 
 """Main points of entry for the Zoe web interface."""
 
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+import tornado.gen
+
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.web.utils import get_auth, catch_exceptions
 from zoe_api.web.custom_request_handler import ZoeRequestHandler
 from zoe_api.exceptions import ZoeException
@@ -26,9 +28,10 @@ class StatusEndpointWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def get(self):
         """Status and statistics page."""
         uid, role = get_auth(self)
@@ -36,22 +39,22 @@ class StatusEndpointWeb(ZoeRequestHandler):
             self.redirect(self.get_argument('next', u'/login'))
             return
 
-        stats = self.api_endpoint.statistics_scheduler(uid, role)
+        stats = yield self.api_endpoint.statistics_scheduler(uid, role)
         if stats is None:
             raise ZoeException('Cannot retrieve statistics from the Zoe master')
 
+        executions_by_status = yield self.api_endpoint.execution_count_by_status(uid, role)
+
         executions_in_queue = {}
-        for exec_id in stats['queue']:
-            executions_in_queue[exec_id] = self.api_endpoint.execution_by_id(uid, role, exec_id)
-        for exec_id in stats['running_queue']:
-            executions_in_queue[exec_id] = self.api_endpoint.execution_by_id(uid, role, exec_id)
+        executions = yield self.api_endpoint.execution_list(uid, role, id=stats['queue'] + stats['running_queue'], prefetch=('services',))
+        for execution in executions:
+            executions_in_queue[execution.id] = execution
 
-        services_per_node = {}
+        services_per_node = yield self.api_endpoint.services_per_node(uid, role, [node['name'] for node in stats['platform_stats']['nodes']])
         for node in stats['platform_stats']['nodes']:
-            services_per_node[node['name']] = self.api_endpoint.sql.services.select(backend_host=node['name'], backend_status='started')
             for service in services_per_node[node['name']]:
-                if service.id not in node['service_stats']:
-                    node['service_stats'][service.id] = {
+                if service['id'] not in node['service_stats']:
+                    node['service_stats'][service['id']] = {
                         'mem_limit': 0,
                         'core_limit': 0
                     }
@@ -63,6 +66,7 @@ class StatusEndpointWeb(ZoeRequestHandler):
             "role": role,
             "stats": stats,
             "executions_in_queue": executions_in_queue,
+            "executions_by_status": executions_by_status,
             "services_per_node": services_per_node,
             "max_service_count": max_service_count
         }
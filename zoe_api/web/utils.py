@@ -15,8 +15,11 @@
 
 """Functions needed by the Zoe web interface."""
 
+import functools
 import logging
 
+import tornado.gen
+
 from zoe_lib.config import get_conf
 
 from zoe_api.auth.base import BaseAuthenticator  # pylint: disable=unused-import
@@ -34,24 +37,42 @@ def catch_exceptions(func):
     :param func:
     :return:
     """
+    if tornado.gen.is_coroutine_function(func):
+        @functools.wraps(func)
+        @tornado.gen.coroutine
+        def coroutine_wrapper(*args, **kwargs):
+            """The actual decorator, for coroutines."""
+            try:
+                yield func(*args, **kwargs)
+            except Exception as e:
+                _handle_exception(args[0], e)
+
+        return coroutine_wrapper
+
+    @functools.wraps(func)
     def func_wrapper(*args, **kwargs):
         """The actual decorator."""
-        self = args[0]
         try:
             return func(*args, **kwargs)
-        except zoe_api.exceptions.ZoeAuthException:
-            return missing_auth(self)
-        except zoe_api.exceptions.ZoeNotFoundException as e:
-            return error_page(self, str(e), 404)
-        except zoe_api.exceptions.ZoeException as e:
-            return error_page(self, str(e), 400)
         except Exception as e:
-            log.exception(str(e))
-            return error_page(self, str(e), 500)
+            return _handle_exception(args[0], e)
 
     return func_wrapper
 
 
+def _handle_exception(handler: ZoeRequestHandler, e: Exception):
+    """Translate an exception into an error page."""
+    if isinstance(e, zoe_api.exceptions.ZoeAuthException):
+        return missing_auth(handler)
+    elif isinstance(e, zoe_api.exceptions.ZoeNotFoundException):
+        return error_page(handler, str(e), 404)
+    elif isinstance(e, zoe_api.exceptions.ZoeException):
+        return error_page(handler, str(e), 400)
+    else:
+        log.exception(str(e))
+        return error_page(handler, str(e), 500)
+
+
 def missing_auth(handler: ZoeRequestHandler):
     """Redirect to login page."""
     handler.redirect(handler.get_argument('next', u'/login'))
@@ -24,7 +24,7 @@ import tornado.iostream
 import tornado.gen
 
 import zoe_api.exceptions
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.web.utils import get_auth, catch_exceptions
 
 log = logging.getLogger(__name__)
@@ -37,7 +37,7 @@ class WebSocketEndpointWeb(tornado.websocket.WebSocketHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize()
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
         self.uid = None
         self.role = None
         self.connection_closed = None
@@ -65,7 +65,7 @@ class WebSocketEndpointWeb(tornado.websocket.WebSocketHandler):
 
         if request['command'] == 'query_status':
             try:
-                execution = self.api_endpoint.execution_by_id(self.uid, self.role, request['exec_id'])
+                execution = yield self.api_endpoint.execution_by_id(self.uid, self.role, request['exec_id'])
             except zoe_api.exceptions.ZoeNotFoundException:
                 response = {
                     'status': 'ok',
@@ -77,13 +77,13 @@ class WebSocketEndpointWeb(tornado.websocket.WebSocketHandler):
                     'exec_status': execution.status
                 }
                 if execution.status == execution.RUNNING_STATUS:
-                    services_info_, endpoints = self.api_endpoint.execution_endpoints(self.uid, self.role, execution)
+                    services_info_, endpoints = yield self.api_endpoint.execution_endpoints(self.uid, self.role, execution)
                     response['endpoints'] = endpoints
                 elif execution.status == execution.ERROR_STATUS or execution.status == execution.TERMINATED_STATUS:
-                    self.api_endpoint.execution_delete(self.uid, self.role, execution.id)
+                    yield self.api_endpoint.execution_delete(self.uid, self.role, execution.id)
             self.write_message(response)
         elif request['command'] == 'service_logs':
-            log_obj = self.api_endpoint.service_logs(self.uid, self.role, request['service_id'])
+            log_obj = yield self.api_endpoint.service_logs(self.uid, self.role, request['service_id'])
 
             while not self.connection_closed:
                 try:
@@ -94,7 +94,7 @@ class WebSocketEndpointWeb(tornado.websocket.WebSocketHandler):
 
                 self.write_message(log_line)
         elif request['command'] == 'system_status':
-            stats = self.api_endpoint.statistics_scheduler(self.uid, self.role)
+            stats = yield self.api_endpoint.statistics_scheduler(self.uid, self.role)
             self.write_message(json.dumps(stats))
         else:
             response = {
@@ -18,9 +18,10 @@
 import logging
 
 from tornado.web import MissingArgumentError
+import tornado.gen
 
 from zoe_api import zapp_shop
-from zoe_api.api_endpoint import APIEndpoint  # pylint: disable=unused-import
+from zoe_api.api_endpoint import AsyncAPIEndpoint  # pylint: disable=unused-import
 from zoe_api.web.utils import get_auth, catch_exceptions
 from zoe_api.web.custom_request_handler import ZoeRequestHandler
 from zoe_lib.config import get_conf
@@ -33,7 +34,7 @@ class ZAppShopHomeWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self):
@@ -58,7 +59,7 @@ class ZAppLogoWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self, zapp_id):
@@ -82,7 +83,7 @@ class ZAppStartWeb(ZoeRequestHandler):
     def initialize(self, **kwargs):
         """Initializes the request handler."""
         super().initialize(**kwargs)
-        self.api_endpoint = kwargs['api_endpoint']  # type: APIEndpoint
+        self.api_endpoint = kwargs['api_endpoint']  # type: AsyncAPIEndpoint
 
     @catch_exceptions
     def get(self, zapp_id):
@@ -109,6 +110,7 @@ class ZAppStartWeb(ZoeRequestHandler):
         self.render('zapp_start.html', **template_vars)
 
     @catch_exceptions
+    @tornado.gen.coroutine
     def post(self, zapp_id):
         """Write the parameters in the description and start the ZApp."""
         uid, role = get_auth(self)
@@ -133,7 +135,7 @@ class ZAppStartWeb(ZoeRequestHandler):
             self.finish()
             return
         except MissingArgumentError:
-            new_id = self.api_endpoint.execution_start(uid, role, exec_name, app_descr)
+            new_id = yield self.api_endpoint.execution_start(uid, role, exec_name, app_descr)
 
         self.redirect(self.reverse_url('execution_inspect', new_id))
 
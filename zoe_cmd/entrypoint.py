@@ -91,6 +91,9 @@ def exec_list_cmd(auth, args):
         'status',
         'name',
         'limit',
+        'before_id',
+        'after_id',
+        'include_archive',
         'earlier_than_submit',
         'earlier_than_start',
         'earlier_than_end',
@@ -248,6 +251,9 @@ def process_arguments() -> Tuple[ArgumentParser, Namespace]:
 
     argparser_app_list = subparser.add_parser('exec-ls', help="List all executions for the calling user")
     argparser_app_list.add_argument('--limit', type=int, help='Limit the number of executions')
+    argparser_app_list.add_argument('--before-id', type=int, help='Show only executions older than this execution ID, to get the next page with --limit')
+    argparser_app_list.add_argument('--after-id', type=int, help='Show only executions newer than this execution ID, to get the previous page with --limit')
+    argparser_app_list.add_argument('--include-archive', action='store_const', const=1, help='Show also the executions moved to the archive tables')
     argparser_app_list.add_argument('--name', help='Show only executions with this name')
     argparser_app_list.add_argument('--status', choices=["submitted", "scheduled", "starting", "error", "running", "cleaning up", "terminated"], help='Show only executions with this status')
     argparser_app_list.add_argument('--earlier-than-submit', help='Show only executions submitted earlier than this timestamp (seconds since UTC epoch)')
@@ -32,6 +32,7 @@ from zoe_lib.info import ZoeInfoAPI
 from zoe_lib.exceptions import ZoeAPIException, InvalidApplicationDescription
 from zoe_lib.executions import ZoeExecutionsAPI
 from zoe_lib.services import ZoeServiceAPI
+from zoe_lib.statistics import ZoeStatisticsAPI
 from zoe_lib.applications import app_validate
 from zoe_lib.version import ZOE_API_VERSION
 
@@ -65,6 +66,9 @@ def exec_list_cmd(auth, args):
         'name',
         'user_id',
         'limit',
+        'before_id',
+        'after_id',
+        'include_archive',
         'earlier_than_submit',
         'earlier_than_start',
         'earlier_than_end',
@@ -149,6 +153,37 @@ def exec_kill_user_cmd(auth, args):
         print('Execution {} terminated'.format(execution))
 
 
+def latency_report_cmd(auth, args):
+    """Print the percentiles of the queueing and startup latencies of the executions."""
+    stats_api = ZoeStatisticsAPI(auth['url'], auth['user'], auth['pass'])
+    filters = {
+        'group_by': args.group_by,
+        'user_id': args.user_id,
+        'include_archive': args.include_archive,
+        'later_than_submit': args.later_than_submit,
+        'earlier_than_submit': args.earlier_than_submit
+    }
+    report = stats_api.execution_latency(**filters)
+
+    def _fmt(latency, percentile):
+        value = latency['percentiles'][percentile]
+        return '-' if value is None else '{:.1f}'.format(value)
+
+    tabular_data = []
+    for entry in report:
+        group = entry['group']
+        if args.group_by in ('hour', 'day', 'week'):
+            group = datetime.fromtimestamp(group, timezone.utc).strftime('%Y-%m-%d %H:%M')
+        row = [group, entry['executions']]
+        for latency in ('queue_wait', 'start_latency', 'total'):
+            row += [_fmt(entry[latency], p) for p in ('50', '90', '99')]
+        tabular_data.append(row)
+    headers = [args.group_by or '', 'Executions',
+               'Queue p50', 'Queue p90', 'Queue p99', 'Start p50', 'Start p90', 'Start p99', 'Total p50', 'Total p90', 'Total p99']
+    print('Latencies in seconds: queue is scheduled to starting, start is starting to running, total is submitted to running')
+    print(tabulate(tabular_data, headers))
+
+
 ENV_HELP_TEXT = '''To authenticate with Zoe you need to define three environment variables:
 ZOE_URL: point to the URL of the Zoe Scheduler (ex.: http://localhost:5000/
 ZOE_USER: the username used for authentication
@@ -179,6 +214,9 @@ def process_arguments() -> Tuple[ArgumentParser, Namespace]:
     # executions
     argparser_app_list = subparser.add_parser('exec-ls', help="List all executions for the calling user")
     argparser_app_list.add_argument('--limit', type=int, help='Limit the number of executions')
+    argparser_app_list.add_argument('--before-id', type=int, help='Show only executions older than this execution ID, to get the next page with --limit')
+    argparser_app_list.add_argument('--after-id', type=int, help='Show only executions newer than this execution ID, to get the previous page with --limit')
+    argparser_app_list.add_argument('--include-archive', action='store_const', const=1, help='Show also the executions moved to the archive tables')
     argparser_app_list.add_argument('--name', help='Show only executions with this name')
     argparser_app_list.add_argument('--user_id', help='Show only executions belonging to this user')
     argparser_app_list.add_argument('--status', choices=["submitted", "scheduled", "starting", "error", "running", "cleaning up", "terminated"], help='Show only executions with this status')
@@ -202,6 +240,14 @@ def process_arguments() -> Tuple[ArgumentParser, Namespace]:
     argparser_execution_kill_user.add_argument('user_id', help="User name")
     argparser_execution_kill_user.set_defaults(func=exec_kill_user_cmd)
 
+    argparser_latency_report = subparser.add_parser('latency-report', help="Percentiles of the queueing and startup latencies of the executions")
+    argparser_latency_report.add_argument('--group-by', choices=['zapp', 'user', 'hour', 'day', 'week'], help='Report separately for each ZApp, user or submission time window')
+    argparser_latency_report.add_argument('--user_id', help='Consider only executions belonging to this user')
+    argparser_latency_report.add_argument('--include-archive', action='store_const', const=1, help='Consider also the executions moved to the archive tables')
+    argparser_latency_report.add_argument('--later-than-submit', help='Consider only executions submitted later than this timestamp (seconds since UTC epoch)')
+    argparser_latency_report.add_argument('--earlier-than-submit', help='Consider only executions submitted earlier than this timestamp (seconds since UTC epoch)')
+    argparser_latency_report.set_defaults(func=latency_report_cmd)
+
     return parser, parser.parse_args()
 
 
@@ -57,6 +57,11 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--dbpass', help='DB password', default='')
         argparser.add_argument('--dbhost', help='DB hostname', default='localhost')
         argparser.add_argument('--dbport', type=int, help='DB port', default=5432)
+        argparser.add_argument('--dbpoolsize', type=int, help='Maximum number of DB connections opened by each Zoe process', default=32)
+        argparser.add_argument('--dbreplicahost', help='Read replica hostname, used by the API for read-only queries, leave empty to use only the primary', default='')
+        argparser.add_argument('--dbreplicaport', type=int, help='Read replica port', default=5432)
+        argparser.add_argument('--dbreplicamaxlag', type=float, help='Maximum replication lag, in seconds, before reads go back to the primary', default=5)
+        argparser.add_argument('--dbquerybudget', type=int, help='Log the API calls and scheduler iterations that run more queries than this, or that repeat the same query many times (0 to disable)', default=0)
 
         # Master options
         argparser.add_argument('--api-listen-uri', help='ZMQ API listen address', default='tcp://*:4850')
@@ -67,6 +72,7 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--workspace-base-path', help='Base directory where user workspaces will be created. Must be visible at this path on all hosts.', default='/mnt/zoe-workspaces')
         argparser.add_argument('--workspace-deployment-path', help='Path appended to the workspace path to distinguish this deployment. If unspecified is equal to the deployment name.', default='--default--')
         argparser.add_argument('--overlay-network-name', help='Name of the Swarm overlay network Zoe should use', default='zoe')
+        argparser.add_argument('--archive-age', type=int, help='Move executions terminated more than this number of days ago to the archive tables, set to 0 to disable', default=0)
 
         # Service logs
         argparser.add_argument('--gelf-address', help='Enable Docker GELF log output to this destination (ex. udp://1.2.3.4:7896)', default='')
@@ -78,6 +84,7 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--listen-port', type=int, help='Port to listen to for incoming connections', default=5001)
         argparser.add_argument('--master-url', help='URL of the Zoe master process', default='tcp://127.0.0.1:4850')
         argparser.add_argument('--cookie-secret', help='secret used to encrypt cookies', default='changeme')
+        argparser.add_argument('--api-workers', type=int, help='Number of threads running the database queries of the API, should not exceed dbpoolsize', default=16)
 
         # API auth options
         argparser.add_argument('--auth-type', help='Authentication type (text, ldap or ldapsasl)', default='text')
@@ -100,8 +107,11 @@ def load_configuration(test_conf=None):
         argparser.add_argument('--scheduler-class', help='Scheduler class to use for scheduling ZApps', choices=['ZoeElasticScheduler'], default='ZoeElasticScheduler')
         argparser.add_argument('--scheduler-policy', help='Scheduler policy to use for scheduling ZApps', choices=['FIFO', 'SIZE', 'DYNSIZE'], default='FIFO')
         argparser.add_argument('--placement-policy', help='Placement policy', choices=['waterfill', 'random', 'average'], default='average')
+        argparser.add_argument('--dynsize-aging-rate', type=int, help='With the DYNSIZE policy, how much the size of queued executions decreases every second', default=256 * 1024 ** 2)
 
         argparser.add_argument('--backend', choices=['Kubernetes', 'DockerEngine'], default='DockerEngine', help='Which backend to enable')
+        argparser.add_argument('--backend-start-concurrency', type=int, help='Maximum number of services with the same startup order started at the same time', default=8)
+        argparser.add_argument('--backend-start-host-concurrency', type=int, help='Maximum number of services started at the same time on the same host', default=4)
 
         # Docker Engine backend options
         argparser.add_argument('--backend-docker-config-file', help='Location of the Docker Engine config file', default='docker.conf')
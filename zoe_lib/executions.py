@@ -71,6 +71,9 @@ class ZoeExecutionsAPI(ZoeAPIBase):
         * name: execution mane
         * user_id: user_id owning the execution (admin only)
         * limit: limit the number of returned entries
+        * before_id: only executions with a smaller ID, the newest first, used with limit to get the next page
+        * after_id: only executions with a greater ID, the closest to after_id, used with limit to get the previous page
+        * include_archive: set to 1 to include also the executions moved to the archive tables
         * earlier_than_submit: all execution that where submitted earlier than this timestamp
         * earlier_than_start: all execution that started earlier than this timestamp
         * earlier_than_end: all execution that ended earlier than this timestamp
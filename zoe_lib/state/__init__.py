@@ -20,3 +20,4 @@ from zoe_lib.state.execution import Execution
 from zoe_lib.state.sql_manager import SQLManager
 from zoe_lib.state.service import Service, VolumeDescription, VolumeDescriptionHostPath
 from zoe_lib.state.port import Port
+from zoe_lib.state.change_feed import StateChangeFeed, ExecutionChange, ServiceChange
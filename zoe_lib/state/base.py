@@ -19,11 +19,19 @@ import logging
 
 log = logging.getLogger(__name__)
 
+INSERT_BATCH_SIZE = 500  # maximum number of rows sent with a single multi-row INSERT or UPDATE
+
 
 class BaseRecord:
     """
     :type sql_manager: SQLManager
     """
+
+    __slots__ = ('sql_manager', 'id')
+
+    # Maps the columns that are stored in attributes with a different name
+    COLUMN_ATTRIBUTES = {}
+
     def __init__(self, d, sql_manager):
         """
         :type sql_manager: SQLManager
@@ -35,9 +43,21 @@ class BaseRecord:
         """Generates a dictionary that can be serialized in JSON."""
         raise NotImplementedError
 
+    def apply_columns(self, columns):
+        """Apply new column values, that have already been written to the database, to this record."""
+        for column, value in columns.items():
+            setattr(self, self.COLUMN_ATTRIBUTES.get(column, column), value)
+
 
 class BaseTable:
     """Common abstraction for all tables."""
+
+    # The record class built from the rows of this table
+    record_class = BaseRecord
+    # The table and column that point to the parent record, if any
+    parent_table = None
+    parent_column = None
+
     def __init__(self, sql_manager, table_name):
         self.table_name = table_name
         self.sql_manager = sql_manager
@@ -53,24 +73,198 @@ class BaseTable:
 
     def delete(self, record_id):
         """Delete a record from this table."""
+        self.sql_manager.discard_update(self.table_name, record_id)
         query = "DELETE FROM {} WHERE id = %s".format(self.table_name)
         self.cursor.execute(query, (record_id,))
         self.sql_manager.commit()
+        if self.sql_manager.cache is not None:
+            self.sql_manager.cache.remove(self.table_name, record_id)
 
     def update(self, record_id, **kwargs):
-        """Update the state of an execution."""
+        """Update the state of a record. Inside a unit of work (see SQLManager.transaction()) the update is delayed and merged with the others."""
+        if not self.sql_manager.defer_update(self, record_id, kwargs):
+            self.write_update(record_id, kwargs)
+            self.sql_manager.commit()
+        if self.sql_manager.cache is not None:
+            self.sql_manager.cache.update(self.table_name, record_id, kwargs)
+
+    def write_update(self, record_id, columns):
+        """Send an UPDATE query for a record, without committing. Updates are prepared statements, one for each set of columns."""
         arg_list = []
         value_list = []
-        for key, value in kwargs.items():
-            arg_list.append('{} = %s'.format(key))
+        for key, value in columns.items():
             value_list.append(value)
+            arg_list.append('{} = ${}'.format(key, len(value_list)))
         set_q = ", ".join(arg_list)
         value_list.append(record_id)
-        q_base = 'UPDATE {} SET '.format(self.table_name) + set_q + ' WHERE id=%s'
-        query = self.cursor.mogrify(q_base, value_list)
-        self.cursor.execute(query)
+        q_base = 'UPDATE {} SET '.format(self.table_name) + set_q + ' WHERE id=${}'.format(len(value_list))
+        self.sql_manager.execute_prepared(self.cursor, q_base, value_list)
+
+    def update_column(self, column, values):
+        """
+        Set a column to a different value for each record, with multi-row UPDATE statements and a single commit.
+
+        :param column: the name of the column
+        :param values: the new values, indexed by record ID
+        """
+        if len(values) == 0:
+            return
+        self.sql_manager.flush()
+        rows = list(values.items())
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            values_q = b', '.join(self.cursor.mogrify('(%s, %s)', row) for row in rows[start:start + INSERT_BATCH_SIZE])
+            query = 'UPDATE {0} SET {1} = v.value FROM (VALUES '.format(self.table_name, column).encode('utf-8') + values_q + \
+                ') AS v(id, value) WHERE {}.id = v.id'.format(self.table_name).encode('utf-8')
+            self.cursor.execute(query)
         self.sql_manager.commit()
+        if self.sql_manager.cache is not None:
+            for record_id, value in rows:
+                self.sql_manager.cache.update(self.table_name, record_id, {column: value})
+                self.sql_manager.touch(self.table_name, record_id)
 
     def select(self, only_one=False, limit=-1, **kwargs):
         """Select records."""
         raise NotImplementedError
+
+    def select_columns(self, columns, **kwargs):
+        """
+        Return only some columns of the rows that match the filters, without building records.
+
+        Use it for read-only listings that do not need the (large) JSON descriptions.
+
+        :param columns: the names of the columns to return
+        :param kwargs: filter rows based on their fields/columns, a list value selects any of the values it contains
+        :return: a list of rows, the columns can be accessed by name
+        """
+        filter_list = []
+        args_list = []
+        for key, value in kwargs.items():
+            if isinstance(value, (list, tuple)):
+                filter_list.append('{} = ANY(%s)'.format(key))
+                value = list(value)
+            else:
+                filter_list.append('{} = %s'.format(key))
+            args_list.append(value)
+        q = 'SELECT {} FROM {}'.format(', '.join(columns), self.table_name)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        self.sql_manager.flush()
+        self.cursor.execute(self.cursor.mogrify(q, args_list))
+        return self.cursor.fetchall()
+
+    def _execute_select(self, query, limit, filters):
+        """Run a query built by select(), lookups by ID or by parent record use a prepared statement instead."""
+        self.sql_manager.flush()
+        if limit <= 0 and len(filters) == 1:
+            column, value = list(filters.items())[0]
+            if column in ('id', self.parent_column) and not isinstance(value, (list, tuple)):
+                self.sql_manager.execute_prepared(self.cursor, 'SELECT * FROM {} WHERE {} = $1'.format(self.table_name, column), (value,))
+                return
+        self.cursor.execute(query)
+
+    def _cached_select(self, only_one, limit, filters):
+        """Try to serve a select from the record cache, returns None on a cache miss or if the query cannot be cached."""
+        cache = self.sql_manager.cache
+        if cache is None or limit > 0 or len(filters) != 1:
+            return None
+        column, value = list(filters.items())[0]
+        if isinstance(value, (list, tuple)):
+            return None
+        if column == 'id':
+            record = cache.get(self.table_name, value)
+            if record is None or only_one:
+                return record
+            return [record]
+        elif column == self.parent_column and not only_one:
+            return cache.get_children(self.table_name, value)
+        return None
+
+    def _load_records(self, only_one, limit, filters):
+        """Build records from the result of the last query, registering them in the record cache."""
+        if only_one:
+            row = self.cursor.fetchone()
+            if row is None:
+                return None
+            records = [self.record_class(row, self.sql_manager)]
+        else:
+            records = [self.record_class(x, self.sql_manager) for x in self.cursor]
+
+        cache = self.sql_manager.cache
+        if cache is not None:
+            if not only_one and limit <= 0 and len(filters) == 1 and self.parent_column in filters:
+                cache.set_children(self.table_name, self.parent_table, filters[self.parent_column], records)
+            records = [cache.add(self.table_name, r) for r in records]
+
+        if only_one:
+            return records[0]
+        return records
+
+    def select_by_parents(self, parent_ids, prefetch=(), include_archive=False):
+        """Load with one query all the records that belong to the given parent records. Returns a dictionary of record lists, indexed by parent ID."""
+        ret = {parent_id: [] for parent_id in parent_ids}
+        if len(ret) == 0:
+            return ret
+        self.sql_manager.flush()
+        query = self.cursor.mogrify('SELECT * FROM {} WHERE {} = ANY(%s)'.format(self._source(include_archive), self.parent_column), (list(ret.keys()),))
+        self.cursor.execute(query)
+        records = self._load_records(False, -1, {})
+        self._prefetch(records, prefetch, include_archive)
+        for record in records:
+            ret[getattr(record, self.parent_column)].append(record)
+
+        cache = self.sql_manager.cache
+        if cache is not None:
+            for parent_id, children in ret.items():
+                cache.set_children(self.table_name, self.parent_table, parent_id, children)
+        return ret
+
+    def prefetch(self, records, prefetch):
+        """Load the related records listed in prefetch for records already selected, with one query per table, see select()."""
+        self._prefetch(records, prefetch)
+
+    def _source(self, include_archive):
+        """The table to select from: the table itself, or its union with the archive table of terminated executions."""
+        if include_archive:
+            return '(SELECT * FROM {0} UNION ALL SELECT * FROM {0}_archive) AS {0}'.format(self.table_name)
+        return self.table_name
+
+    def _prefetch(self, records, prefetch, include_archive=False):  # pylint: disable=unused-argument
+        """Load the related records listed in prefetch and attach them to records. Tables that support prefetching override this method."""
+        if len(prefetch) > 0:
+            raise ValueError('Table {} cannot prefetch {}'.format(self.table_name, prefetch))
+
+    def _insert_many(self, columns, rows):
+        """
+        Insert many rows with multi-row INSERT statements and a single commit. Returns the new rows, in the same order as rows.
+
+        RETURNING gives no guarantee on the order of the rows, so the IDs are taken from the sequence beforehand and the new rows are matched
+        to the given ones by ID.
+        """
+        template = '(' + ', '.join(['%s'] * (len(columns) + 1)) + ')'
+        new_rows = []
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            batch = rows[start:start + INSERT_BATCH_SIZE]
+            self.cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", (self.table_name, len(batch)))
+            ids = [row[0] for row in self.cursor.fetchall()]
+            values = b', '.join(self.cursor.mogrify(template, (row_id,) + tuple(row)) for row_id, row in zip(ids, batch))
+            query = 'INSERT INTO {} (id, {}) VALUES '.format(self.table_name, ', '.join(columns)).encode('utf-8') + values + b' RETURNING *'
+            self.cursor.execute(query)
+            by_id = {row['id']: row for row in self.cursor.fetchall()}
+            new_rows += [by_id[row_id] for row_id in ids]
+        self.sql_manager.commit()
+        for row in new_rows:
+            self._inserted(row)
+        return new_rows
+
+    def _inserted(self, row):
+        """Write-through of a new row, returned by an INSERT ... RETURNING * query, into the record cache. Returns the new record ID."""
+        cache = self.sql_manager.cache
+        if cache is not None:
+            record = self.record_class(row, self.sql_manager)
+            if self.parent_column is not None:
+                cache.add_child(self.table_name, row[self.parent_column], record)
+                self.sql_manager.touch(self.parent_table, row[self.parent_column])  # its cached children list now has the new record
+            else:
+                cache.add(self.table_name, record)
+            self.sql_manager.touch(self.table_name, row['id'])
+        return row['id']
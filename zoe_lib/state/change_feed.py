@@ -0,0 +1,113 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Feed of the execution and service state changes, pushed by the database with LISTEN/NOTIFY."""
+
+from collections import namedtuple
+import json
+import logging
+import select
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+log = logging.getLogger(__name__)
+
+ExecutionChange = namedtuple('ExecutionChange', ['execution_id', 'old_status', 'status'])
+ServiceChange = namedtuple('ServiceChange', ['service_id', 'execution_id', 'old_status', 'status', 'old_backend_status', 'backend_status'])
+
+RECONNECT_INTERVAL = 5  # seconds
+
+
+def parse_notification(payload):
+    """Build a change event from the payload sent by the notify_state_change() trigger."""
+    data = json.loads(payload)
+    if data['table'] == 'execution':
+        return ExecutionChange(data['id'], data['old_status'], data['status'])
+    elif data['table'] == 'service':
+        return ServiceChange(data['id'], data['execution_id'], data['old_status'], data['status'], data['old_backend_status'], data['backend_status'])
+    else:
+        log.error('Unknown table in state change notification: {}'.format(data['table']))
+        return None
+
+
+class StateChangeFeed:
+    """
+    Receives the status changes of executions and services as they are committed, from a dedicated database connection.
+
+    Events are ExecutionChange and ServiceChange tuples. Changes committed while the listening connection is down are lost: after a
+    reconnection a None event is returned, consumers should then reload the state they are interested in.
+
+    :type sql_manager: SQLManager
+    """
+    def __init__(self, sql_manager):
+        self.sql_manager = sql_manager
+        self.channel = sql_manager.schema.lower() + '_state_changes'
+        self.conn = None
+        self._pending = []
+        self._connect()
+
+    def _connect(self):
+        self.conn = self.sql_manager._connect()  # pylint: disable=protected-access
+        self.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = self.conn.cursor()
+        cur.execute('LISTEN "{}"'.format(self.channel))
+        cur.close()
+
+    def fileno(self):
+        """The socket of the listening connection, it becomes readable when there are new events, to be used with select() or event loops."""
+        return self.conn.fileno()
+
+    def poll(self, timeout=None):
+        """Return the events received so far, waiting at most timeout seconds (forever if None) if there are none."""
+        if len(self._pending) == 0 and not self.conn.closed:
+            try:
+                self.conn.poll()
+                if len(self.conn.notifies) == 0 and timeout != 0:
+                    if select.select([self.conn], [], [], timeout) != ([], [], []):
+                        self.conn.poll()
+            except psycopg2.Error as e:
+                log.error('State change feed connection lost: {}'.format(e))
+                self.conn.close()
+        if self.conn.closed:
+            return self._reconnect()
+
+        while len(self.conn.notifies) > 0:
+            event = parse_notification(self.conn.notifies.pop(0).payload)
+            if event is not None:
+                self._pending.append(event)
+        events = self._pending
+        self._pending = []
+        return events
+
+    def events(self):
+        """Generator that yields the events as they arrive, never returns."""
+        while True:
+            yield from self.poll()
+
+    def close(self):
+        """Close the listening connection."""
+        self.conn.close()
+
+    def _reconnect(self):
+        try:
+            self._connect()
+        except psycopg2.Error as e:
+            log.error('Cannot reconnect the state change feed: {}'.format(e))
+            time.sleep(RECONNECT_INTERVAL)
+            return []
+        log.info('State change feed reconnected')
+        return [None]
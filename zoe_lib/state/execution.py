@@ -18,12 +18,28 @@
 import datetime
 import logging
 import threading
+import time
 import functools
 
 from zoe_lib.state.base import BaseRecord, BaseTable
+from zoe_lib.state.service import ResourceReservation
 
 log = logging.getLogger(__name__)
 
+COUNT_CACHE_TTL = 30  # seconds an approximate count can be reused
+COUNT_CACHE_SIZE = 1000  # approximate counts kept, one for each combination of filters, the oldest are dropped first
+COUNT_ESTIMATE_THRESHOLD = 100000  # unfiltered approximate counts above this value come from the planner statistics
+ARCHIVE_BATCH_SIZE = 1000  # executions moved to the archive tables by each transaction
+LATENCY_PERCENTILES = (50, 90, 99)
+LATENCIES = ('queue_wait', 'start_latency', 'total')
+LATENCY_GROUPS = {
+    'zapp': "execution.description->>'name'",
+    'user': 'execution.user_id',
+    'hour': "EXTRACT(EPOCH FROM date_trunc('hour', execution.time_submit))::bigint",
+    'day': "EXTRACT(EPOCH FROM date_trunc('day', execution.time_submit))::bigint",
+    'week': "EXTRACT(EPOCH FROM date_trunc('week', execution.time_submit))::bigint"
+}
+
 
 class Execution(BaseRecord):
     """
@@ -42,6 +58,11 @@ class Execution(BaseRecord):
     CLEANING_UP_STATUS = "cleaning up"
     TERMINATED_STATUS = "terminated"
 
+    COLUMN_ATTRIBUTES = {'status': '_status'}
+
+    __slots__ = ('user_id', 'name', 'description', 'time_submit', 'time_start', 'time_end', '_status', 'error_message', 'size', 'termination_lock',
+                 'prefetched_services')
+
     def __init__(self, d, sql_manager):
         super().__init__(d, sql_manager)
 
@@ -77,6 +98,9 @@ class Execution(BaseRecord):
 
         self.termination_lock = threading.Lock()
 
+        # Set when the services are loaded together with the execution, see ExecutionTable.select()
+        self.prefetched_services = None
+
     def serialize(self):
         """Generates a dictionary that can be serialized in JSON."""
         return {
@@ -98,36 +122,38 @@ class Execution(BaseRecord):
 
     def set_scheduled(self):
         """The execution has been added to the scheduler queues."""
-        self._status = self.SCHEDULED_STATUS
-        self.sql_manager.executions.update(self.id, status=self._status)
+        self._set_status(self.SCHEDULED_STATUS)
 
     def set_starting(self):
         """The services of the execution are being created in Swarm."""
-        self._status = self.STARTING_STATUS
-        self.sql_manager.executions.update(self.id, status=self._status)
+        self._set_status(self.STARTING_STATUS)
 
     def set_running(self):
         """The execution is running and producing useful work."""
-        self._status = self.RUNNING_STATUS
         self.time_start = datetime.datetime.utcnow()
-        self.sql_manager.executions.update(self.id, status=self._status, time_start=self.time_start)
+        self._set_status(self.RUNNING_STATUS, time_start=self.time_start)
 
     def set_cleaning_up(self):
         """The services of the execution are being terminated."""
-        self._status = self.CLEANING_UP_STATUS
-        self.sql_manager.executions.update(self.id, status=self._status)
+        self._set_status(self.CLEANING_UP_STATUS)
 
     def set_terminated(self):
         """The execution is not running."""
-        self._status = self.TERMINATED_STATUS
         self.time_end = datetime.datetime.utcnow()
-        self.sql_manager.executions.update(self.id, status=self._status, time_end=self.time_end)
+        self._set_status(self.TERMINATED_STATUS, time_end=self.time_end)
 
     def set_error(self):
         """The scheduler encountered an error starting or running the execution."""
-        self._status = self.ERROR_STATUS
         self.time_end = datetime.datetime.utcnow()
-        self.sql_manager.executions.update(self.id, status=self._status, time_end=self.time_end)
+        self._set_status(self.ERROR_STATUS, time_end=self.time_end)
+
+    def _set_status(self, status, **columns):
+        """Change the status and record the transition in the execution_transition log, with a single commit."""
+        self._status = status
+        transition_time = columns.get('time_start', columns.get('time_end', datetime.datetime.utcnow()))
+        with self.sql_manager.transaction():
+            self.sql_manager.executions.log_transition(self.id, status, transition_time)
+            self.sql_manager.executions.update(self.id, status=status, **columns)
 
     def set_error_message(self, message):
         """Contains an error message in case the status is 'error'."""
@@ -160,17 +186,19 @@ class Execution(BaseRecord):
     @property
     def services(self):
         """Getter for this execution service list."""
+        if self.prefetched_services is not None:
+            return self.prefetched_services
         return self.sql_manager.services.select(execution_id=self.id)
 
     @property
     def essential_services(self):
         """Getter for this execution essential service list."""
-        return self.sql_manager.services.select(execution_id=self.id, essential=True)
+        return [s for s in self.services if s.essential]
 
     @property
     def elastic_services(self):
         """Getter for this execution elastic service list."""
-        return self.sql_manager.services.select(execution_id=self.id, essential=False)
+        return [s for s in self.services if not s.essential]
 
     @property
     def essential_services_running(self) -> bool:
@@ -223,6 +251,9 @@ class Execution(BaseRecord):
 
 class ExecutionTable(BaseTable):
     """Abstraction for the execution table in the database."""
+
+    record_class = Execution
+
     def __init__(self, sql_manager):
         super().__init__(sql_manager, "execution")
 
@@ -246,12 +277,18 @@ class ExecutionTable(BaseTable):
         """Create a new execution in the state."""
         status = Execution.SUBMIT_STATUS
         time_submit = datetime.datetime.utcnow()
-        query = self.cursor.mogrify('INSERT INTO execution (id, name, user_id, description, status, size, time_submit) VALUES (DEFAULT, %s,%s,%s,%s,%s,%s) RETURNING id', (name, user_id, description, status, description['size'], time_submit))
+        query = self.cursor.mogrify('INSERT INTO execution (id, name, user_id, description, status, size, time_submit) VALUES (DEFAULT, %s,%s,%s,%s,%s,%s) RETURNING *', (name, user_id, description, status, description['size'], time_submit))
         self.cursor.execute(query)
+        row = self.cursor.fetchone()
+        self.log_transition(row['id'], status, time_submit)
         self.sql_manager.commit()
-        return self.cursor.fetchone()[0]
+        return self._inserted(row)
 
-    def select(self, only_one=False, limit=-1, base=0, **kwargs):
+    def log_transition(self, execution_id, status, transition_time):
+        """Append a status change to the execution_transition log, without committing."""
+        self.cursor.execute('INSERT INTO execution_transition (execution_id, status, time) VALUES (%s, %s, %s)', (execution_id, status, transition_time))
+
+    def select(self, only_one=False, limit=-1, base=0, prefetch=(), include_archive=False, **kwargs):
         """
         Return a list of executions.
 
@@ -261,81 +298,269 @@ class ExecutionTable(BaseTable):
         :type limit: int
         :type base: int
         :param base: the base value to use when limiting result count
-        :param kwargs: filter executions based on their fields/columns
+        :param prefetch: load also the services, and optionally their ports, of the selected executions by passing ('services',) or ('services', 'ports'), with one additional query for each
+        :type prefetch: tuple
+        :param include_archive: select also the executions moved to the archive tables, their services are loaded only with prefetch
+        :type include_archive: bool
+        :param kwargs: filter executions based on their fields/columns, a list value selects any of the values it contains. For keyset pagination pass before_id (or after_id) with the ID of the last (or first) execution of the current page and a limit.
         :return: one or more executions
         """
-        q_base = 'SELECT * FROM execution'
-        if len(kwargs) > 0:
-            q = q_base + " WHERE "
-            filter_list = []
-            args_list = []
-            for key, value in kwargs.items():
-                if key == 'earlier_than_submit':
-                    filter_list.append('"time_submit" <= to_timestamp(%s)')
-                elif key == 'earlier_than_start':
-                    filter_list.append('"time_start" <= to_timestamp(%s)')
-                elif key == 'earlier_than_end':
-                    filter_list.append('"time_end" <= to_timestamp(%s)')
-                elif key == 'later_than_submit':
-                    filter_list.append('"time_submit" >= to_timestamp(%s)')
-                elif key == 'later_than_start':
-                    filter_list.append('"time_start" >= to_timestamp(%s)')
-                elif key == 'later_than_end':
-                    filter_list.append('"time_end" >= to_timestamp(%s)')
-                else:
-                    filter_list.append('{} = %s'.format(key))
-                args_list.append(value)
-            q += ' AND '.join(filter_list)
-            if limit > 0:
-                q += ' ORDER BY id DESC LIMIT {} OFFSET {}'.format(limit, base)
-            query = self.cursor.mogrify(q, args_list)
+        if not include_archive:
+            cached = self._cached_select(only_one, limit, kwargs)
+            if cached is not None:
+                return cached
+
+        order = 'DESC'
+        if limit > 0 and 'after_id' in kwargs and 'before_id' not in kwargs:
+            order = 'ASC'  # the executions closest to after_id, they are returned in descending order like the others
+        q = 'SELECT * FROM ' + self._source(include_archive)
+        filter_list, args_list = self._filters(kwargs)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        if limit > 0:
+            q += ' ORDER BY id {} LIMIT {} OFFSET {}'.format(order, limit, base)
+        query = self.cursor.mogrify(q, args_list)
+
+        if include_archive:
+            self.sql_manager.flush()
+            self.cursor.execute(query)
         else:
-            if limit > 0:
-                q_base += ' ORDER BY id DESC LIMIT {} OFFSET {}'.format(limit, base)
-            query = self.cursor.mogrify(q_base)
+            self._execute_select(query, limit, kwargs)
+        executions = self._load_records(only_one, limit, kwargs)
+        if order == 'ASC' and not only_one:
+            executions.reverse()
+        if only_one and executions is not None:
+            self._prefetch([executions], prefetch, include_archive)
+        elif not only_one:
+            self._prefetch(executions, prefetch, include_archive)
+        return executions
+
+    def _prefetch(self, records, prefetch, include_archive=False):
+        """Load the services, and their ports, of all the executions in records with one query per table."""
+        unknown = set(prefetch) - {'services', 'ports'}
+        if len(unknown) > 0:
+            raise ValueError('Table {} cannot prefetch {}'.format(self.table_name, unknown))
+        if 'services' not in prefetch:
+            return
+        services = self.sql_manager.services.select_by_parents([e.id for e in records], prefetch=tuple(p for p in prefetch if p != 'services'), include_archive=include_archive)
+        for execution in records:
+            execution.prefetched_services = services[execution.id]
+
+    def _filters(self, kwargs):
+        """Translate select and count arguments into SQL conditions and their arguments."""
+        filter_list = []
+        args_list = []
+        for key, value in kwargs.items():
+            if key == 'earlier_than_submit':
+                filter_list.append('"time_submit" <= to_timestamp(%s)')
+            elif key == 'earlier_than_start':
+                filter_list.append('"time_start" <= to_timestamp(%s)')
+            elif key == 'earlier_than_end':
+                filter_list.append('"time_end" <= to_timestamp(%s)')
+            elif key == 'later_than_submit':
+                filter_list.append('"time_submit" >= to_timestamp(%s)')
+            elif key == 'later_than_start':
+                filter_list.append('"time_start" >= to_timestamp(%s)')
+            elif key == 'later_than_end':
+                filter_list.append('"time_end" >= to_timestamp(%s)')
+            elif key == 'before_id':
+                filter_list.append('id < %s')
+            elif key == 'after_id':
+                filter_list.append('id > %s')
+            elif isinstance(value, (list, tuple)):
+                filter_list.append('{} = ANY(%s)'.format(key))
+                value = list(value)
+            else:
+                filter_list.append('{} = %s'.format(key))
+            args_list.append(value)
+        return filter_list, args_list
+
+    def count(self, approximate=False, include_archive=False, **kwargs):
+        """
+        Return the number of executions.
 
+        :param approximate: the result can be a few seconds old, or an estimate for large tables, but it is much cheaper to compute
+        :type approximate: bool
+        :param include_archive: count also the executions moved to the archive tables
+        :type include_archive: bool
+        :param kwargs: filter executions based on their fields/columns
+        :return: the number of executions
+        """
+        cache_key = None
+        if approximate:
+            cache_key = (self.table_name, include_archive, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+            cached = self._cached_count(cache_key)
+            if cached is not None:
+                return cached
+            if len(kwargs) == 0 and not include_archive:
+                self.cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'execution'::regclass")
+                estimate = self.cursor.fetchone()[0]
+                if estimate > COUNT_ESTIMATE_THRESHOLD:
+                    self._cache_count(cache_key, estimate)
+                    return estimate
+
+        q = 'SELECT COUNT(*) FROM ' + self._source(include_archive)
+        filter_list, args_list = self._filters(kwargs)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        query = self.cursor.mogrify(q, args_list)
+
+        self.sql_manager.flush()
         self.cursor.execute(query)
-        if only_one:
-            row = self.cursor.fetchone()
-            if row is None:
-                return None
-            return Execution(row, self.sql_manager)
-        else:
-            return [Execution(x, self.sql_manager) for x in self.cursor]
+        row = self.cursor.fetchone()
+        if cache_key is not None:
+            self._cache_count(cache_key, row[0])
+        return row[0]
 
-    def count(self, **kwargs):
+    def _cached_count(self, cache_key):
+        """Return an approximate count stored less than COUNT_CACHE_TTL seconds ago, or None. An expired count is dropped."""
+        cached = self.sql_manager.count_cache.get(cache_key)
+        if cached is None:
+            return None
+        if time.time() - cached[1] >= COUNT_CACHE_TTL:
+            self.sql_manager.count_cache.pop(cache_key, None)
+            return None
+        return cached[0]
+
+    def _cache_count(self, cache_key, count):
+        """Store an approximate count, when the cache is full the expired counts are dropped first, then the oldest ones."""
+        cache = self.sql_manager.count_cache
+        now = time.time()
+        if len(cache) >= COUNT_CACHE_SIZE:
+            for key, (count_, stored_at) in list(cache.items()):
+                if now - stored_at >= COUNT_CACHE_TTL:
+                    cache.pop(key, None)
+            while len(cache) >= COUNT_CACHE_SIZE:
+                cache.pop(next(iter(cache)), None)  # dictionaries keep the insertion order
+        cache.pop(cache_key, None)
+        cache[cache_key] = (count, now)
+
+    def count_by_status(self, **kwargs):
         """
-        Return a list of executions.
+        Return the number of executions in each status, with a single query.
 
         :param kwargs: filter executions based on their fields/columns
-        :return: one or more executions
+        :return: a dictionary status -> number of executions, statuses without executions are omitted
         """
-        q_base = 'SELECT COUNT(*) FROM execution'
-        if len(kwargs) > 0:
-            q = q_base + " WHERE "
-            filter_list = []
-            args_list = []
-            for key, value in kwargs.items():
-                if key == 'earlier_than_submit':
-                    filter_list.append('"time_submit" <= to_timestamp(%s)')
-                elif key == 'earlier_than_start':
-                    filter_list.append('"time_start" <= to_timestamp(%s)')
-                elif key == 'earlier_than_end':
-                    filter_list.append('"time_end" <= to_timestamp(%s)')
-                elif key == 'later_than_submit':
-                    filter_list.append('"time_submit" >= to_timestamp(%s)')
-                elif key == 'later_than_start':
-                    filter_list.append('"time_start" >= to_timestamp(%s)')
-                elif key == 'later_than_end':
-                    filter_list.append('"time_end" >= to_timestamp(%s)')
-                else:
-                    filter_list.append('{} = %s'.format(key))
-                args_list.append(value)
-            q += ' AND '.join(filter_list)
-            query = self.cursor.mogrify(q, args_list)
-        else:
-            query = self.cursor.mogrify(q_base)
+        q = 'SELECT status, COUNT(*) FROM execution'
+        filter_list, args_list = self._filters(kwargs)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        q += ' GROUP BY status'
+        query = self.cursor.mogrify(q, args_list)
+
+        self.sql_manager.flush()
+        self.cursor.execute(query)
+        return {row[0]: row[1] for row in self.cursor}
+
+    def total_reservations(self, **kwargs):
+        """
+        Return the sum of the resources reserved by the services of the selected executions, computed by the database.
 
+        :param kwargs: filter executions based on their fields/columns
+        :return: a ResourceReservation, with all limits at zero if there are no services
+        """
+        q = '''SELECT
+            COALESCE(SUM((description->'resources'->'memory'->>'min')::numeric), 0)::bigint,
+            COALESCE(SUM((description->'resources'->'memory'->>'max')::numeric), 0)::bigint,
+            COALESCE(SUM((description->'resources'->'cores'->>'min')::numeric), 0)::float8,
+            COALESCE(SUM((description->'resources'->'cores'->>'max')::numeric), 0)::float8
+            FROM service WHERE execution_id IN (SELECT id FROM execution'''
+        filter_list, args_list = self._filters(kwargs)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        q += ')'
+        query = self.cursor.mogrify(q, args_list)
+
+        self.sql_manager.flush()
         self.cursor.execute(query)
         row = self.cursor.fetchone()
-        return row[0]
+        return ResourceReservation({
+            'memory': {'min': row[0], 'max': row[1]},
+            'cores': {'min': row[2], 'max': row[3]}
+        })
+
+    def latency_report(self, group_by=None, include_archive=False, **kwargs):
+        """
+        Return percentiles of the queueing and startup latencies of the selected executions, computed from the execution_transition log.
+
+        For each execution the queue wait goes from the first time it was scheduled to the first time it started, the start latency from
+        starting to running and the total latency from the submission to running. Executions that did not reach a status are not counted
+        for the latencies that need it.
+
+        :param group_by: None for a single group, or one of the keys of LATENCY_GROUPS: ZApp name, user or time window of the submission
+        :param include_archive: include also the executions moved to the archive tables
+        :type include_archive: bool
+        :param kwargs: filter executions based on their fields/columns, for example later_than_submit to select a time window
+        :return: a list of dictionaries, one per group, with the number of executions and the LATENCY_PERCENTILES of each latency in seconds
+        """
+        if group_by is not None and group_by not in LATENCY_GROUPS:
+            raise ValueError('Cannot group executions by {}'.format(group_by))
+        query = self._latency_query(LATENCY_GROUPS.get(group_by, 'NULL'), include_archive, kwargs)
+
+        self.sql_manager.flush()
+        self.cursor.execute(query)
+        report = []
+        for row in self.cursor:
+            entry = {'group': row[0], 'executions': row[1]}
+            for index, latency in enumerate(LATENCIES):
+                values = row[3 + index * 2]
+                entry[latency] = {
+                    'count': row[2 + index * 2],
+                    'percentiles': {str(p): (None if values is None else values[i]) for i, p in enumerate(LATENCY_PERCENTILES)}
+                }
+            report.append(entry)
+        return report
+
+    def _latency_query(self, group, include_archive, kwargs):
+        """Build the query of latency_report(): one row per group, with the number of executions and the count and percentiles of each latency."""
+        def first(status):
+            """Time of the first transition to a status."""
+            return "MIN(CASE WHEN transition.status = '{}' THEN transition.time END)".format(status)
+
+        filter_list, args_list = self._filters(kwargs)
+        q = 'SELECT ' + group + ' AS grp, ' + \
+            'EXTRACT(EPOCH FROM ' + first(Execution.STARTING_STATUS) + ' - ' + first(Execution.SCHEDULED_STATUS) + ')::float8 AS queue_wait, ' + \
+            'EXTRACT(EPOCH FROM ' + first(Execution.RUNNING_STATUS) + ' - ' + first(Execution.STARTING_STATUS) + ')::float8 AS start_latency, ' + \
+            'EXTRACT(EPOCH FROM ' + first(Execution.RUNNING_STATUS) + ' - ' + first(Execution.SUBMIT_STATUS) + ')::float8 AS total ' + \
+            'FROM (SELECT * FROM ' + self._source(include_archive)
+        if len(filter_list) > 0:
+            q += ' WHERE ' + ' AND '.join(filter_list)
+        q += ') AS execution JOIN execution_transition AS transition ON transition.execution_id = execution.id GROUP BY execution.id, grp'
+
+        fractions = [p / 100 for p in LATENCY_PERCENTILES]
+        q = 'SELECT grp, COUNT(*), ' + \
+            ', '.join('COUNT({0}), percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY {0})'.format(latency) for latency in LATENCIES) + \
+            ' FROM (' + q + ') AS latency GROUP BY grp ORDER BY grp'
+        return self.cursor.mogrify(q, [fractions] * len(LATENCIES) + args_list)
+
+    def archive(self, max_age):
+        """
+        Move the executions that ended more than max_age seconds ago, with their services and ports, to the archive tables.
+
+        At most ARCHIVE_BATCH_SIZE executions are moved, call it again until it returns an empty list.
+
+        :param max_age: age in seconds of the oldest terminated executions that are kept in the main tables
+        :type max_age: int
+        :return: the IDs of the archived executions
+        """
+        time_limit = datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+        self.sql_manager.flush()
+        self.cursor.execute('SELECT id FROM execution WHERE status = ANY(%s) AND time_end < %s ORDER BY id LIMIT %s FOR UPDATE',
+                            ([Execution.TERMINATED_STATUS, Execution.ERROR_STATUS], time_limit, ARCHIVE_BATCH_SIZE))
+        execution_ids = [row[0] for row in self.cursor]
+        if len(execution_ids) == 0:
+            self.sql_manager.commit()
+            return execution_ids
+
+        # the archive tables have the same columns, in the same order, as the main ones
+        self.cursor.execute('INSERT INTO port_archive SELECT port.* FROM port JOIN service ON port.service_id = service.id WHERE service.execution_id = ANY(%s)', (execution_ids,))
+        self.cursor.execute('INSERT INTO service_archive SELECT * FROM service WHERE execution_id = ANY(%s)', (execution_ids,))
+        self.cursor.execute('INSERT INTO execution_archive SELECT * FROM execution WHERE id = ANY(%s)', (execution_ids,))
+        self.cursor.execute('DELETE FROM execution WHERE id = ANY(%s)', (execution_ids,))  # services and ports are deleted in cascade
+        self.sql_manager.commit()
+
+        if self.sql_manager.cache is not None:
+            for execution_id in execution_ids:
+                self.sql_manager.cache.remove(self.table_name, execution_id)
+        return execution_ids
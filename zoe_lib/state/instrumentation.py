@@ -0,0 +1,156 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-statement instrumentation of the database queries."""
+
+from contextlib import contextmanager
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+import psycopg2.extras
+
+log = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = 5  # executions of the same statement from the same call site that make an operation suspect
+REPORT_TOP_STATEMENTS = 5
+
+_STATE_DIR = os.path.dirname(os.path.abspath(__file__))
+_PSYCOPG_DIR = os.path.dirname(os.path.abspath(psycopg2.__file__))
+_CONTEXTLIB_FILE = os.path.abspath(contextmanager.__code__.co_filename)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?')
+_LIST_RE = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE_RE = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def normalize(query) -> str:
+    """Replace the literal values of a query with placeholders, so that executions of the same statement can be grouped."""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = _STRING_RE.sub('?', query)
+    query = _NUMBER_RE.sub('?', query)
+    query = _LIST_RE.sub('?', query)
+    return _SPACE_RE.sub(' ', query).strip()
+
+
+def _call_site():
+    """Return the first frame outside of the state layer that led to the current query, as file:line (function)."""
+    frame = sys._getframe(2)  # pylint: disable=protected-access
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if os.path.dirname(filename) != _STATE_DIR and not filename.startswith(_PSYCOPG_DIR) and filename != _CONTEXTLIB_FILE:
+            return '{}:{} ({})'.format(os.path.relpath(filename), frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryTrace:
+    """The statements executed during an operation, like an API call or a scheduler loop iteration."""
+    def __init__(self, name):
+        self.name = name
+        self.statements = []  # list of (statement, duration, row count, call site)
+        self.time_start = time.time()
+
+    def record(self, query, duration, rowcount, call_site):
+        """Add an executed statement."""
+        self.statements.append((normalize(query), duration, rowcount, call_site))
+
+    @property
+    def count(self) -> int:
+        """Number of executed statements."""
+        return len(self.statements)
+
+    @property
+    def total_time(self) -> float:
+        """Time spent waiting for the database, in seconds."""
+        return sum(s[1] for s in self.statements)
+
+    def by_statement(self):
+        """Aggregate the statements by text and call site, returns a list of (statement, call site, count, total time, rows), the most frequent first."""
+        groups = {}
+        for statement, duration, rowcount, call_site in self.statements:
+            count, total_time, rows = groups.get((statement, call_site), (0, 0.0, 0))
+            groups[(statement, call_site)] = (count + 1, total_time + duration, rows + max(rowcount, 0))
+        ret = [(key[0], key[1], value[0], value[1], value[2]) for key, value in groups.items()]
+        ret.sort(key=lambda g: (g[2], g[3]), reverse=True)
+        return ret
+
+    def n_plus_one(self):
+        """Return the statement groups that look like an N+1 query pattern: the same statement executed many times from the same call site."""
+        return [g for g in self.by_statement() if g[2] >= N_PLUS_ONE_THRESHOLD]
+
+    def report(self, budget):
+        """Log the operation if it executed more statements than budget or if it contains N+1 patterns."""
+        suspects = self.n_plus_one()
+        if self.count <= budget and len(suspects) == 0:
+            return
+        log.warning('{}: {} queries in {:.1f} ms ({:.1f} ms in the database), budget is {}'.format(
+            self.name, self.count, (time.time() - self.time_start) * 1000, self.total_time * 1000, budget))
+        for statement, call_site, count, total_time, rows in suspects:
+            log.warning('{}: possible N+1 query, executed {} times from {}: {}'.format(self.name, count, call_site, statement))
+        for statement, call_site, count, total_time, rows in self.by_statement()[:REPORT_TOP_STATEMENTS]:
+            log.warning('{}:   {:>4} x {:>8.2f} ms {:>6} rows {} {}'.format(self.name, count, total_time * 1000, rows, call_site, statement))
+
+
+def _active_traces():
+    traces = getattr(_local, 'traces', None)
+    if traces is None:
+        traces = _local.traces = []
+    return traces
+
+
+@contextmanager
+def tracing(trace: QueryTrace):
+    """Record in trace all the statements executed by the calling thread inside the block, traces can be nested."""
+    traces = _active_traces()
+    traces.append(trace)
+    try:
+        yield trace
+    finally:
+        traces.remove(trace)
+
+
+def record_statement(query, duration, rowcount):
+    """Record a statement executed by the calling thread in the active traces."""
+    traces = _active_traces()
+    if len(traces) == 0:
+        return
+    call_site = _call_site()
+    for trace in traces:
+        trace.record(query, duration, rowcount, call_site)
+
+
+class InstrumentedCursor(psycopg2.extras.DictCursor):
+    """A cursor that records the executed statements in the active traces of the calling thread."""
+    statement = None  # recorded instead of the query text for the next execute(), used for prepared statements
+
+    def execute(self, query, vars=None):  # pylint: disable=redefined-builtin
+        """Execute a statement, measuring its latency if a trace is active."""
+        statement = self.statement
+        self.statement = None
+        if len(_active_traces()) == 0:
+            return super().execute(query, vars)
+        time_start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_statement(query if statement is None else statement, time.perf_counter() - time_start, self.rowcount)
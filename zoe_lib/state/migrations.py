@@ -0,0 +1,96 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Versioned migrations of the SQL schema."""
+
+import logging
+
+from zoe_lib.version import SQL_SCHEMA_VERSION
+import zoe_lib.exceptions
+
+log = logging.getLogger(__name__)
+
+# Version of the schema built by the create() methods of the tables, new deployments are brought up to date by applying the migrations
+BASE_SCHEMA_VERSION = 6
+
+# Statements that upgrade the schema from the previous version to the version used as key
+MIGRATIONS = {
+    7: [
+        'CREATE INDEX execution_status_idx ON execution (status)',
+        'CREATE INDEX execution_user_id_idx ON execution (user_id, id)',
+        'CREATE INDEX service_execution_id_idx ON service (execution_id)',
+        'CREATE INDEX service_backend_idx ON service (backend_host, backend_id)',
+        'CREATE INDEX service_backend_status_idx ON service (backend_status)',
+        'CREATE INDEX port_service_id_idx ON port (service_id)'
+    ],
+    8: [
+        'ALTER TABLE execution ALTER COLUMN description TYPE JSONB USING description::jsonb',
+        'ALTER TABLE service ALTER COLUMN description TYPE JSONB USING description::jsonb',
+        'ALTER TABLE port ALTER COLUMN description TYPE JSONB USING description::jsonb'
+    ],
+    9: [
+        # Notifications for the StateChangeFeed, sent on the <schema>_state_changes channel when the transaction commits
+        """CREATE FUNCTION notify_state_change() RETURNS trigger AS $$
+        DECLARE
+            payload json;
+        BEGIN
+            IF TG_TABLE_NAME = 'execution' THEN
+                payload := json_build_object('table', TG_TABLE_NAME, 'id', NEW.id, 'old_status', OLD.status, 'status', NEW.status);
+            ELSE
+                payload := json_build_object('table', TG_TABLE_NAME, 'id', NEW.id, 'execution_id', NEW.execution_id,
+                                             'old_status', OLD.status, 'status', NEW.status,
+                                             'old_backend_status', OLD.backend_status, 'backend_status', NEW.backend_status);
+            END IF;
+            PERFORM pg_notify(TG_TABLE_SCHEMA || '_state_changes', payload::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER execution_state_change AFTER UPDATE ON execution FOR EACH ROW
+           WHEN (OLD.status IS DISTINCT FROM NEW.status) EXECUTE PROCEDURE notify_state_change()""",
+        """CREATE TRIGGER service_state_change AFTER UPDATE ON service FOR EACH ROW
+           WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.backend_status IS DISTINCT FROM NEW.backend_status) EXECUTE PROCEDURE notify_state_change()"""
+    ],
+    10: [
+        # Archive tier for terminated executions, columns added to the main tables must be added also to the archive tables
+        'CREATE TABLE execution_archive (LIKE execution INCLUDING INDEXES)',
+        'CREATE TABLE service_archive (LIKE service INCLUDING INDEXES)',
+        'CREATE TABLE port_archive (LIKE port INCLUDING INDEXES)',
+        'CREATE INDEX execution_time_end_idx ON execution (time_end)'
+    ],
+    11: [
+        # Append-only log of the execution status changes, without a foreign key so that it is kept when executions are archived
+        'CREATE TABLE execution_transition (id SERIAL PRIMARY KEY, execution_id INT NOT NULL, status TEXT NOT NULL, time TIMESTAMP NOT NULL)',
+        'CREATE INDEX execution_transition_execution_id_idx ON execution_transition (execution_id)',
+        'CREATE INDEX execution_transition_time_idx ON execution_transition (time)',
+        # Past executions only know when they were submitted and started
+        """INSERT INTO execution_transition (execution_id, status, time)
+           SELECT id, 'submitted', time_submit FROM execution UNION ALL SELECT id, 'submitted', time_submit FROM execution_archive""",
+        """INSERT INTO execution_transition (execution_id, status, time)
+           SELECT id, 'running', time_start FROM execution WHERE time_start IS NOT NULL
+           UNION ALL SELECT id, 'running', time_start FROM execution_archive WHERE time_start IS NOT NULL"""
+    ],
+}
+
+
+def upgrade_schema(cur, deployment_name, from_version):
+    """Apply the migrations needed to bring the schema of a deployment from from_version to SQL_SCHEMA_VERSION, without committing."""
+    if from_version < BASE_SCHEMA_VERSION or from_version > SQL_SCHEMA_VERSION:
+        raise zoe_lib.exceptions.ZoeLibException('SQL database schema version mismatch: need {}, found {}'.format(SQL_SCHEMA_VERSION, from_version))
+
+    for version in range(from_version + 1, SQL_SCHEMA_VERSION + 1):
+        log.info('Upgrading the SQL schema of deployment {} to version {}'.format(deployment_name, version))
+        for statement in MIGRATIONS[version]:
+            cur.execute(statement)
+        cur.execute("UPDATE public.versions SET version = %s WHERE deployment = %s", (version, deployment_name))
@@ -0,0 +1,192 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Thread-aware pool of database connections."""
+
+import logging
+import threading
+import time
+
+import zoe_lib.exceptions
+
+log = logging.getLogger(__name__)
+
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF = 0.5  # seconds, doubled at each attempt
+HEALTH_CHECK_INTERVAL = 60  # seconds a connection can stay idle before being checked again
+CHECKOUT_TIMEOUT = 30  # seconds
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections, each thread checks out its own connection.
+
+    A thread keeps its connection until it calls release() or terminates: connections owned by dead threads are reclaimed when the pool is
+    saturated. Idle connections are health-checked before being handed out again and broken connections are replaced, retrying with an
+    exponential backoff if the database is not reachable.
+    """
+    def __init__(self, connect_cb, size):
+        self._connect_cb = connect_cb
+        self.size = size
+        self._lock = threading.Condition()
+        self._local = threading.local()
+        self._idle = []  # list of (connection, time it was released)
+        self._owners = {}  # connection -> owner thread
+        self.created = 0
+        self.reconnects = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def connection(self):
+        """Return the connection owned by the calling thread, checking out one from the pool if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and not conn.closed:
+            return conn
+        if conn is not None:
+            log.warning('Database connection lost, reconnecting')
+            with self._lock:
+                self._owners.pop(conn, None)
+                self.reconnects += 1
+                self._lock.notify()
+        self._local.conn = self._checkout()
+        return self._local.conn
+
+    def release(self):
+        """Give the connection owned by the calling thread back to the pool."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        self._rollback(conn)
+        with self._lock:
+            self._owners.pop(conn, None)
+            if not conn.closed:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def stats(self):
+        """Return the pool saturation and wait time metrics."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': len(self._owners),
+                'idle': len(self._idle),
+                'created': self.created,
+                'reconnects': self.reconnects,
+                'waits': self.waits,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time
+            }
+
+    def _checkout(self):
+        owner = threading.current_thread()
+        start_time = None
+        with self._lock:
+            while True:
+                while len(self._idle) > 0:
+                    conn, released_at = self._idle.pop()
+                    if self._healthy(conn, released_at):
+                        self._owners[conn] = owner
+                        self._account_wait(start_time)
+                        return conn
+                    self._close(conn)
+                    self.reconnects += 1
+
+                self._reclaim()
+                if len(self._idle) > 0:
+                    continue
+                if len(self._owners) < self.size:
+                    self._owners[owner] = owner  # reserve a slot while connecting, without holding the lock
+                    break
+
+                if start_time is None:
+                    start_time = time.monotonic()
+                    self.waits += 1
+                    log.warning('Database connection pool saturated ({} connections), waiting'.format(self.size))
+                elif time.monotonic() - start_time > CHECKOUT_TIMEOUT:
+                    self._account_wait(start_time)
+                    raise zoe_lib.exceptions.ZoeLibException('Timeout waiting for a free database connection')
+                self._lock.wait(0.1)  # terminated threads do not notify, poll for connections to reclaim
+            self._account_wait(start_time)
+
+        try:
+            conn = self._new_connection()
+        finally:
+            with self._lock:
+                del self._owners[owner]
+        with self._lock:
+            self._owners[conn] = owner
+        return conn
+
+    def _new_connection(self):
+        delay = RECONNECT_BACKOFF
+        for attempt_ in range(RECONNECT_ATTEMPTS - 1):
+            try:
+                conn = self._connect_cb()
+                break
+            except Exception as e:  # pylint: disable=broad-except
+                log.error('Cannot connect to the database ({}), retrying in {:.1f}s'.format(e, delay))
+                time.sleep(delay)
+                delay *= 2
+        else:
+            conn = self._connect_cb()  # last attempt, errors go to the caller
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def _reclaim(self):
+        """Move the connections owned by threads that have terminated back to the idle list."""
+        for conn, owner in list(self._owners.items()):
+            if conn is not owner and not owner.is_alive():
+                del self._owners[conn]
+                self._rollback(conn)
+                self._idle.append((conn, time.monotonic()))
+
+    def _account_wait(self, start_time):
+        if start_time is None:
+            return
+        waited = time.monotonic() - start_time
+        self.wait_time += waited
+        self.max_wait_time = max(self.max_wait_time, waited)
+
+    @staticmethod
+    def _healthy(conn, released_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _rollback(conn):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
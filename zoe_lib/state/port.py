@@ -25,17 +25,31 @@ log = logging.getLogger(__name__)
 class Port(BaseRecord):
     """A tcp or udp port that should be exposed by the backend."""
 
+    __slots__ = ('service_id', 'internal_name', 'external_ip', 'external_port', 'description')
+
     def __init__(self, d, sql_manager):
         super().__init__(d, sql_manager)
 
+        self.service_id = d['service_id']
         self.internal_name = d['internal_name']
         self.external_ip = d['external_ip']
         self.external_port = d['external_port']
         self.description = d['description']
 
-        self.internal_number = self.description['port_number']
-        self.protocol = self.description['protocol']
-        self.url_template = self.description['url_template']
+    @property
+    def internal_number(self):
+        """The port number inside the container."""
+        return self.description['port_number']
+
+    @property
+    def protocol(self):
+        """The port protocol, tcp or udp."""
+        return self.description['protocol']
+
+    @property
+    def url_template(self):
+        """Template used to build the URL of the exposed endpoint."""
+        return self.description['url_template']
 
     def serialize(self):
         """Generates a dictionary that can be serialized in JSON."""
@@ -65,6 +79,11 @@ class Port(BaseRecord):
 
 class PortTable(BaseTable):
     """Abstraction for the port table in the database."""
+
+    record_class = Port
+    parent_table = 'service'
+    parent_column = 'service_id'
+
     def __init__(self, sql_manager):
         super().__init__(sql_manager, "port")
 
@@ -81,10 +100,21 @@ class PortTable(BaseTable):
 
     def insert(self, service_id, internal_name, description):
         """Adds a new port to the state."""
-        query = self.cursor.mogrify('INSERT INTO port (id, service_id, internal_name, external_ip, external_port, description) VALUES (DEFAULT, %s, %s, NULL, NULL, %s) RETURNING id', (service_id, internal_name, description))
+        query = self.cursor.mogrify('INSERT INTO port (id, service_id, internal_name, external_ip, external_port, description) VALUES (DEFAULT, %s, %s, NULL, NULL, %s) RETURNING *', (service_id, internal_name, description))
         self.cursor.execute(query)
         self.sql_manager.commit()
-        return self.cursor.fetchone()[0]
+        return self._inserted(self.cursor.fetchone())
+
+    def insert_many(self, ports):
+        """
+        Adds many ports to the state, with a single commit.
+
+        :param ports: a list of (service_id, internal_name, description) tuples
+        :return: the IDs of the new ports, in the same order
+        """
+        rows = [(service_id, internal_name, None, None, description) for service_id, internal_name, description in ports]
+        new_rows = self._insert_many(('service_id', 'internal_name', 'external_ip', 'external_port', 'description'), rows)
+        return [row['id'] for row in new_rows]
 
     def select(self, only_one=False, limit=-1, **kwargs):
         """
@@ -97,6 +127,10 @@ class PortTable(BaseTable):
         :param kwargs: filter services based on their fields/columns
         :return: one or more ports
         """
+        cached = self._cached_select(only_one, limit, kwargs)
+        if cached is not None:
+            return cached
+
         q_base = 'SELECT * FROM port'
         if len(kwargs) > 0:
             q = q_base + " WHERE "
@@ -114,11 +148,5 @@ class PortTable(BaseTable):
                 q_base += ' ORDER BY id DESC LIMIT {}'.format(limit)
             query = self.cursor.mogrify(q_base)
 
-        self.cursor.execute(query)
-        if only_one:
-            row = self.cursor.fetchone()
-            if row is None:
-                return None
-            return Port(row, self.sql_manager)
-        else:
-            return [Port(x, self.sql_manager) for x in self.cursor]
+        self._execute_select(query, limit, kwargs)
+        return self._load_records(only_one, limit, kwargs)
@@ -0,0 +1,132 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Identity map for the records loaded from the database."""
+
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+def _record_key(table_name, record_id):
+    try:
+        return table_name, int(record_id)
+    except (TypeError, ValueError):
+        return table_name, record_id
+
+
+class RecordCache:
+    """
+    An identity map for state records, keyed by table name and record ID.
+
+    Only one instance of each record is kept in memory, so that state changes made through the record methods are immediately visible to all the
+    threads that hold a reference to it. The cache is write-through: the tables keep it up to date on insert, update and delete, so it is
+    correct only if all writes for the cached tables go through the same SQLManager, as it happens in the Zoe master.
+
+    The cache also keeps the lists of children records (services of an execution, ports of a service), since they do not change after an execution
+    has been submitted.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records = {}
+        self._children = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table_name, record_id):
+        """Return a cached record, or None."""
+        key = _record_key(table_name, record_id)
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return record
+
+    def add(self, table_name, record):
+        """Add a record to the cache, returning the instance that should be used by the caller."""
+        key = _record_key(table_name, record.id)
+        with self._lock:
+            return self._records.setdefault(key, record)
+
+    def get_children(self, table_name, parent_id):
+        """Return the cached list of records in table_name that belong to parent_id, or None."""
+        key = _record_key(table_name, parent_id)
+        with self._lock:
+            try:
+                parent_table_, children = self._children[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(children)
+
+    def set_children(self, table_name, parent_table, parent_id, records):
+        """Record the full list of records in table_name that belong to parent_id, a record of parent_table."""
+        key = _record_key(table_name, parent_id)
+        with self._lock:
+            self._children[key] = (parent_table, [self.add(table_name, r) for r in records])
+
+    def add_child(self, table_name, parent_id, record):
+        """A new record has been inserted for parent_id, add it to the children list, if it is cached."""
+        key = _record_key(table_name, parent_id)
+        with self._lock:
+            record = self.add(table_name, record)
+            if key in self._children:
+                self._children[key][1].append(record)
+            return record
+
+    def update(self, table_name, record_id, columns):
+        """Apply an update that has been written to the database to the cached record."""
+        key = _record_key(table_name, record_id)
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                record.apply_columns(columns)
+
+    def remove(self, table_name, record_id):
+        """Remove a record, and all its cached children, from the cache."""
+        key = _record_key(table_name, record_id)
+        with self._lock:
+            self._records.pop(key, None)
+            for child_key, (parent_table, children) in list(self._children.items()):
+                if parent_table == table_name and child_key[1] == key[1] and self._children.pop(child_key, None) is not None:
+                    for child in children:
+                        self.remove(child_key[0], child.id)
+
+    def invalidate(self, table_name=None, record_id=None):
+        """Drop cached records: a single record (and its children), a whole table, or everything if no argument is given."""
+        with self._lock:
+            if table_name is None:
+                self._records.clear()
+                self._children.clear()
+            elif record_id is None:
+                for key in [k for k in self._records if k[0] == table_name]:
+                    self.remove(*key)
+                for key in [k for k in self._children if k[0] == table_name]:
+                    self._children.pop(key, None)
+            else:
+                self.remove(table_name, record_id)
+
+    def stats(self):
+        """Return the cache hit/miss counters."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'records': len(self._records)
+            }
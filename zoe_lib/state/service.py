@@ -106,6 +106,9 @@ class Service(BaseRecord):
     BACKEND_DESTROY_STATUS = 'destroyed'
     BACKEND_OOM_STATUS = 'oom-killed'
 
+    __slots__ = ('name', 'status', 'error_message', 'execution_id', 'description', 'service_group', 'backend_id', 'backend_status', 'backend_host',
+                 'restart_count', 'ip_address', 'essential', 'prefetched_ports', '_resource_reservation', '_volumes')
+
     def __init__(self, d, sql_manager):
         super().__init__(d, sql_manager)
 
@@ -126,25 +129,12 @@ class Service(BaseRecord):
 
         self.essential = d['essential']
 
-        # Fields parsed from the JSON description
-        self.image_name = self.description['image']
-        self.is_monitor = self.description['monitor']
-        self.startup_order = self.description['startup_order']
-        self.environment = self.description['environment']
-        self.command = self.description['command']
-        self.resource_reservation = ResourceReservation(self.description['resources'])
-        self.volumes = [VolumeDescriptionHostPath(v['name'], v['path'], v['read_only']) for v in self.description['volumes']]
-
-        # Optional zapp fields
-        try:
-            self.work_dir = self.description['work_dir']
-        except KeyError:
-            self.work_dir = None
-
-        try:
-            self.labels = self.description['labels']
-        except KeyError:
-            self.labels = []
+        # Set when the ports are loaded together with the service, see ServiceTable.select()
+        self.prefetched_ports = None
+
+        # Built from the JSON description on first access
+        self._resource_reservation = None
+        self._volumes = None
 
     def serialize(self):
         """Generates a dictionary that can be serialized in JSON."""
@@ -216,7 +206,6 @@ class Service(BaseRecord):
             for port in self.ports:
                 port.reset()
             self.ip_address = None
-            self.sql_manager.services.update(self.id, backend_status=new_status, ip_address=None)
             if new_status == self.BACKEND_DESTROY_STATUS:
                 self.backend_id = None
                 self.sql_manager.services.update(self.id, backend_status=new_status, backend_id=None, ip_address=None)
@@ -230,6 +219,55 @@ class Service(BaseRecord):
         self.sql_manager.services.update(self.id, backend_host=backend_host)
         self.backend_host = backend_host
 
+    @property
+    def image_name(self):
+        """The container image."""
+        return self.description['image']
+
+    @property
+    def is_monitor(self):
+        """The execution terminates when a monitor service terminates."""
+        return self.description['monitor']
+
+    @property
+    def startup_order(self):
+        """Services are started in ascending startup order."""
+        return self.description['startup_order']
+
+    @property
+    def environment(self):
+        """The environment variables defined in the ZApp."""
+        return self.description['environment']
+
+    @property
+    def command(self):
+        """The command to run in the container, or None."""
+        return self.description['command']
+
+    @property
+    def work_dir(self):
+        """The working directory of the command, or None."""
+        return self.description.get('work_dir', None)
+
+    @property
+    def labels(self):
+        """The labels used to select the hosts the service can run on."""
+        return self.description.get('labels', [])
+
+    @property
+    def resource_reservation(self) -> ResourceReservation:
+        """The resources reserved by this service."""
+        if self._resource_reservation is None:
+            self._resource_reservation = ResourceReservation(self.description['resources'])
+        return self._resource_reservation
+
+    @property
+    def volumes(self):
+        """The volumes to mount in the container."""
+        if self._volumes is None:
+            self._volumes = [VolumeDescriptionHostPath(v['name'], v['path'], v['read_only']) for v in self.description['volumes']]
+        return self._volumes
+
     @property
     def dns_name(self):
         """Getter for the DNS name of this service as it will be registered in Docker's DNS."""
@@ -244,6 +282,8 @@ class Service(BaseRecord):
     @property
     def ports(self):
         """Getter for the ports exposed by this service."""
+        if self.prefetched_ports is not None:
+            return self.prefetched_ports
         return self.sql_manager.ports.select(service_id=self.id)
 
     @property
@@ -276,6 +316,11 @@ class Service(BaseRecord):
 
 class ServiceTable(BaseTable):
     """Abstraction for the service table in the database."""
+
+    record_class = Service
+    parent_table = 'execution'
+    parent_column = 'execution_id'
+
     def __init__(self, sql_manager):
         super().__init__(sql_manager, "service")
 
@@ -300,12 +345,24 @@ class ServiceTable(BaseTable):
     def insert(self, execution_id, name, service_group, description, is_essential):
         """Adds a new service to the state."""
         status = Service.CREATED_STATUS
-        query = self.cursor.mogrify('INSERT INTO service (id, status, execution_id, name, service_group, description, essential) VALUES (DEFAULT,%s,%s,%s,%s,%s,%s) RETURNING id', (status, execution_id, name, service_group, description, is_essential))
+        query = self.cursor.mogrify('INSERT INTO service (id, status, execution_id, name, service_group, description, essential) VALUES (DEFAULT,%s,%s,%s,%s,%s,%s) RETURNING *', (status, execution_id, name, service_group, description, is_essential))
         self.cursor.execute(query)
         self.sql_manager.commit()
-        return self.cursor.fetchone()[0]
+        return self._inserted(self.cursor.fetchone())
 
-    def select(self, only_one=False, limit=-1, **kwargs):
+    def insert_many(self, execution_id, services):
+        """
+        Adds many services of the same execution to the state, with a single commit.
+
+        :param execution_id: the execution the services belong to
+        :param services: a list of (name, service_group, description, is_essential) tuples
+        :return: the IDs of the new services, in the same order
+        """
+        rows = [(Service.CREATED_STATUS, execution_id, name, service_group, description, is_essential) for name, service_group, description, is_essential in services]
+        new_rows = self._insert_many(('status', 'execution_id', 'name', 'service_group', 'description', 'essential'), rows)
+        return [row['id'] for row in new_rows]
+
+    def select(self, only_one=False, limit=-1, prefetch=(), **kwargs):
         """
         Return a list of services.
 
@@ -313,16 +370,24 @@ class ServiceTable(BaseTable):
         :type only_one: bool
         :param limit: limit the result to this number of entries
         :type limit: int
-        :param kwargs: filter services based on their fields/columns
+        :param prefetch: load also the ports of the selected services, with one additional query, by passing ('ports',)
+        :type prefetch: tuple
+        :param kwargs: filter services based on their fields/columns, user_id selects the services of the executions owned by a user
         :return: one or more services
         """
+        cached = self._cached_select(only_one, limit, kwargs)
+        if cached is not None:
+            return cached
+
         q_base = 'SELECT * FROM service'
         if len(kwargs) > 0:
             q = q_base + " WHERE "
             filter_list = []
             args_list = []
             for key, value in kwargs.items():
-                if key.startswith('not_'):
+                if key == 'user_id':
+                    filter_list.append('execution_id IN (SELECT id FROM execution WHERE user_id = %s)')
+                elif key.startswith('not_'):
                     filter_list.append('{} != %s'.format(key[4:]))
                 else:
                     filter_list.append('{} = %s'.format(key))
@@ -336,11 +401,21 @@ class ServiceTable(BaseTable):
                 q_base += ' ORDER BY id DESC LIMIT {}'.format(limit)
             query = self.cursor.mogrify(q_base)
 
-        self.cursor.execute(query)
-        if only_one:
-            row = self.cursor.fetchone()
-            if row is None:
-                return None
-            return Service(row, self.sql_manager)
-        else:
-            return [Service(x, self.sql_manager) for x in self.cursor]
+        self._execute_select(query, limit, kwargs)
+        services = self._load_records(only_one, limit, kwargs)
+        if only_one and services is not None:
+            self._prefetch([services], prefetch)
+        elif not only_one:
+            self._prefetch(services, prefetch)
+        return services
+
+    def _prefetch(self, records, prefetch, include_archive=False):
+        """Load the ports of all the services in records with a single query."""
+        unknown = set(prefetch) - {'ports'}
+        if len(unknown) > 0:
+            raise ValueError('Table {} cannot prefetch {}'.format(self.table_name, unknown))
+        if 'ports' not in prefetch:
+            return
+        ports = self.sql_manager.ports.select_by_parents([s.id for s in records], include_archive=include_archive)
+        for service in records:
+            service.prefetched_ports = ports[service.id]
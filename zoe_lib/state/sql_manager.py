@@ -15,73 +15,329 @@
 
 """Interface to PostgresQL for Zoe state."""
 
+from contextlib import contextmanager
 import logging
+import threading
+import time
+import weakref
 
 import psycopg2
 import psycopg2.extras
 
 from zoe_lib.config import get_conf
-from zoe_lib.version import SQL_SCHEMA_VERSION
-import zoe_lib.exceptions
 
 from .service import ServiceTable
 from .execution import ExecutionTable
+from .instrumentation import InstrumentedCursor, QueryTrace, tracing
+from .migrations import BASE_SCHEMA_VERSION, upgrade_schema
 from .port import PortTable
+from .pool import ConnectionPool
+from .record_cache import RecordCache
 
 log = logging.getLogger(__name__)
 
 psycopg2.extensions.register_adapter(dict, psycopg2.extras.Json)
 
+REPLICA_LAG_CHECK_INTERVAL = 1  # seconds a replication lag measurement is reused
+
 
 class SQLManager:
-    """The SQLManager class, should be used as a singleton."""
-    def __init__(self, conf):
+    """
+    The SQLManager class, should be used as a singleton.
+
+    It can be shared between threads: each thread uses its own connection, taken from a pool of at most conf.dbpoolsize connections.
+
+    If record_cache is True, records are kept in an identity map and reads by ID or by parent record are served from memory. Enable it only in
+    processes that perform all the writes to the state tables through this instance, like the master.
+
+    If read_replica is True and a replica is configured (conf.dbreplicahost), selects run inside a replica_reads() block are sent to the
+    replica, see replica_reads(). The master never uses the replica.
+
+    If conf.dbquerybudget is greater than zero, the queries run inside a trace() block are recorded and operations that exceed the budget
+    are logged, see trace().
+    """
+    def __init__(self, conf, record_cache=False, read_replica=False):
         self.user = conf.dbuser
         self.password = conf.dbpass
         self.host = conf.dbhost
         self.port = conf.dbport
         self.dbname = conf.dbname
         self.schema = conf.deployment_name
-        self.conn = None
-        self._connect()
+        self.cache = RecordCache() if record_cache else None
+        self.pool = ConnectionPool(self._connect, conf.dbpoolsize)
+        if read_replica and conf.dbreplicahost != '':
+            self.replica_host = conf.dbreplicahost
+            self.replica_port = conf.dbreplicaport
+            self.replica_max_lag = conf.dbreplicamaxlag
+            self.replica_pool = ConnectionPool(self._connect_replica, conf.dbpoolsize)
+        else:
+            self.replica_pool = None
+        self._replica_lag = (None, 0)  # (lag in seconds or None if the replica cannot be used, time of the measurement)
+        self._recent_writes = {}  # session -> time of its last write
+        self.replica_reads_count = 0
+        self.replica_fallbacks = 0
+        self._local = threading.local()
+        self._prepared = weakref.WeakKeyDictionary()  # connection -> {statement: name}
+        self._prepared_lock = threading.Lock()
+        self.count_cache = {}  # (table, filters) -> (count, time), bounded, see ExecutionTable.count()
+        self.query_budget = conf.dbquerybudget
+        self.pool.connection()
 
-    def _connect(self):
+    def _connect(self, host=None, port=None):
         dsn = 'dbname=' + self.dbname + \
               ' user=' + self.user + \
               ' password=' + self.password + \
-              ' host=' + self.host + \
-              ' port=' + str(self.port)
+              ' host=' + (self.host if host is None else host) + \
+              ' port=' + str(self.port if port is None else port) + \
+              " options='-c search_path=" + self.schema + ",public'"
 
-        self.conn = psycopg2.connect(dsn)
+        return psycopg2.connect(dsn)
 
-    def cursor(self):
-        """Get a cursor, making sure the connection to the database is established."""
+    def _connect_replica(self):
+        conn = self._connect(self.replica_host, self.replica_port)
+        conn.set_session(readonly=True, autocommit=True)  # do not keep snapshots open on the replica between reads
+        return conn
+
+    @property
+    def conn(self):
+        """The database connection used by the calling thread, a replica connection inside a replica_reads() block that can use it."""
+        if getattr(self._local, 'replica', False) and not self.in_transaction:
+            return self.replica_pool.connection()
+        return self.pool.connection()
+
+    @contextmanager
+    def replica_reads(self, session):
+        """
+        Send the selects run by the calling thread inside this block to the read replica, if one is configured.
+
+        The primary is used instead if the replica lags behind by more than conf.dbreplicamaxlag seconds, or if the session (for example a user
+        ID) has written to the state recently, so that a session always reads its own writes, see note_write(). Only reads can be done inside
+        the block, records loaded inside the block use the primary when they are used later.
+        """
+        if self.replica_pool is None or getattr(self._local, 'replica', False) or self.in_transaction or not self._replica_usable(session):
+            yield
+            return
+        self._local.replica = True
         try:
-            cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        except psycopg2.InterfaceError:
-            self._connect()
-            cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute('SET search_path TO {},public'.format(self.schema))
-        return cur
+            yield
+        finally:
+            self._local.replica = False
+
+    def note_write(self, session):
+        """The session has changed the state, its reads go to the primary until the replica is guaranteed to have the change."""
+        if self.replica_pool is None:
+            return
+        now = time.monotonic()
+        self._recent_writes[session] = now
+        for old_session, write_time in list(self._recent_writes.items()):
+            if now - write_time > self.replica_max_lag + REPLICA_LAG_CHECK_INTERVAL:
+                self._recent_writes.pop(old_session, None)
+
+    def _replica_usable(self, session):
+        now = time.monotonic()
+        write_time = self._recent_writes.get(session)
+        if write_time is not None and now - write_time <= self.replica_max_lag + REPLICA_LAG_CHECK_INTERVAL:
+            self.replica_fallbacks += 1
+            return False
+        lag, measured_at = self._replica_lag
+        if now - measured_at > REPLICA_LAG_CHECK_INTERVAL:
+            lag = self._measure_replica_lag()
+            self._replica_lag = (lag, now)
+        if lag is None or lag > self.replica_max_lag:
+            self.replica_fallbacks += 1
+            return False
+        self.replica_reads_count += 1
+        return True
+
+    def _measure_replica_lag(self):
+        """
+        Return the replication lag in seconds, or None if the replica cannot be used.
+
+        The replica is up to date if it has replayed the WAL the primary had written when the check started. Otherwise the lag is the time
+        since the last transaction it replayed: a replica that stopped receiving the WAL falls behind the primary and its lag keeps growing.
+        """
+        try:
+            cur = self.pool.connection().cursor()
+            cur.execute('SELECT pg_current_wal_lsn()')
+            primary_lsn = cur.fetchone()[0]
+            cur.close()
+            cur = self.replica_pool.connection().cursor()
+            cur.execute('''SELECT CASE WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+                           ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END''', (primary_lsn,))
+            lag = cur.fetchone()[0]
+            cur.close()
+        except Exception as e:
+            log.warning('Cannot check the read replica, using the primary: {}'.format(e))
+            return None
+        if lag is None:
+            log.warning('The read replica has not replayed any transaction, using the primary')
+            return None
+        lag = float(lag)
+        if lag > self.replica_max_lag:
+            log.warning('The read replica is {:.1f}s behind, using the primary'.format(lag))
+        return lag
+
+    def cursor(self):
+        """Get a cursor, making sure the connection to the database is established. The search path is set when the connection is opened."""
+        return self.conn.cursor(cursor_factory=InstrumentedCursor)
+
+    @contextmanager
+    def trace(self, name):
+        """
+        Record the queries run by the calling thread inside this block, with their latency, row count and call site.
+
+        At the end of the block a warning is logged if more than conf.dbquerybudget queries were executed or if the same statement was run
+        many times from the same place (an N+1 pattern), see QueryTrace.report(). Does nothing if the budget is zero.
+        """
+        if self.query_budget <= 0:
+            yield None
+            return
+        with tracing(QueryTrace(name)) as query_trace:
+            yield query_trace
+        query_trace.report(self.query_budget)
+
+    def execute_prepared(self, cursor, statement, args):
+        """Execute a statement with $n placeholders as a server-side prepared statement, preparing it the first time it is used on a connection."""
+        conn = cursor.connection
+        prepared = self._prepared.get(conn)
+        if prepared is None:
+            with self._prepared_lock:
+                prepared = self._prepared.setdefault(conn, {})
+        name = prepared.get(statement)
+        if name is None:
+            name = 'zoe_stmt_{}'.format(len(prepared))
+            cursor.execute('PREPARE {} AS {}'.format(name, statement))
+            prepared[statement] = name
+        if isinstance(cursor, InstrumentedCursor):
+            cursor.statement = statement
+        cursor.execute('EXECUTE {} ({})'.format(name, ', '.join(['%s'] * len(args))), args)
 
     def commit(self):
-        """Commit a transaction."""
+        """Commit a transaction. Inside a unit of work the commit is delayed until the end of the outermost transaction() block."""
+        if self.in_transaction:
+            return
         self.conn.commit()
 
+    @property
+    def in_transaction(self) -> bool:
+        """True if the calling thread is inside a transaction() block."""
+        return getattr(self._local, 'pending', None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work for record state changes.
+
+        Inside the block record updates are not sent to the database: changes to the same record are coalesced and written with one UPDATE
+        per record, with a single commit at the end of the block. Pending updates are flushed before any select, so that reads see them.
+        Nested blocks join the outer one. If an exception is raised the transaction is rolled back and all the records changed or inserted in
+        the block, flushed or not, are dropped from the record cache, see touch().
+        """
+        if self.in_transaction:
+            yield
+            return
+        self._local.pending = {}
+        self._local.touched = set()
+        try:
+            yield
+            self.flush()
+            self.conn.commit()
+        except BaseException:
+            touched = self._local.touched
+            self._local.pending = None
+            self._local.touched = None
+            self.conn.rollback()
+            if self.cache is not None:
+                for table_name, record_id in touched:
+                    self.cache.remove(table_name, record_id)  # the in-memory state is ahead of the database, reload it
+            raise
+        self._local.pending = None
+        self._local.touched = None
+
+    def touch(self, table_name, record_id):
+        """A record has been changed in the record cache by the current unit of work, drop it from the cache if the transaction is rolled back."""
+        if self.in_transaction:
+            self._local.touched.add((table_name, record_id))
+
+    def defer_update(self, table, record_id, columns) -> bool:
+        """Add an update to the current unit of work, return False if there is no transaction in progress and the update must be written now."""
+        if not self.in_transaction:
+            return False
+        key = (table.table_name, record_id)
+        self._local.touched.add(key)
+        if key in self._local.pending:
+            self._local.pending[key][1].update(columns)
+        else:
+            self._local.pending[key] = (table, dict(columns))
+        return True
+
+    def discard_update(self, table_name, record_id):
+        """Drop the pending update for a record that is being deleted."""
+        if self.in_transaction:
+            self._local.pending.pop((table_name, record_id), None)
+
+    def flush(self):
+        """Write the pending updates of the current unit of work to the database, without committing."""
+        if not self.in_transaction:
+            return
+        pending = self._local.pending
+        while len(pending) > 0:
+            key = next(iter(pending))
+            table, columns = pending.pop(key)
+            table.write_update(key[1], columns)
+
+    def release(self):
+        """Give the connection used by the calling thread back to the pool, to be called by threads that have finished using the state."""
+        self.pool.release()
+        if self.replica_pool is not None:
+            self.replica_pool.release()
+
+    def invalidate(self, table_name=None, record_id=None):
+        """Drop records from the record cache, see RecordCache.invalidate()."""
+        if self.cache is not None:
+            self.cache.invalidate(table_name, record_id)
+
+    def stats(self):
+        """Statistics about the state management layer."""
+        ret = {'pool': self.pool.stats()}
+        if self.cache is not None:
+            ret['record_cache'] = self.cache.stats()
+        if self.replica_pool is not None:
+            ret['replica'] = {
+                'pool': self.replica_pool.stats(),
+                'reads': self.replica_reads_count,
+                'fallbacks': self.replica_fallbacks,
+                'lag': self._replica_lag[0]
+            }
+        return ret
+
+    def _table(self, table_class):
+        """Return the handle for a table, table handles are kept for the lifetime of the connection used by the calling thread."""
+        conn = self.conn
+        tables = getattr(self._local, 'tables', None)
+        if tables is None or (conn not in tables and len(tables) >= 2):  # one set of handles for the primary and one for the replica
+            tables = self._local.tables = {}
+        conn_tables = tables.setdefault(conn, {})
+        try:
+            return conn_tables[table_class]
+        except KeyError:
+            table = conn_tables[table_class] = table_class(self)
+            return table
+
     @property
     def executions(self) -> ExecutionTable:
         """Access the execution state."""
-        return ExecutionTable(self)
+        return self._table(ExecutionTable)
 
     @property
     def services(self) -> ServiceTable:
         """Access the service state."""
-        return ServiceTable(self)
+        return self._table(ServiceTable)
 
     @property
     def ports(self) -> PortTable:
         """Access the port state."""
-        return PortTable(self)
+        return self._table(PortTable)
 
     def _create_tables(self):
         self.executions.create()
@@ -99,25 +355,26 @@ class SQLManager:
         if force:
             cur.execute("DELETE FROM public.versions WHERE deployment = %s", (get_conf().deployment_name,))
             cur.execute('DROP SCHEMA IF EXISTS {} CASCADE'.format(get_conf().deployment_name))
+            self.invalidate()
 
-        if not self._check_schema_version(cur, get_conf().deployment_name):
+        version = self._check_schema_version(cur, get_conf().deployment_name)
+        if version is None:
             self._create_tables()
+            version = BASE_SCHEMA_VERSION
+        upgrade_schema(cur, get_conf().deployment_name, version)
 
         self.commit()
         cur.close()
 
     def _check_schema_version(self, cur, deployment_name):
-        """Check if the schema version matches this source code version."""
+        """Return the schema version of a deployment, or None if its tables need to be created."""
+        cur.execute("LOCK TABLE public.versions IN EXCLUSIVE MODE")  # only one process at a time can create or upgrade the schema
         cur.execute("SELECT version FROM public.versions WHERE deployment = %s", (deployment_name,))
         row = cur.fetchone()
         if row is None:
-            cur.execute("INSERT INTO public.versions (deployment, version) VALUES (%s, %s)", (deployment_name, SQL_SCHEMA_VERSION))
+            cur.execute("INSERT INTO public.versions (deployment, version) VALUES (%s, %s)", (deployment_name, BASE_SCHEMA_VERSION))
             cur.execute("SELECT EXISTS(SELECT 1 FROM pg_catalog.pg_namespace WHERE nspname = %s)", (deployment_name,))
             if not cur.fetchone()[0]:
                 cur.execute('CREATE SCHEMA {}'.format(deployment_name))
-            return False  # Tables need to be created
-        else:
-            if row[0] == SQL_SCHEMA_VERSION:
-                return True
-            else:
-                raise zoe_lib.exceptions.ZoeLibException('SQL database schema version mismatch: need {}, found {}'.format(SQL_SCHEMA_VERSION, row[0]))
+            return None
+        return row[0]
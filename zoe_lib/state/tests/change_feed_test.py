@@ -0,0 +1,38 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the state change feed."""
+
+import json
+
+from zoe_lib.state.change_feed import ExecutionChange, ServiceChange, parse_notification
+
+
+class TestChangeFeed:
+    """The test class."""
+
+    def test_parse_execution(self):
+        """Execution notifications are parsed."""
+        payload = json.dumps({'table': 'execution', 'id': 3, 'old_status': 'scheduled', 'status': 'starting'})
+        assert parse_notification(payload) == ExecutionChange(3, 'scheduled', 'starting')
+
+    def test_parse_service(self):
+        """Service notifications are parsed."""
+        payload = json.dumps({'table': 'service', 'id': 7, 'execution_id': 3, 'old_status': 'active', 'status': 'active',
+                              'old_backend_status': 'started', 'backend_status': 'dead'})
+        event = parse_notification(payload)
+        assert isinstance(event, ServiceChange)
+        assert event.backend_status == 'dead'
+        assert event.execution_id == 3
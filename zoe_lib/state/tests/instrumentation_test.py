@@ -0,0 +1,54 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the query instrumentation."""
+
+import pytest
+
+from zoe_lib.state.instrumentation import N_PLUS_ONE_THRESHOLD, QueryTrace, normalize, record_statement, tracing
+from zoe_lib.state.tests.query_count import assert_query_count
+
+
+class TestInstrumentation:
+    """The test class."""
+
+    def test_normalize(self):
+        """Literal values are replaced, so that the same statement with different arguments is grouped."""
+        assert normalize(b"SELECT * FROM service WHERE  execution_id = 12 AND name = 'it''s'") == 'SELECT * FROM service WHERE execution_id = ? AND name = ?'
+        assert normalize('SELECT * FROM port WHERE service_id IN (1, 2, 3)') == 'SELECT * FROM port WHERE service_id IN (?)'
+        assert normalize('EXECUTE zoe_stmt_0 (5)') == 'EXECUTE zoe_stmt_0 (?)'
+
+    def test_n_plus_one(self):
+        """The same statement run many times from the same place is reported."""
+        trace = QueryTrace('test')
+        with tracing(trace):
+            record_statement('SELECT * FROM execution', 0.001, 10)
+            for service_id in range(N_PLUS_ONE_THRESHOLD):
+                record_statement('SELECT * FROM port WHERE service_id = {}'.format(service_id), 0.001, 1)
+        record_statement('SELECT 1', 0.001, 1)  # outside of the block
+        assert trace.count == N_PLUS_ONE_THRESHOLD + 1
+        suspects = trace.n_plus_one()
+        assert len(suspects) == 1
+        assert suspects[0][0] == 'SELECT * FROM port WHERE service_id = ?'
+        assert suspects[0][1].startswith('zoe_lib')
+        assert suspects[0][2] == N_PLUS_ONE_THRESHOLD
+
+    def test_assert_query_count(self):
+        """The helper fails when the number of queries is not the expected one."""
+        with assert_query_count(1):
+            record_statement('SELECT 1', 0.001, 1)
+        with pytest.raises(AssertionError):
+            with assert_query_count(0):
+                record_statement('SELECT 1', 0.001, 1)
@@ -0,0 +1,54 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the schema migrations."""
+
+import pytest
+
+from zoe_lib.exceptions import ZoeLibException
+from zoe_lib.state.migrations import BASE_SCHEMA_VERSION, MIGRATIONS, upgrade_schema
+from zoe_lib.version import SQL_SCHEMA_VERSION
+
+
+class FakeCursor:
+    """Records the executed statements."""
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, args=None):
+        """Execute a statement."""
+        self.statements.append((statement, args))
+
+
+class TestMigrations:
+    """The test class."""
+
+    def test_all_versions(self):
+        """There is a migration for each schema version."""
+        assert sorted(MIGRATIONS.keys()) == list(range(BASE_SCHEMA_VERSION + 1, SQL_SCHEMA_VERSION + 1))
+
+    def test_upgrade(self):
+        """All the migrations are applied and the version is updated."""
+        cur = FakeCursor()
+        upgrade_schema(cur, 'test', BASE_SCHEMA_VERSION)
+        assert cur.statements[-1][1] == (SQL_SCHEMA_VERSION, 'test')
+        cur = FakeCursor()
+        upgrade_schema(cur, 'test', SQL_SCHEMA_VERSION)
+        assert len(cur.statements) == 0
+
+    def test_unknown_version(self):
+        """Schemas newer than the code cannot be used."""
+        with pytest.raises(ZoeLibException):
+            upgrade_schema(FakeCursor(), 'test', SQL_SCHEMA_VERSION + 1)
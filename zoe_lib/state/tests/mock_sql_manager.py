@@ -15,23 +15,115 @@
 
 """Mock SQL Manager for unit testing."""
 
+import re
 import sqlite3
 from collections import namedtuple
 
+from zoe_lib.state.instrumentation import record_statement
 from zoe_lib.state.sql_manager import SQLManager
 
 
-Conf = namedtuple('Conf', ['dbuser', 'dbpass', 'dbhost', 'dbport', 'dbname', 'deployment_name'])
+Conf = namedtuple('Conf', ['dbuser', 'dbpass', 'dbhost', 'dbport', 'dbname', 'dbpoolsize', 'dbquerybudget', 'deployment_name'])
+
+
+class MockConnection(sqlite3.Connection):
+    """An SQLite connection with the attributes used by the connection pool."""
+    closed = 0
 
 
 class MockSQLManager(SQLManager):
     """A mock SQL manager."""
-    def __init__(self):
-        fake_conf = Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', deployment_name='test')
-        super().__init__(fake_conf)
+    def __init__(self, record_cache=False):
+        fake_conf = Conf(dbuser='', dbpass='', dbhost='', dbport=5432, dbname='', dbpoolsize=1, dbquerybudget=0, deployment_name='test')
+        super().__init__(fake_conf, record_cache=record_cache)
 
     def _connect(self):
-        self.conn = sqlite3.connect(':memory:')
+        return sqlite3.connect(':memory:', factory=MockConnection)
 
     def _cursor(self):
         return self.conn.cursor()
+
+
+class MockCursor:
+    """A cursor that returns all the rows of the table named in the FROM clause of a query, without evaluating the rest of the query."""
+    def __init__(self, connection):
+        self.connection = connection
+        self.tables = connection.tables
+        self.rows = []
+        self.rowcount = -1
+
+    def mogrify(self, query, args=None):
+        """Replace the placeholders with SQL literals."""
+        if args is not None:
+            query = query % tuple(self._literal(arg) for arg in args)
+        return query.encode('utf-8')
+
+    def _literal(self, value):
+        if isinstance(value, (list, tuple)):
+            return 'ARRAY[' + ', '.join(self._literal(v) for v in value) + ']'
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        return str(value)
+
+    def execute(self, query, args=None):
+        """Run a query and record it in the active traces, see zoe_lib.state.instrumentation."""
+        if isinstance(query, str):
+            query = self.mogrify(query, args)
+        statement = query.decode('utf-8')
+        prepare = re.match(r'PREPARE (\w+) AS (.*)', statement)
+        if prepare is not None:
+            self.connection.prepared[prepare.group(1)] = prepare.group(2)
+        prepared = re.match(r'EXECUTE (\w+)', statement)
+        if prepared is not None:
+            statement = self.connection.prepared[prepared.group(1)]
+        table = re.search(r'FROM (\w+)', statement)
+        self.rows = list(self.tables.get(table.group(1), [])) if table is not None else []
+        self.rowcount = len(self.rows)
+        record_statement(query, 0.0, self.rowcount)
+
+    def fetchone(self):
+        """Return the next row, or None."""
+        return self.rows.pop(0) if len(self.rows) > 0 else None
+
+    def fetchall(self):
+        """Return the remaining rows."""
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        """Nothing to release."""
+
+
+class MockConnectionToTables:
+    """A connection to in-memory tables, a dictionary of lists of rows indexed by table name."""
+    closed = 0
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.prepared = {}
+
+    def cursor(self, cursor_factory=None):  # pylint: disable=unused-argument
+        """Return a new cursor."""
+        return MockCursor(self)
+
+    def commit(self):
+        """Nothing to commit."""
+
+    def rollback(self):
+        """Nothing to roll back."""
+
+    def close(self):
+        """Nothing to close."""
+
+
+class MockTablesSQLManager(MockSQLManager):
+    """A mock SQL manager that reads rows from in-memory tables and records its queries, for tests that count queries."""
+    def __init__(self, tables, record_cache=False):
+        self.tables = tables
+        super().__init__(record_cache)
+
+    def _connect(self):
+        return MockConnectionToTables(self.tables)
@@ -0,0 +1,70 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the connection pool."""
+
+import threading
+
+from zoe_lib.state.pool import ConnectionPool
+
+
+class FakeConnection:
+    """A connection that does nothing."""
+    closed = 0
+
+    def rollback(self):
+        """Rollback a transaction."""
+
+    def close(self):
+        """Close the connection."""
+        self.closed = 1
+
+
+def _in_thread(func):
+    ret = []
+    th = threading.Thread(target=lambda: ret.append(func()))
+    th.start()
+    th.join()
+    return ret[0]
+
+
+class TestConnectionPool:
+    """The test class."""
+
+    def test_per_thread(self):
+        """Each thread gets its own connection, and keeps it."""
+        pool = ConnectionPool(FakeConnection, 2)
+        conn = pool.connection()
+        assert pool.connection() is conn
+        assert _in_thread(pool.connection) is not conn
+        assert pool.stats()['created'] == 2
+
+    def test_reclaim(self):
+        """Connections of terminated threads are reused when the pool is full."""
+        pool = ConnectionPool(FakeConnection, 1)
+        conn = _in_thread(pool.connection)
+        assert pool.connection() is conn
+        assert pool.stats()['in_use'] == 1
+
+    def test_release_and_reconnect(self):
+        """Released connections go back to the pool, closed connections are replaced."""
+        pool = ConnectionPool(FakeConnection, 1)
+        conn = pool.connection()
+        pool.release()
+        assert pool.stats()['idle'] == 1
+        assert pool.connection() is conn
+        conn.close()
+        assert pool.connection() is not conn
+        assert pool.stats()['reconnects'] == 1
@@ -0,0 +1,30 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test helper to check the number of queries run by an operation."""
+
+from contextlib import contextmanager
+
+from zoe_lib.state.instrumentation import QueryTrace, tracing
+
+
+@contextmanager
+def assert_query_count(expected):
+    """Fail if the code inside the block does not run exactly the expected number of queries, the failure lists the queries."""
+    with tracing(QueryTrace('assert_query_count')) as trace:
+        yield trace
+    if trace.count != expected:
+        queries = '\n'.join('{} {}'.format(call_site, statement) for statement, duration, rowcount, call_site in trace.statements)
+        raise AssertionError('Expected {} queries, {} were executed:\n{}'.format(expected, trace.count, queries))
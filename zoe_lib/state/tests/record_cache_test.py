@@ -0,0 +1,64 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the record cache."""
+
+from zoe_lib.state.base import BaseRecord
+from zoe_lib.state.record_cache import RecordCache
+
+
+class FakeRecord(BaseRecord):
+    """A record with a status column."""
+    def __init__(self, d, sql_manager):
+        super().__init__(d, sql_manager)
+        self.status = d['status']
+
+    def serialize(self):
+        """Generates a dictionary that can be serialized in JSON."""
+        return {'id': self.id, 'status': self.status}
+
+
+class TestRecordCache:
+    """The test class."""
+
+    def test_identity(self):
+        """The same instance is returned for the same table and ID."""
+        cache = RecordCache()
+        first = cache.add('service', FakeRecord({'id': 1, 'status': 'created'}, None))
+        second = cache.add('service', FakeRecord({'id': 1, 'status': 'created'}, None))
+        assert first is second
+        assert cache.get('service', '1') is first
+        assert cache.get('port', 1) is None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_write_through(self):
+        """Updates are applied to the cached instance."""
+        cache = RecordCache()
+        record = cache.add('service', FakeRecord({'id': 1, 'status': 'created'}, None))
+        cache.update('service', 1, {'status': 'active'})
+        assert record.status == 'active'
+
+    def test_remove_cascade(self):
+        """Removing a parent record drops its children."""
+        cache = RecordCache()
+        cache.add('execution', FakeRecord({'id': 1, 'status': 'running'}, None))
+        cache.set_children('service', 'execution', 1, [FakeRecord({'id': 10, 'status': 'active'}, None)])
+        cache.set_children('port', 'service', 10, [FakeRecord({'id': 100, 'status': None}, None)])
+        assert len(cache.get_children('service', 1)) == 1
+        cache.remove('execution', 1)
+        assert cache.get_children('service', 1) is None
+        assert cache.get_children('port', 10) is None
+        assert cache.stats()['records'] == 0
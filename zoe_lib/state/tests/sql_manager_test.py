@@ -0,0 +1,59 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the SQL manager."""
+
+import datetime
+
+import pytest
+
+from zoe_lib.state import Execution, Service
+from zoe_lib.state.tests.mock_sql_manager import MockTablesSQLManager
+
+
+def _service_row(service_id, status):
+    return {'id': service_id, 'name': 's{}'.format(service_id), 'status': status, 'error_message': None, 'execution_id': 1, 'description': {},
+            'service_group': 'test', 'backend_id': None, 'backend_status': Service.BACKEND_UNDEFINED_STATUS, 'backend_host': None,
+            'ip_address': None, 'essential': True, 'restart_count': 0}
+
+
+class TestSQLManager:
+    """The test class."""
+
+    def test_rollback_evicts_cache(self):
+        """After a failed transaction the records it changed or inserted, also the flushed ones, are reloaded from the database."""
+        tables = {
+            'execution': [{'id': 1, 'name': 'test', 'user_id': 'test', 'description': {}, 'status': Execution.SUBMIT_STATUS, 'size': 1,
+                           'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(), 'time_start': None, 'time_end': None,
+                           'error_message': None}],
+            'service': [_service_row(10, Service.CREATED_STATUS)],
+            'port': []
+        }
+        state = MockTablesSQLManager(tables, record_cache=True)
+        service = state.services.select(id=10, only_one=True)
+        assert len(state.executions.select(id=1, only_one=True).services) == 1
+
+        with pytest.raises(ValueError):
+            with state.transaction():
+                state.services.update(10, status=Service.ACTIVE_STATUS)
+                state.executions.select(user_id='test')  # flushes the update
+                state.services._inserted(_service_row(11, Service.CREATED_STATUS))  # pylint: disable=protected-access
+                raise ValueError()
+
+        assert service.status == Service.ACTIVE_STATUS
+        assert state.cache.get('service', 10) is None
+        assert state.cache.get('service', 11) is None
+        assert state.services.select(id=10, only_one=True).status == Service.CREATED_STATUS
+        assert [s.id for s in state.executions.select(id=1, only_one=True).services] == [10]
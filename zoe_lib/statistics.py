@@ -40,3 +40,18 @@ class ZoeStatisticsAPI(ZoeAPIBase):
             raise ZoeAPIException(data['message'])
         else:
             return data
+
+    def execution_latency(self, **kwargs):
+        """
+        Queries Zoe for the percentiles of the queueing and startup latencies of the executions.
+
+        Supported arguments: group_by (zapp, user, hour, day or week), name, user_id (admin only), include_archive, earlier_than_submit and
+        later_than_submit.
+
+        :return: a list with one entry per group
+        """
+        data, status_code = self._rest_get('/statistics/execution_latency', kwargs)
+        if status_code != 200:
+            raise ZoeAPIException(data['message'])
+        else:
+            return data['report']
@@ -31,11 +31,18 @@ def zoe_configuration():
     zoe_api_args.dbuser = 'zoeuser'
     zoe_api_args.dbpass = 'zoepass'
     zoe_api_args.dbname = 'zoe'
+    zoe_api_args.dbpoolsize = 32
+    zoe_api_args.dbreplicahost = ''
+    zoe_api_args.dbreplicaport = 5432
+    zoe_api_args.dbreplicamaxlag = 5
+    zoe_api_args.dbquerybudget = 0
+    zoe_api_args.api_workers = 16
     zoe_api_args.api_listen_uri = 'tcp://*:4850'
     zoe_api_args.kairosdb_enable = False
     zoe_api_args.workspace_base_path = '/tmp'
     zoe_api_args.workspace_deployment_path = zoe_api_args.workspace_base_path
     zoe_api_args.overlay_network_name = 'zoe'
+    zoe_api_args.archive_age = 0
     zoe_api_args.gelf_listener = 0
     zoe_api_args.listen_address = '0.0.0.0'
     zoe_api_args.listen_port = 5100
@@ -45,7 +52,10 @@ def zoe_configuration():
     zoe_api_args.auth_file = 'zoepass.csv'
     zoe_api_args.scheduler_class = 'ZoeElasticScheduler'
     zoe_api_args.scheduler_policy = 'FIFO'
+    zoe_api_args.dynsize_aging_rate = 256 * 1024 ** 2
     zoe_api_args.backend = 'DockerEngine'
+    zoe_api_args.backend_start_concurrency = 8
+    zoe_api_args.backend_start_host_concurrency = 4
     zoe_api_args.backend_docker_config_file = 'integration_tests/sample_docker.conf'
     zoe_api_args.zapp_shop_path = 'contrib/zapp-shop-sample'
     zoe_api_args.log_file = 'stderr'
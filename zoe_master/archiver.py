@@ -0,0 +1,65 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Archival of terminated executions."""
+
+import logging
+import threading
+
+from zoe_lib.state import SQLManager  # pylint: disable=unused-import
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_INTERVAL = 3600  # seconds
+
+
+class ExecutionArchiver(threading.Thread):
+    """Thread that periodically moves old terminated executions, with their services and ports, to the archive tables."""
+
+    def __init__(self, state: SQLManager, max_age_days: int):
+        super().__init__(name='archiver', daemon=True)
+        self.state = state
+        self.max_age = max_age_days * 24 * 3600
+        self.stop = threading.Event()
+
+    def quit(self):
+        """Terminates the archiver thread."""
+        self.stop.set()
+        self.join()
+
+    def run(self):
+        """The thread loop."""
+        log.info('Archiver thread started, archiving executions terminated more than {} seconds ago'.format(self.max_age))
+        while not self.stop.is_set():
+            try:
+                self.archive()
+            except Exception:
+                log.exception('Error archiving executions')
+            finally:
+                self.state.release()
+            self.stop.wait(timeout=ARCHIVE_INTERVAL)
+        log.info('Archiver thread terminated')
+
+    def archive(self):
+        """Move all the executions that are old enough to the archive tables, in batches, and return how many were moved."""
+        count = 0
+        while not self.stop.is_set():
+            archived = self.state.executions.archive(self.max_age)
+            if len(archived) == 0:
+                break
+            count += len(archived)
+        if count > 0:
+            log.info('Archived {} terminated executions'.format(count))
+        return count
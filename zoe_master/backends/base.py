@@ -19,6 +19,7 @@ from typing import List
 
 from zoe_lib.state import Service
 from zoe_master.stats import ClusterStats
+from zoe_master.image_catalog import ImageCatalog
 from zoe_master.backends.service_instance import ServiceInstance
 
 
@@ -71,3 +72,7 @@ class BaseBackend:
     def list_available_images(self, node_name):
         """List the images available on the specified node."""
         raise NotImplementedError
+
+    def image_catalog(self) -> ImageCatalog:
+        """Return the catalog of the images available on the nodes, kept up to date by the back-end."""
+        raise NotImplementedError
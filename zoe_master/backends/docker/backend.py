@@ -196,6 +196,10 @@ class DockerEngineBackend(zoe_master.backends.base.BaseBackend):
         node_stats = _checker.host_stats[node_name]
         return node_stats.images
 
+    def image_catalog(self):
+        """Return the catalog of the images available on the nodes, kept up to date by the synchronizer threads."""
+        return _checker.image_catalog
+
     def update_service(self, service, cores=None, memory=None):
         """Update a service reservation."""
         conf = self._get_config(service.backend_host)
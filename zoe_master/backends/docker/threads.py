@@ -24,6 +24,7 @@ from zoe_lib.state import SQLManager, Service
 from zoe_master.backends.docker.api_client import DockerClient
 from zoe_master.backends.docker.config import DockerConfig, DockerHostConfig  # pylint: disable=unused-import
 from zoe_master.exceptions import ZoeException
+from zoe_master.image_catalog import ImageCatalog
 from zoe_master.stats import NodeStats
 
 log = logging.getLogger(__name__)
@@ -43,6 +44,7 @@ class DockerStateSynchronizer(threading.Thread):
         self.setDaemon(True)
         self.host_checkers = []
         self.host_stats = {}
+        self.image_catalog = ImageCatalog()
         for docker_host in DockerConfig(get_conf().backend_docker_config_file).read_config():
             th = threading.Thread(target=self._host_subthread, args=(docker_host,), name='synchro_' + docker_host.name, daemon=True)
             th.start()
@@ -83,21 +85,17 @@ class DockerStateSynchronizer(threading.Thread):
                 stats = {}
                 self.host_stats[host_config.name].memory_reserved = 0
                 self.host_stats[host_config.name].cores_reserved = 0
-                for cont in container_list:
-                    service = self.state.services.select(only_one=True, backend_host=host_config.name, backend_id=cont['id'])
-                    if service is None:
-                        log.warning('Container {} on host {} has no corresponding service'.format(cont['name'], host_config.name))
-                        if cont['state'] == Service.BACKEND_DIE_STATUS:
-                            log.warning('Terminating dead and orphan container {}'.format(cont['name']))
-                            my_engine.terminate_container(cont['id'], delete=True)
-                        continue
-                    self._update_service_status(service, cont)
+                to_update = self._match_containers(host_config, my_engine, container_list)
+                for service, cont in to_update:
                     self.host_stats[host_config.name].memory_reserved += service.resource_reservation.memory.min
                     self.host_stats[host_config.name].cores_reserved += service.resource_reservation.cores.min
                     stats[service.id] = {
                         'core_limit': cont['cpu_quota'] / cont['cpu_period'],
                         'mem_limit': cont['memory_soft_limit']
                     }
+                with self.state.transaction():  # status changes of all the containers are committed at once, no Docker calls in the block
+                    for service, cont in to_update:
+                        self._update_service_status(service, cont)
                 self.host_stats[host_config.name].service_stats = stats
 
                 self.host_stats[host_config.name].images = []
@@ -112,6 +110,7 @@ class DockerStateSynchronizer(threading.Thread):
                             image['names'].append(name[:-7])
                             break
                     self.host_stats[host_config.name].images.append(image)
+                self.image_catalog.update_node(host_config.name, [name for image in self.host_stats[host_config.name].images for name in image['names']])
 
             sleep_time = CHECK_INTERVAL - (time.time() - time_start)
             if sleep_time <= 0:
@@ -122,6 +121,21 @@ class DockerStateSynchronizer(threading.Thread):
 
         log.info("Synchro thread for host {} stopped".format(host_config.name))
 
+    def _match_containers(self, host_config: DockerHostConfig, my_engine: DockerClient, container_list):
+        """Return the (service, container) pairs of the containers running on a host, dead containers without a service are terminated."""
+        host_services = {service.backend_id: service for service in self.state.services.select(backend_host=host_config.name)}
+        ret = []
+        for cont in container_list:
+            service = host_services.get(cont['id'])
+            if service is None:
+                log.warning('Container {} on host {} has no corresponding service'.format(cont['name'], host_config.name))
+                if cont['state'] == Service.BACKEND_DIE_STATUS:
+                    log.warning('Terminating dead and orphan container {}'.format(cont['name']))
+                    my_engine.terminate_container(cont['id'], delete=True)
+                continue
+            ret.append((service, cont))
+        return ret
+
     def _update_service_status(self, service: Service, container):
         """Update the service status."""
         if service.backend_status != container['state']:
@@ -15,7 +15,10 @@
 
 """The high-level interface that Zoe uses to talk to the configured container backend."""
 
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import logging
+import threading
 import time
 from typing import List, Union
 
@@ -25,6 +28,7 @@ from zoe_lib.state import Execution, Service  # pylint: disable=unused-import
 from zoe_master.backends.base import BaseBackend
 from zoe_master.backends.service_instance import ServiceInstance
 from zoe_master.exceptions import ZoeStartExecutionFatalException, ZoeStartExecutionRetryException, ZoeException
+from zoe_master.image_catalog import ImageCatalog
 from zoe_master.stats import ClusterStats  # pylint: disable=unused-import
 
 try:
@@ -69,8 +73,76 @@ def shutdown_backend():
     backend.shutdown()
 
 
+def _spawn_services(backend: BaseBackend, instances: List[ServiceInstance]) -> list:
+    """
+    Spawn services in parallel, with at most backend-start-concurrency at the same time and backend-start-host-concurrency on the same host.
+
+    Returns, for each instance, the result of spawn_service(), the exception it raised or None if the service was not started because another
+    one failed.
+    """
+    if len(instances) == 1:
+        try:
+            return [backend.spawn_service(instances[0])]
+        except Exception as ex:  # pylint: disable=broad-except
+            return [ex]
+
+    failed = threading.Event()
+    host_limits = {instance.backend_host: threading.Semaphore(get_conf().backend_start_host_concurrency) for instance in instances if instance.backend_host is not None}
+
+    def spawn(instance):
+        """Spawn a service, unless another one has already failed."""
+        host_limit = host_limits.get(instance.backend_host)
+        if host_limit is not None:
+            host_limit.acquire()
+        try:
+            if failed.is_set():
+                return None  # the execution is going to be terminated
+            return backend.spawn_service(instance)
+        except Exception as ex:  # pylint: disable=broad-except
+            failed.set()
+            return ex
+        finally:
+            if host_limit is not None:
+                host_limit.release()
+
+    with ThreadPoolExecutor(max_workers=min(len(instances), get_conf().backend_start_concurrency)) as pool:
+        return list(pool.map(spawn, instances))
+
+
+def _start_failed(execution: Execution, service: Service, ex: Exception) -> str:
+    """Terminate an execution after one of its services failed to start, return 'requeue' for temporary failures and 'fatal' for fatal failures."""
+    state = execution.sql_manager
+    if isinstance(ex, ZoeStartExecutionRetryException):
+        log.warning('Temporary failure starting service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
+        with state.transaction():
+            service.set_error(ex.message)
+            execution.set_error_message(ex.message)
+        terminate_execution(execution)
+        execution.set_scheduled()
+        return "requeue"
+    elif isinstance(ex, ZoeStartExecutionFatalException):
+        log.error('Fatal error trying to start service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
+        with state.transaction():
+            service.set_error(ex.message)
+            execution.set_error_message(ex.message)
+        terminate_execution(execution)
+        execution.set_error()
+        return "fatal"
+    else:
+        log.error('Fatal error trying to start service {} of execution {}'.format(service.id, execution.id))
+        log.error('BUG, this error should have been caught earlier', exc_info=(type(ex), ex, ex.__traceback__))
+        execution.set_error_message(str(ex))
+        terminate_execution(execution)
+        execution.set_error()
+        return "fatal"
+
+
 def service_list_to_containers(execution: Execution, service_list: List[Service], placement=None) -> str:
-    """Given a subset of services from an execution, tries to start them, return one of 'ok', 'requeue' for temporary failures and 'fatal' for fatal failures."""
+    """
+    Given a subset of services from an execution, tries to start them, return one of 'ok', 'requeue' for temporary failures and 'fatal' for fatal failures.
+
+    Services are started in groups with the same startup order, one group after the other. The services of a group are started in parallel.
+    """
     backend = _get_backend()
 
     ordered_service_list = sorted(service_list, key=lambda x: x.startup_order)
@@ -85,42 +157,42 @@ def service_list_to_containers(execution: Execution, service_list: List[Service]
     for service in execution.services:
         env_subst_dict['dns_name#' + service.name] = service.dns_name
 
-    for service in ordered_service_list:
-        env_subst_dict['dns_name#self'] = service.dns_name
-        if placement is not None:
-            service.assign_backend_host(placement[service.id])
-        service.set_starting()
-        instance = ServiceInstance(execution, service, env_subst_dict)
-        try:
-            backend_id, ip_address, ports = backend.spawn_service(instance)
-        except ZoeStartExecutionRetryException as ex:
-            log.warning('Temporary failure starting service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
-            service.set_error(ex.message)
-            execution.set_error_message(ex.message)
-            terminate_execution(execution)
-            execution.set_scheduled()
-            return "requeue"
-        except ZoeStartExecutionFatalException as ex:
-            log.error('Fatal error trying to start service {} of execution {}: {}'.format(service.id, execution.id, ex.message))
-            service.set_error(ex.message)
-            execution.set_error_message(ex.message)
-            terminate_execution(execution)
-            execution.set_error()
-            return "fatal"
-        except Exception as ex:
-            log.error('Fatal error trying to start service {} of execution {}'.format(service.id, execution.id))
-            log.exception('BUG, this error should have been caught earlier')
-            execution.set_error_message(str(ex))
-            terminate_execution(execution)
-            execution.set_error()
-            return "fatal"
-        else:
-            log.debug('Service {} started'.format(instance.name))
-            service.set_active(backend_id, ip_address, ports)
+    state = execution.sql_manager
+    for startup_order_, group in itertools.groupby(ordered_service_list, key=lambda x: x.startup_order):
+        group = list(group)
+        with state.transaction():
+            for service in group:
+                if placement is not None:
+                    service.assign_backend_host(placement[service.id])
+                service.set_starting()
+        instances = []
+        for service in group:
+            env_subst_dict['dns_name#self'] = service.dns_name
+            instances.append(ServiceInstance(execution, service, env_subst_dict))
+
+        ret = _record_started(execution, group, instances, _spawn_services(backend, instances))
+        if ret != "ok":
+            return ret
 
     return "ok"
 
 
+def _record_started(execution: Execution, services: List[Service], instances: List[ServiceInstance], results) -> str:
+    """Save the outcome of _spawn_services() for a group of services, return 'ok' if all of them started or the result of _start_failed()."""
+    with execution.sql_manager.transaction():  # the services and all their ports are updated with a single commit
+        for service, instance, result in zip(services, instances, results):
+            if result is None:
+                service.set_inactive()  # not started, as if the failure happened before reaching it
+            elif not isinstance(result, Exception):
+                log.debug('Service {} started'.format(instance.name))
+                backend_id, ip_address, ports = result
+                service.set_active(backend_id, ip_address, ports)
+    for service, result in zip(services, results):
+        if isinstance(result, Exception):
+            return _start_failed(execution, service, result)
+    return "ok"
+
+
 def start_all(execution: Execution) -> str:
     """Translate an execution object into containers.
 
@@ -171,8 +243,10 @@ def terminate_service(service: Service) -> None:
 
 def terminate_execution(execution: Execution) -> None:
     """Terminate an execution."""
+    state = execution.sql_manager
     for service in execution.services:  # type: Service
-        terminate_service(service)
+        with state.transaction():  # one commit per service, the state stays consistent with the back-end if the termination is interrupted
+            terminate_service(service)
     execution.set_terminated()
 
 
@@ -211,3 +285,9 @@ def list_available_images(node_name):
     """List the images available on the specified node."""
     backend = _get_backend()
     return backend.list_available_images(node_name)
+
+
+def image_catalog() -> ImageCatalog:
+    """Return the catalog of the images available on the nodes."""
+    backend = _get_backend()
+    return backend.image_catalog()
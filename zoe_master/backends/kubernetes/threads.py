@@ -122,11 +122,12 @@ class KubernetesStateSynchronizer(threading.Thread):
         while not self.stop:
             service_list = self.state.services.select()
             repcon_list = self.kube.replication_controller_list()
-            for service in service_list:
-                assert isinstance(service, Service)
-                if service.backend_status == service.BACKEND_DESTROY_STATUS or service.backend_status == service.BACKEND_DIE_STATUS:
-                    continue
-                self._find_dead_service(repcon_list, service)
+            with self.state.transaction():
+                for service in service_list:
+                    assert isinstance(service, Service)
+                    if service.backend_status == service.BACKEND_DESTROY_STATUS or service.backend_status == service.BACKEND_DIE_STATUS:
+                        continue
+                    self._find_dead_service(repcon_list, service)
 
             time.sleep(CHECK_INTERVAL)
 
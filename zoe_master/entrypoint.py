@@ -24,6 +24,7 @@ import zoe_lib.config as config
 from zoe_lib.state import SQLManager
 import zoe_master.backends.interface
 import zoe_master.scheduler
+from zoe_master.archiver import ExecutionArchiver
 from zoe_master.exceptions import ZoeException
 from zoe_master.gelf_listener import GELFListener
 from zoe_master.master_api import APIManager
@@ -62,7 +63,7 @@ def main(test_conf=None):
         return ret
 
     log.info("Initializing DB manager")
-    state = SQLManager(args)
+    state = SQLManager(args, record_cache=True)
 
     try:
         zoe_master.backends.interface.initialize_backend(state)
@@ -86,6 +87,12 @@ def main(test_conf=None):
     else:
         gelf_listener = None
 
+    if config.get_conf().archive_age > 0:
+        archiver = ExecutionArchiver(state, config.get_conf().archive_age)
+        archiver.start()
+    else:
+        archiver = None
+
     try:
         api_server.loop()
     except KeyboardInterrupt:
@@ -104,4 +111,7 @@ def main(test_conf=None):
         if gelf_listener is not None:
             log.info('Terminating GELF listener thread')
             gelf_listener.quit()
+        if archiver is not None:
+            log.info('Terminating archiver thread')
+            archiver.quit()
     return 0
@@ -0,0 +1,69 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Catalog of the container images available on the nodes."""
+
+import threading
+from typing import FrozenSet, Iterable
+
+_EMPTY = frozenset()
+
+
+class ImageCatalog:
+    """
+    The image names available on each node, and the nodes that have each image.
+
+    It is written by the back-end synchronizer threads, that call update_node() after listing the images of a node, and read by the
+    scheduler and the pre-processing of new executions. Reads do not take the lock: the sets they return are never modified.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._node_images = {}  # node name -> frozenset of image names
+        self._image_nodes = {}  # image name -> frozenset of node names
+
+    def update_node(self, node_name: str, image_names: Iterable[str]):
+        """Set the image names available on a node, only the names that changed since the last update are processed."""
+        image_names = frozenset(image_names)
+        with self._lock:
+            old_names = self._node_images.get(node_name, _EMPTY)
+            if old_names == image_names:
+                return
+            for name in old_names - image_names:
+                nodes = self._image_nodes[name] - {node_name}
+                if len(nodes) == 0:
+                    del self._image_nodes[name]
+                else:
+                    self._image_nodes[name] = nodes
+            for name in image_names - old_names:
+                self._image_nodes[name] = self._image_nodes.get(name, _EMPTY) | {node_name}
+            self._node_images[node_name] = image_names
+
+    def remove_node(self, node_name: str):
+        """Forget the images of a node that is no longer part of the platform."""
+        self.update_node(node_name, _EMPTY)
+        with self._lock:
+            self._node_images.pop(node_name, None)
+
+    def node_images(self, node_name: str) -> FrozenSet[str]:
+        """The image names available on a node."""
+        return self._node_images.get(node_name, _EMPTY)
+
+    def image_nodes(self, image_name: str) -> FrozenSet[str]:
+        """The nodes where an image is available."""
+        return self._image_nodes.get(image_name, _EMPTY)
+
+    def is_available(self, image_name: str) -> bool:
+        """True if the image is available on at least one node."""
+        return image_name in self._image_nodes
@@ -82,10 +82,12 @@ class APIManager:
                 execution = self.state.executions.select(id=exec_id, only_one=True)
                 if execution is not None:
                     zoe_master.preprocessing.execution_delete(execution)
+                    self.state.invalidate('execution', exec_id)
                 self._reply_ok()
             elif message['command'] == 'scheduler_stats':
                 try:
                     data = self.scheduler.stats()
+                    data['state_stats'] = self.state.stats()
                     if self.metrics.current_stats is None:
                         data['platform_stats'] = {}
                     else:
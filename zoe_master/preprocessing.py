@@ -22,52 +22,41 @@ import shutil
 from zoe_lib.state import Execution, SQLManager
 from zoe_lib.config import get_conf
 from zoe_master.scheduler import ZoeBaseScheduler
-from zoe_master.backends.interface import terminate_execution, node_list, list_available_images
+from zoe_master.backends.interface import terminate_execution, image_catalog
 
 log = logging.getLogger(__name__)
 
 
+def _port_rows(service_ids, services):
+    """Build the rows of the ports of the new services, for PortTable.insert_many()."""
+    ports = []
+    for sid, (name_, group_, service_descr, essential_) in zip(service_ids, services):
+        for port_descr in service_descr['ports']:
+            port_internal = str(port_descr['port_number']) + '/' + port_descr['protocol']
+            ports.append((sid, port_internal, port_descr))
+    return ports
+
+
 def _digest_application_description(state: SQLManager, execution: Execution):
     """Read an application description and expand it into services that can be deployed."""
-    nodes = node_list()
-    images = []
-    for node in nodes:
-        images += list_available_images(node)
-
-    images = [name for image in images for name in image['names']]
+    catalog = image_catalog()
     for service_descr in execution.description['services']:
-        if service_descr['image'] not in images:
+        if not catalog.is_available(service_descr['image']):
             execution.set_error()
             execution.set_error_message('image {} is not available'.format(service_descr['image']))
             return False
 
+    services = []
     for service_descr in execution.description['services']:
         essential_count = service_descr['essential_count']
         total_count = service_descr['total_count']
-        elastic_count = total_count - essential_count
-        counter = 0
-        for service_n_ in range(essential_count):
-            name = "{}{}".format(service_descr['name'], counter)
-            sid = state.services.insert(execution.id, name, service_descr['name'], service_descr, True)
-
-            # Ports
-            for port_descr in service_descr['ports']:
-                port_internal = str(port_descr['port_number']) + '/' + port_descr['protocol']
-                state.ports.insert(sid, port_internal, port_descr)
-
-            counter += 1
-
-        for service_n_ in range(elastic_count):
+        for counter in range(total_count):
             name = "{}{}".format(service_descr['name'], counter)
-            sid = state.services.insert(execution.id, name, service_descr['name'], service_descr, False)
-
-            # Ports
-            for port_descr in service_descr['ports']:
-                port_internal = str(port_descr['port_number']) + '/' + port_descr['protocol']
-                state.ports.insert(sid, port_internal, port_descr)
+            services.append((name, service_descr['name'], service_descr, counter < essential_count))
 
-            counter += 1
-        assert counter == total_count
+    with state.transaction():
+        service_ids = state.services.insert_many(execution.id, services)
+        state.ports.insert_many(_port_rows(service_ids, services))
 
     if get_conf().scheduler_policy == 'DYNSIZE':
         execution.set_size(execution.total_reservations.cores.min * execution.total_reservations.memory.min)
@@ -21,11 +21,14 @@ https://arxiv.org/abs/1611.09528
 import logging
 import threading
 import time
+from typing import Iterable, List
 
+from zoe_lib.config import get_conf
 from zoe_lib.state import Execution, SQLManager, Service  # pylint: disable=unused-import
 from zoe_master.exceptions import ZoeException
 
 from zoe_master.backends.interface import terminate_execution, terminate_service, start_elastic, start_essential, update_service_resource_limits
+from zoe_master.scheduler.execution_queue import ExecutionQueue
 from zoe_master.scheduler.simulated_platform import SimulatedPlatform
 from zoe_master.exceptions import UnsupportedSchedulerPolicyError
 from zoe_master.stats import NodeStats  # pylint: disable=unused-import
@@ -34,6 +37,7 @@ from zoe_master.metrics.base import StatsManager  # pylint: disable=unused-impor
 log = logging.getLogger(__name__)
 
 SELF_TRIGGER_TIMEOUT = 60  # the scheduler will trigger itself periodically in case platform resources have changed outside its control
+DYNSIZE_PERSIST_INTERVAL = 60  # seconds between the writes of the execution sizes aged in memory by the DYNSIZE policy
 
 
 def catch_exceptions_and_retry(func):
@@ -51,10 +55,38 @@ def catch_exceptions_and_retry(func):
     return wrapper
 
 
+def simulate_placement(cluster_status_snapshot: SimulatedPlatform, jobs_to_attempt_scheduling: Iterable[Execution]) -> List[Execution]:
+    """
+    Find the executions, in queue order, that can be started: each one must make use of some of the free resources of the simulated platform.
+
+    The placement is built incrementally, the services of each job are added to the ones of the jobs already selected. Elastic services are
+    moved only when the essential services of a new job need room on their nodes. The changes made for a job that is not selected are rolled
+    back, the simulation is left with the placement of the selected jobs only.
+    """
+    jobs_to_launch = []
+    free_resources = cluster_status_snapshot.aggregated_free_memory()
+
+    # Try to find a placement solution using a snapshot of the platform status
+    for job in jobs_to_attempt_scheduling:  # type: Execution
+        cluster_status_snapshot.checkpoint()
+        if not job.is_running and not cluster_status_snapshot.allocate_essential(job):
+            break
+
+        cluster_status_snapshot.allocate_elastic(job)
+
+        current_free_resources = cluster_status_snapshot.aggregated_free_memory()
+        if current_free_resources >= free_resources:
+            cluster_status_snapshot.rollback()
+            break
+        jobs_to_launch.append(job)
+        free_resources = current_free_resources
+    return jobs_to_launch
+
+
 class ExecutionProgress:
     """Additional data for tracking execution sizes while in the queue."""
     def __init__(self):
-        self.last_time_scheduled = 0
+        self.last_time_scheduled = time.time()  # the size of the execution is the one it had at this time, see ZoeElasticScheduler._aged_size()
         self.progress_sequence = []
 
 
@@ -66,21 +98,25 @@ class ZoeElasticScheduler:
         self.metrics = metrics
         self.trigger_semaphore = threading.Semaphore(0)
         self.policy = policy
-        self.queue = []
-        self.queue_running = []
+        self.aging_rate = get_conf().dynsize_aging_rate
+        self.aging_epoch = time.time()
+        self.sizes_persisted = time.time()
+        self.queue = ExecutionQueue(policy, self._aging_priority if policy == 'DYNSIZE' else None)
+        self.queue_running = ExecutionQueue()
         self.additional_exec_state = {}
+        self.snapshot = []  # executions whose services have been loaded for the current scheduling round
         self.async_threads = []
         self.loop_quit = False
         self.loop_th = threading.Thread(target=self.loop_start_th, name='scheduler')
         self.core_limit_recalc_trigger = threading.Event()
         self.core_limit_th = threading.Thread(target=self._adjust_core_limits, name='adjust_core_limits')
         self.state = state
-        for execution in self.state.executions.select(status='running'):
+        for execution in self.state.executions.select(status='running', prefetch=('services',)):
             if execution.all_services_running:
-                self.queue_running.append(execution)
+                self.queue_running.push(execution)
             else:
-                self.queue.append(execution)
                 self.additional_exec_state[execution.id] = ExecutionProgress()
+                self.queue.push(execution)
         self.loop_th.start()
         self.core_limit_th.start()
 
@@ -96,7 +132,7 @@ class ZoeElasticScheduler:
         """
         exec_data = ExecutionProgress()
         self.additional_exec_state[execution.id] = exec_data
-        self.queue.append(execution)
+        self.queue.push(execution)
         self.trigger()
 
     def terminate(self, execution: Execution) -> None:
@@ -107,23 +143,22 @@ class ZoeElasticScheduler:
         """
         def async_termination(e):
             """Actual termination runs in a thread."""
-            with e.termination_lock:
-                try:
-                    terminate_execution(e)
-                except ZoeException as ex:
-                    log.error('Error in termination thread: {}'.format(ex))
-                    return
-                self.trigger()
-            log.debug('Execution {} terminated successfully'.format(e.id))
-
-        try:
-            self.queue.remove(execution)
-        except ValueError:
             try:
-                self.queue_running.remove(execution)
-            except ValueError:
-                log.error('Cannot terminate execution {}, it is not in any queue'.format(execution.id))
-                return
+                with e.termination_lock:
+                    try:
+                        terminate_execution(e)
+                    except ZoeException as ex:
+                        log.error('Error in termination thread: {}'.format(ex))
+                        return
+                    self.trigger()
+                self.state.invalidate('execution', e.id)  # the execution will not change anymore, free the memory used by the record cache
+                log.debug('Execution {} terminated successfully'.format(e.id))
+            finally:
+                self.state.release()
+
+        if not self.queue.remove(execution) and not self.queue_running.remove(execution):
+            log.error('Cannot terminate execution {}, it is not in any queue'.format(execution.id))
+            return
 
         try:
             del self.additional_exec_state[execution.id]
@@ -153,35 +188,67 @@ class ZoeElasticScheduler:
         elif self.policy == "SIZE":
             return
         elif self.policy == "DYNSIZE":
+            now = time.time()
+            expired = []
             for execution in self.queue:  # type: Execution
-                exec_data = self.additional_exec_state[execution.id]
-                if exec_data.last_time_scheduled == 0:
-                    continue
-                elif execution.size <= 0:
-                    execution.set_size(execution.total_reservations.cores.min * execution.total_reservations.memory.min)
-                    continue
-                new_size = execution.size - (time.time() - exec_data.last_time_scheduled) * (256 * 1024 ** 2)  # to be tuned
-                execution.set_size(new_size)
-
-    def _pop_all(self):
-        out_list = []
+                if self._aged_size(execution, now) > 0:
+                    break  # the queue is ordered by aged size
+                expired.append(execution)
+            for execution in expired:  # start again from the initial size
+                execution.size = execution.total_reservations.cores.min * execution.total_reservations.memory.min
+                self.additional_exec_state[execution.id].last_time_scheduled = now
+                self.queue.update(execution)
+            if now - self.sizes_persisted >= DYNSIZE_PERSIST_INTERVAL:
+                self._persist_sizes(now)
+
+    def _aged_size(self, execution: Execution, now) -> float:
+        """The size of a queued execution, decreased by the aging rate for the time spent in the queue."""
+        return execution.size - (now - self.additional_exec_state[execution.id].last_time_scheduled) * self.aging_rate
+
+    def _aging_priority(self, execution: Execution) -> float:
+        """The DYNSIZE queue order: all the queued executions age at the same rate, their aged sizes have the same order at any time."""
+        return execution.size + (self.additional_exec_state[execution.id].last_time_scheduled - self.aging_epoch) * self.aging_rate
+
+    def _persist_sizes(self, now):
+        """Write the aged sizes of the queued executions with a batched update, in between they are aged only in memory."""
+        sizes = {}
+        for execution in self.queue.unordered():  # type: Execution
+            execution.size = self._aged_size(execution, now)
+            self.additional_exec_state[execution.id].last_time_scheduled = now  # does not change the queue order
+            sizes[execution.id] = execution.size
+        self.state.executions.update_column('size', sizes)
+        self.sizes_persisted = now
+
+    def _load_snapshot(self):
+        """Load the services of all the queued and running executions, and their ports, with one query each. They are used until the end of the scheduling round."""
+        self.snapshot = self.queue.unordered() + self.queue_running.unordered()
+        self.state.executions.prefetch(self.snapshot, ('services', 'ports'))
+
+    def _release_snapshot(self):
+        """Drop the lists loaded by _load_snapshot(), the next round will load them again."""
+        for execution in self.snapshot:
+            for service in execution.prefetched_services or []:
+                service.prefetched_ports = None
+            execution.prefetched_services = None
+        self.snapshot = []
+
+    def _pop_all(self, popped: List[Execution]):
+        """Generate the queued executions in priority order, locking them. Only the executions actually examined are locked and added to popped."""
         for execution in self.queue:  # type: Execution
             ret = execution.termination_lock.acquire(blocking=False)
             if ret and execution.status != Execution.TERMINATED_STATUS:
-                out_list.append(execution)
+                popped.append(execution)
+                yield execution
             else:
                 log.debug('While popping, throwing away execution {} that has the termination lock held'.format(execution.id))
 
-        return out_list
-
     def _requeue(self, execution: Execution):
         execution.termination_lock.release()
-        self.additional_exec_state[execution.id].last_time_scheduled = time.time()
         if execution not in self.queue:  # sanity check: the execution should be in the queue
             log.warning("Execution {} wants to be re-queued, but it is not in the queue".format(execution.id))
 
     @catch_exceptions_and_retry
-    def loop_start_th(self):  # pylint: disable=too-many-locals
+    def loop_start_th(self):
         """The Scheduler thread loop."""
         auto_trigger = SELF_TRIGGER_TIMEOUT
         while True:
@@ -196,75 +263,57 @@ class ZoeElasticScheduler:
             if self.loop_quit:
                 break
 
-            self._check_dead_services()
-            if len(self.queue) == 0:
-                log.debug("Scheduler loop has been triggered, but the queue is empty")
-                self.core_limit_recalc_trigger.set()
-                continue
-            log.debug("Scheduler loop has been triggered")
+            self._load_snapshot()
+            try:
+                self._scheduling_round()
+            finally:
+                self._release_snapshot()
+
+    def _scheduling_round(self):  # pylint: disable=too-many-locals
+        """Check the running executions and start as many queued ones as possible."""
+        self._check_dead_services()
+        if len(self.queue) == 0:
+            log.debug("Scheduler loop has been triggered, but the queue is empty")
+            self.core_limit_recalc_trigger.set()
+            return
+        log.debug("Scheduler loop has been triggered")
 
-            while True:  # Inner loop will run until no new executions can be started or the queue is empty
+        while True:  # Inner loop will run until no new executions can be started or the queue is empty
+            with self.state.trace('scheduler loop'):
                 self._refresh_execution_sizes()
 
-                if self.policy == "SIZE" or self.policy == "DYNSIZE":
-                    self.queue.sort(key=lambda execution: execution.size)
-
-                jobs_to_attempt_scheduling = self._pop_all()
-                log.debug('Scheduler inner loop, jobs to attempt scheduling:')
-                for job in jobs_to_attempt_scheduling:
-                    log.debug("-> {} ({})".format(job, job.size))
-
                 try:
                     platform_state = self.metrics.current_stats
                 except ZoeException:
                     log.error('Cannot retrieve platform state, cannot schedule')
-                    for job in jobs_to_attempt_scheduling:
-                        self._requeue(job)
                     break
 
                 cluster_status_snapshot = SimulatedPlatform(platform_state)
 
-                jobs_to_launch = []
-                free_resources = cluster_status_snapshot.aggregated_free_memory()
-
-                # Try to find a placement solution using a snapshot of the platform status
-                for job in jobs_to_attempt_scheduling:  # type: Execution
-                    jobs_to_launch_copy = jobs_to_launch.copy()
-
-                    # remove all elastic services from the previous simulation loop
-                    for job_aux in jobs_to_launch:  # type: Execution
-                        cluster_status_snapshot.deallocate_elastic(job_aux)
-
-                    job_can_start = False
-                    if not job.is_running:
-                        job_can_start = cluster_status_snapshot.allocate_essential(job)
-
-                    if job_can_start or job.is_running:
-                        jobs_to_launch.append(job)
-
-                    # Try to put back the elastic services
-                    for job_aux in jobs_to_launch:
-                        cluster_status_snapshot.allocate_elastic(job_aux)
-
-                    current_free_resources = cluster_status_snapshot.aggregated_free_memory()
-                    if current_free_resources >= free_resources:
-                        jobs_to_launch = jobs_to_launch_copy
-                        break
-                    free_resources = current_free_resources
+                jobs_to_attempt_scheduling = []  # the executions examined by the simulation, in queue order
+                jobs_to_launch = simulate_placement(cluster_status_snapshot, self._pop_all(jobs_to_attempt_scheduling))
+                log.debug('Scheduler inner loop, jobs examined:')
+                for job in jobs_to_attempt_scheduling:
+                    log.debug("-> {} ({})".format(job, job.size))
+                with self.state.transaction():  # the status of the elastic services is written once, with the outcome of the simulation
+                    cluster_status_snapshot.save_elastic_marks()
 
                 placements = cluster_status_snapshot.get_service_allocation()
                 log.debug('Allocation after simulation: {}'.format(placements))
 
                 # We port the results of the simulation into the real cluster
+                dequeued = set()  # IDs of the executions that left the queue or that have already been requeued
                 for job in jobs_to_launch:  # type: Execution
                     if not job.essential_services_running:
                         ret = start_essential(job, placements)
                         if ret == "fatal":
-                            jobs_to_attempt_scheduling.remove(job)
-                            self.queue.remove(job)
+                            dequeued.add(job.id)
+                            if not self.queue.remove(job):
+                                log.debug('Execution {} has been terminated while starting'.format(job.id))
                             job.termination_lock.release()
                             continue  # trow away the execution
                         elif ret == "requeue":
+                            dequeued.add(job.id)
                             self._requeue(job)
                             continue
                         elif ret == "ok":
@@ -277,14 +326,15 @@ class ZoeElasticScheduler:
                     if job.all_services_active:
                         log.debug('execution {}: all services are active'.format(job.id))
                         job.termination_lock.release()
-                        jobs_to_attempt_scheduling.remove(job)
-                        self.queue.remove(job)
-                        self.queue_running.append(job)
+                        dequeued.add(job.id)
+                        if self.queue.remove(job):  # terminate() may have removed it while it was starting
+                            self.queue_running.push(job)
 
                 self.core_limit_recalc_trigger.set()
 
                 for job in jobs_to_attempt_scheduling:
-                    self._requeue(job)
+                    if job.id not in dequeued:
+                        self._requeue(job)
 
                 if len(self.queue) == 0:
                     log.debug('empty queue, exiting inner loop')
@@ -300,19 +350,16 @@ class ZoeElasticScheduler:
         self.core_limit_recalc_trigger.set()
         self.loop_th.join()
         self.core_limit_th.join()
+        if self.policy == 'DYNSIZE':
+            self._persist_sizes(time.time())
 
     def stats(self):
         """Scheduler statistics."""
-        if self.policy == "SIZE":
-            queue = sorted(self.queue, key=lambda execution: execution.size)
-        else:
-            queue = self.queue
-
         return {
             'queue_length': len(self.queue),
             'running_length': len(self.queue_running),
             'termination_threads_count': len(self.async_threads),
-            'queue': [s.id for s in queue],
+            'queue': [s.id for s in self.queue],
             'running_queue': [s.id for s in self.queue_running]
         }
 
@@ -363,5 +410,6 @@ class ZoeElasticScheduler:
                     terminate_service(service)
                     service.restarted()
                     self.queue_running.remove(execution)
-                    self.queue.append(execution)
+                    self.additional_exec_state[execution.id] = ExecutionProgress()
+                    self.queue.push(execution)
                     break
@@ -0,0 +1,156 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Priority queue of executions, ordered according to the scheduler policy."""
+
+import heapq
+import itertools
+import threading
+from typing import Iterator, List
+
+from zoe_lib.state import Execution
+
+
+class ExecutionQueue:
+    """
+    An indexed binary heap of executions.
+
+    With the FIFO policy executions are ordered by arrival, with SIZE and DYNSIZE by size and then by arrival. The size is given by the size
+    function, by default the size attribute of the execution, and must be updated with update() when it changes. The position of each execution
+    in the heap is indexed by ID, so that push(), remove() and update() take O(log n). Iteration returns the executions in priority order,
+    lazily: consuming the first k executions takes O(k log k). Iterations do not copy the heap: the first change made while an iteration is
+    in progress moves the queue to a copy, in O(n), and the iteration continues on the old list. It can be used from several threads.
+    """
+    def __init__(self, policy='FIFO', size=None):
+        self.policy = policy
+        self._size = size if size is not None else lambda execution: execution.size
+        self._heap = []  # list of (priority, execution), never changed while it is being iterated, see _detach()
+        self._iterators = 0  # iterations in progress over _heap
+        self._positions = {}  # execution ID -> index in _heap
+        self._counter = itertools.count()
+        self._arrival = {}  # execution ID -> arrival sequence number, breaks ties between executions with the same size
+        self._lock = threading.Lock()
+
+    def _priority(self, execution: Execution):
+        if self.policy == 'FIFO':
+            return (self._arrival[execution.id],)
+        return self._size(execution), self._arrival[execution.id]
+
+    def push(self, execution: Execution):
+        """Add an execution at the position given by its priority, an execution already in the queue is moved to the end of the arrival order."""
+        with self._lock:
+            self._detach()
+            if execution.id in self._positions:
+                self._remove(execution.id)
+            self._arrival[execution.id] = next(self._counter)
+            self._heap.append((self._priority(execution), execution))
+            self._positions[execution.id] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+
+    def remove(self, execution: Execution) -> bool:
+        """Remove an execution, returns False if it is not in the queue."""
+        with self._lock:
+            if execution.id not in self._positions:
+                return False
+            self._detach()
+            self._remove(execution.id)
+            return True
+
+    def update(self, execution: Execution):
+        """Move an execution to its new position after its size has changed."""
+        with self._lock:
+            index = self._positions.get(execution.id)
+            if index is None:
+                return
+            self._detach()
+            self._heap[index] = (self._priority(execution), execution)
+            self._sift_up(index)
+            self._sift_down(self._positions[execution.id])
+
+    def unordered(self) -> List[Execution]:
+        """Return all the executions, in no particular order."""
+        with self._lock:
+            return [entry[1] for entry in self._heap]
+
+    def __iter__(self) -> Iterator[Execution]:
+        """Iterate over the executions in priority order, the queue can be changed during the iteration without affecting it."""
+        with self._lock:
+            heap = self._heap
+            self._iterators += 1
+        try:
+            if len(heap) == 0:
+                return
+            frontier = [(heap[0][0], 0)]  # the smallest entries not returned yet, their children in heap come after them
+            while len(frontier) > 0:
+                priority_, index = heapq.heappop(frontier)
+                yield heap[index][1]
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child][0], child))
+        finally:
+            with self._lock:
+                if self._heap is heap:
+                    self._iterators -= 1
+
+    def _detach(self):
+        """Called before changing the heap: the iterations in progress keep the current list and the queue continues on a copy."""
+        if self._iterators > 0:
+            self._heap = list(self._heap)
+            self._iterators = 0
+
+    def __contains__(self, execution: Execution) -> bool:
+        return execution.id in self._positions
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _remove(self, execution_id):
+        index = self._positions.pop(execution_id)
+        del self._arrival[execution_id]
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._positions[last[1].id] = index
+            self._sift_up(index)
+            self._sift_down(self._positions[last[1].id])
+
+    def _sift_up(self, index):
+        entry = self._heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if self._heap[parent][0] <= entry[0]:
+                break
+            self._heap[index] = self._heap[parent]
+            self._positions[self._heap[index][1].id] = index
+            index = parent
+        self._heap[index] = entry
+        self._positions[entry[1].id] = index
+
+    def _sift_down(self, index):
+        entry = self._heap[index]
+        size = len(self._heap)
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and self._heap[child + 1][0] < self._heap[child][0]:
+                child += 1
+            if entry[0] <= self._heap[child][0]:
+                break
+            self._heap[index] = self._heap[child]
+            self._positions[self._heap[index][1].id] = index
+            index = child
+        self._heap[index] = entry
+        self._positions[entry[1].id] = index
@@ -1,13 +1,14 @@
 """Classes to hold the system state and simulated container/service placements"""
 
+import bisect
 import logging
 import random
-from typing import List
+from typing import FrozenSet, List, Optional
 
 from zoe_lib.state import Execution, Service
 from zoe_lib.config import get_conf
 from zoe_master.stats import ClusterStats, NodeStats
-from zoe_master.backends.interface import list_available_images
+from zoe_master.backends.interface import image_catalog
 
 
 log = logging.getLogger(__name__)
@@ -15,7 +16,7 @@ log = logging.getLogger(__name__)
 
 class SimulatedNode:
     """A simulated node where containers can be run"""
-    def __init__(self, real_node: NodeStats):
+    def __init__(self, real_node: NodeStats, images: FrozenSet[str]):
         self.real_reservations = {
             "memory": real_node.memory_reserved,
             "cores": real_node.cores_reserved
@@ -25,17 +26,32 @@ class SimulatedNode:
             "cores": real_node.cores_total - real_node.cores_reserved
         }
         self.real_active_containers = real_node.container_count
-        self.services = []
+        self.services = {}  # service ID -> service
+        self.simulated_reservations = {  # kept up to date by service_add() and service_remove()
+            "memory": 0,
+            "cores": 0
+        }
+        self.elastic_reservations = {  # the part of simulated_reservations used by elastic services
+            "memory": 0,
+            "cores": 0
+        }
+        self.elastic_count = 0
         self.name = real_node.name
         self.labels = real_node.labels
-        self.images = list_available_images(self.name)
+        self._label_set = set(self.labels)
+        self.images = images  # names of the images available on this node
         log.debug('Node {}: m {:.2f}GB | c {} | l {} | ncont {}'.format(self.name, self.node_free_memory() / (1024 ** 3), self.node_free_cores(), list(self.labels), self.container_count))
 
-    def service_fits(self, service: Service) -> bool:
-        """Checks whether a service can fit in this node"""
-        ret = set(service.labels).issubset(self.labels)
-        ret = ret and service.resource_reservation.memory.min < self.node_free_memory()
-        ret = ret and service.resource_reservation.cores.min <= self.node_free_cores()
+    def service_fits(self, service: Service, ignore_elastic=False) -> bool:
+        """Checks whether a service can fit in this node, if ignore_elastic is True the resources used by elastic services are considered free"""
+        free_memory = self.node_free_memory()
+        free_cores = self.node_free_cores()
+        if ignore_elastic:
+            free_memory += self.elastic_reservations['memory']
+            free_cores += self.elastic_reservations['cores']
+        ret = self._label_set.issuperset(service.labels)
+        ret = ret and service.resource_reservation.memory.min < free_memory
+        ret = ret and service.resource_reservation.cores.min <= free_cores
         ret = ret and self._image_is_available(service.image_name)
         return ret
 
@@ -45,7 +61,7 @@ class SimulatedNode:
             return 'needs {} bytes of memory'.format(self.node_free_memory() - service.resource_reservation.memory.min)
         elif service.resource_reservation.cores.min > self.node_free_cores():
             return 'needs {} more cores'.format(self.node_free_cores() - service.resource_reservation.cores.min)
-        elif not set(service.labels).issubset(self.labels):
+        elif not self._label_set.issuperset(service.labels):
             return 'service required labels {} to be defined on the node'.format(service.labels)
         elif not self._image_is_available(service.image_name):
             return 'image {} is not available on this node'.format(service.image_name)
@@ -53,49 +69,79 @@ class SimulatedNode:
             return 'unknown reason'
 
     def _image_is_available(self, image_name) -> bool:
-        for image in self.images:
-            if image_name in image['names']:
-                return True
-        return False
+        return image_name in self.images
 
     def service_add(self, service):
         """Add a service in this node."""
+        if service.id in self.services:
+            return True
         if self.service_fits(service):
-            self.services.append(service)
+            self.services[service.id] = service
+            self.simulated_reservations['memory'] += service.resource_reservation.memory.min
+            self.simulated_reservations['cores'] += service.resource_reservation.cores.min
+            if not service.essential:
+                self.elastic_reservations['memory'] += service.resource_reservation.memory.min
+                self.elastic_reservations['cores'] += service.resource_reservation.cores.min
+                self.elastic_count += 1
             return True
         else:
             return False
 
     def service_remove(self, service):
-        """Add a service in this node."""
-        try:
-            self.services.remove(service)
-        except ValueError:
+        """Remove a service from this node."""
+        if self.services.pop(service.id, None) is None:
             return False
+        if len(self.services) == 0:  # do not let rounding errors on fractional cores accumulate
+            self.simulated_reservations['memory'] = 0
+            self.simulated_reservations['cores'] = 0
         else:
-            return True
+            self.simulated_reservations['memory'] -= service.resource_reservation.memory.min
+            self.simulated_reservations['cores'] -= service.resource_reservation.cores.min
+        if not service.essential:
+            self.elastic_count -= 1
+            if self.elastic_count == 0:
+                self.elastic_reservations['memory'] = 0
+                self.elastic_reservations['cores'] = 0
+            else:
+                self.elastic_reservations['memory'] -= service.resource_reservation.memory.min
+                self.elastic_reservations['cores'] -= service.resource_reservation.cores.min
+        return True
+
+    def elastic_services(self) -> List[Service]:
+        """Return the elastic services allocated on this node."""
+        return [service for service in self.services.values() if not service.essential]
+
+    def elastic_slots(self, demand: 'ElasticDemand') -> int:
+        """Return how many of the elastic services of the demand surely fit on this node, whatever the order they are allocated in."""
+        if not self._label_set.issuperset(demand.labels) or not demand.images.issubset(self.images):
+            return 0
+        free_memory = self.real_free_resources['memory'] - self.simulated_reservations['memory'] + self.elastic_reservations['memory']
+        free_cores = self.real_free_resources['cores'] - self.simulated_reservations['cores'] + self.elastic_reservations['cores']
+        slots = -(-free_memory // demand.memory) - 1  # services with the largest reservation, the free memory must stay above zero
+        if demand.cores > 0:
+            slots = min(slots, free_cores // demand.cores)
+        return max(0, int(slots))
 
     @property
     def container_count(self):
         """Return the number of containers on this node"""
         return self.real_active_containers + len(self.services)
 
+    @property
+    def essential_container_count(self):
+        """Return the number of containers on this node, not counting the simulated elastic services"""
+        return self.container_count - self.elastic_count
+
     def node_free_memory(self):
         """Return the amount of free memory for this node"""
-        simulated_reservation = 0
-        for service in self.services:  # type: Service
-            simulated_reservation += service.resource_reservation.memory.min
-        free = self.real_free_resources['memory'] - simulated_reservation
+        free = self.real_free_resources['memory'] - self.simulated_reservations['memory']
         if free < 0:
             log.warning('More memory reserved than there is free on node {}: {}'.format(self.name, free))
         return free
 
     def node_free_cores(self):
         """Return the amount of free cores available in this node."""
-        simulated_reservation = 0
-        for service in self.services:  # type: Service
-            simulated_reservation += service.resource_reservation.cores.min
-        free = self.real_free_resources['cores'] - simulated_reservation
+        free = self.real_free_resources['cores'] - self.simulated_reservations['cores']
         if free < 0:
             log.warning('More cores reserved than there are free on node {}: {}'.format(self.name, free))
         return free
@@ -105,101 +151,345 @@ class SimulatedNode:
         return out
 
 
+class CapacityIndex:
+    """
+    Index of the simulated nodes used to find the node selected by the placement policy without checking all the nodes.
+
+    Nodes are bucketed by label set and, inside each bucket, ordered by the placement policy key. Only the buckets with the labels
+    required by a service are searched, in policy order, stopping at the first node where the service fits. With ignore_elastic the
+    simulated elastic services are not taken into account, neither for the fit nor for the container counts of the policy.
+    """
+    RANDOM_PROBES = 8  # random nodes tried before falling back to a scan with the random policy
+
+    def __init__(self, nodes: List[SimulatedNode], policy, ignore_elastic=False):
+        self.policy = policy
+        self.ignore_elastic = ignore_elastic
+        self._position = {node.name: position for position, node in enumerate(nodes)}  # ties are broken by the node order
+        self._buckets = {}  # label set -> list of (policy key, node), sorted
+        for node in nodes:
+            self._buckets.setdefault(frozenset(node.labels), []).append((self._key(node), node))
+        for bucket in self._buckets.values():
+            bucket.sort(key=lambda entry: entry[0])
+        self._compatible = {}  # service label set -> buckets of the nodes that have all the labels
+
+    def _key(self, node: SimulatedNode):
+        container_count = node.essential_container_count if self.ignore_elastic else node.container_count
+        if self.policy == "waterfill":
+            return len(node.labels), -container_count, self._position[node.name]  # biggest container_count first, lowest label count first
+        elif self.policy == "average":
+            return len(node.labels), container_count, self._position[node.name]  # smallest container_count first, lowest label count first
+        return (self._position[node.name],)
+
+    def _compatible_buckets(self, labels):
+        labels = frozenset(labels)
+        buckets = self._compatible.get(labels)
+        if buckets is None:
+            buckets = self._compatible[labels] = [bucket for label_set, bucket in self._buckets.items() if label_set.issuperset(labels)]
+        return buckets
+
+    def find(self, service: Service) -> Optional[SimulatedNode]:
+        """Return the node selected by the placement policy among the nodes where the service fits, None if it fits nowhere."""
+        buckets = self._compatible_buckets(service.labels)
+        if self.policy == "random":
+            return self._find_random(service, buckets)
+        selected_key = None
+        selected = None
+        for bucket in buckets:
+            for key, node in bucket:
+                if selected is not None and key >= selected_key:
+                    break  # the rest of this bucket comes after the node already selected
+                if node.service_fits(service, self.ignore_elastic):
+                    selected_key = key
+                    selected = node
+                    break
+        return selected
+
+    def _find_random(self, service: Service, buckets):
+        nodes = [node for bucket in buckets for key_, node in bucket]
+        if len(nodes) == 0:
+            return None
+        for probe_ in range(self.RANDOM_PROBES):  # rejection sampling, uniform among the nodes where the service fits
+            node = random.choice(nodes)
+            if node.service_fits(service, self.ignore_elastic):
+                return node
+        candidates = [node for node in nodes if node.service_fits(service, self.ignore_elastic)]
+        if len(candidates) == 0:
+            return None
+        return random.choice(candidates)
+
+    def remove(self, node: SimulatedNode):
+        """Remove a node from the index, before changing its services."""
+        bucket = self._buckets[frozenset(node.labels)]
+        del bucket[bisect.bisect_left(bucket, (self._key(node),))]
+
+    def add(self, node: SimulatedNode):
+        """Add back a node to the index, after changing its services."""
+        bucket = self._buckets[frozenset(node.labels)]
+        key = self._key(node)
+        bucket.insert(bisect.bisect_left(bucket, (key,)), (key, node))
+
+
+class ElasticDemand:
+    """
+    The elastic services allocated on the simulated platform: how many they are, their largest reservations and the labels and images they need.
+
+    If every node can host its elastic_slots() and the slots are as many as the services, all the elastic services fit, in any allocation order.
+    """
+    def __init__(self, count=0, memory=1, cores=0, labels=frozenset(), images=frozenset()):
+        self.count = count
+        self.memory = memory
+        self.cores = cores
+        self.labels = labels
+        self.images = images
+
+    def add(self, services: List[Service]) -> 'ElasticDemand':
+        """Return the demand with the services added."""
+        demand = ElasticDemand(self.count + len(services), self.memory, self.cores, self.labels, self.images)
+        for service in services:
+            demand.memory = max(demand.memory, service.resource_reservation.memory.min)
+            demand.cores = max(demand.cores, service.resource_reservation.cores.min)
+            demand.labels = demand.labels.union(service.labels)
+            demand.images = demand.images.union([service.image_name])
+        return demand
+
+    def same_shape(self, other: 'ElasticDemand') -> bool:
+        """Return True if the slots on the nodes are the same for both demands."""
+        return (self.memory, self.cores, self.labels, self.images) == (other.memory, other.cores, other.labels, other.images)
+
+
 class SimulatedPlatform:
     """A simulated cluster, composed by simulated nodes"""
     def __init__(self, platform_status: ClusterStats):
         self.nodes = {}
+        catalog = image_catalog()
         for node in platform_status.nodes:
             if node.status == 'online':
-                self.nodes[node.name] = SimulatedNode(node)
-
-    def _select_node_policy(self, node_list: List[SimulatedNode]) -> SimulatedNode:
-        if get_conf().placement_policy == "random":
-            selected = random.choice(node_list)
-        elif get_conf().placement_policy == "waterfill":
-            node_list.sort(key=lambda n: (len(n.labels), -n.container_count))  # biggest container_count first, lowest label count first
-            selected = node_list[0]
-        elif get_conf().placement_policy == "average":
-            node_list.sort(key=lambda n: (len(n.labels), n.container_count))  # smallest container_count first, lowest label count first
-            selected = node_list[0]
-        else:
+                self.nodes[node.name] = SimulatedNode(node, catalog.node_images(node.name))
+        self.service_nodes = {}  # service ID -> simulated node the service is allocated on
+        self.elastic_marks = {}  # service ID -> (service, status), elastic services placed or removed by the simulation, see save_elastic_marks()
+        self.elastic_order = {}  # execution ID -> order in which the elastic services of the execution were first allocated
+        self.elastic_executions = []  # executions with elastic services to allocate, in allocation order
+        self.elastic_demand = ElasticDemand()
+        self.elastic_slots = {}  # node name -> elastic slots of the node for the current demand
+        self.elastic_capacity = 0  # sum of elastic_slots
+        self.journal = []  # changes made since the last checkpoint(), undone by rollback()
+        self.free_memory = sum(node.node_free_memory() for node in self.nodes.values())
+        if get_conf().placement_policy not in ("random", "waterfill", "average"):
             log.error('Unknown placement policy: {}'.format(get_conf().placement_policy))
-            selected = node_list[0]
+        self.index = CapacityIndex(list(self.nodes.values()), get_conf().placement_policy)  # elastic services use the free resources
+        self.essential_index = CapacityIndex(list(self.nodes.values()), get_conf().placement_policy, ignore_elastic=True)  # essential ones can preempt elastic ones
+        for node in self.nodes.values():
+            self._update_elastic_slots(node)
 
-        for node in node_list:
-            log.debug(' -> {}: {} {}'.format(node.name, len(node.labels), node.container_count))
-        return selected
+    def _service_add(self, node: SimulatedNode, service: Service):
+        """Allocate a service on a node, keeping the platform counters up to date."""
+        if service.id in self.service_nodes:
+            return True
+        self.index.remove(node)
+        self.essential_index.remove(node)
+        try:
+            if not node.service_add(service):
+                return False
+        finally:
+            self.index.add(node)
+            self.essential_index.add(node)
+        self.service_nodes[service.id] = node
+        self.free_memory -= service.resource_reservation.memory.min
+        if service.essential:
+            self._update_elastic_slots(node)
+        self.journal.append(('add', node, service))
+        return True
+
+    def _service_remove(self, service: Service):
+        """Remove a service from the node it is allocated on, returns False if it is not allocated."""
+        node = self.service_nodes.pop(service.id, None)
+        if node is None:
+            return False
+        self.index.remove(node)
+        self.essential_index.remove(node)
+        try:
+            if not node.service_remove(service):
+                return False
+        finally:
+            self.index.add(node)
+            self.essential_index.add(node)
+        self.free_memory += service.resource_reservation.memory.min
+        if service.essential:
+            self._update_elastic_slots(node)
+        self.journal.append(('remove', node, service))
+        return True
+
+    def _update_elastic_slots(self, node: SimulatedNode):
+        slots = node.elastic_slots(self.elastic_demand)
+        self.elastic_capacity += slots - self.elastic_slots.get(node.name, 0)
+        self.elastic_slots[node.name] = slots
+
+    def _set_elastic_demand(self, demand: ElasticDemand):
+        previous = self.elastic_demand
+        self.elastic_demand = demand
+        if not demand.same_shape(previous):
+            for node in self.nodes.values():
+                self._update_elastic_slots(node)
+
+    def _mark(self, service: Service, status):
+        """Record the status an elastic service will have when the simulation is saved."""
+        self.journal.append(('mark', service.id, self.elastic_marks.get(service.id)))
+        self.elastic_marks[service.id] = (service, status)
+
+    def checkpoint(self):
+        """Accept the changes made to the simulation so far, rollback() undoes only the changes made after this point."""
+        self.journal.clear()
+
+    def rollback(self):
+        """Undo the changes made since the last checkpoint(), the services removed in the meantime go back on the nodes they were on."""
+        self._undo(0)
+
+    def _undo(self, position):
+        """Undo the journal entries after position, the most recent first."""
+        while len(self.journal) > position:
+            change, target, value = self.journal.pop()
+            length = len(self.journal)
+            if change == 'add':
+                self._service_remove(value)
+            elif change == 'remove':
+                self._service_add(target, value)
+            elif change == 'mark':
+                if value is None:
+                    del self.elastic_marks[target]
+                else:
+                    self.elastic_marks[target] = value
+            else:  # order
+                del self.elastic_order[target.id]
+                self.elastic_executions.pop()
+                self._set_elastic_demand(value)
+            del self.journal[length:]  # the undo itself is not recorded
+
+    def _unfit_reasons(self, service: Service) -> str:
+        """Explain why a service does not fit on any node, built only when the placement fails."""
+        reasons = ''
+        for node in self.nodes.values():
+            reasons += 'node {}: {} ## '.format(node.name, node.service_why_unfit(service))
+        return reasons
 
     def allocate_essential(self, execution: Execution) -> bool:
-        """Try to find an allocation for essential services"""
+        """
+        Try to find an allocation for essential services.
+
+        Essential services have priority over the elastic services already allocated: they are placed as if there were no elastic services.
+        On the selected nodes only the elastic services needed to make room are removed, starting from the ones allocated last, and they are
+        moved, in allocation order, to the remaining free resources. If a service does not fit the simulation is left unchanged.
+
+        The elastic services are checked again by allocate_elastic(), which is always called after this method.
+        """
+        position = len(self.journal)
+        preempted = []
         for service in execution.essential_services:
-            candidate_nodes = []
-            reasons = ''
-            for node_id_, node in self.nodes.items():
-                if node.service_fits(service):
-                    candidate_nodes.append(node)
-                else:
-                    reasons += 'node {}: {} ## '.format(node.name, node.service_why_unfit(service))
-            if len(candidate_nodes) == 0:  # this service does not fit anywhere
-                self.deallocate_essential(execution)
-                log.info('Cannot fit essential service {} anywhere, reasons: {}'.format(service.id, reasons))
+            selected_node = self.essential_index.find(service)
+            if selected_node is None:  # this service does not fit anywhere
+                self._undo(position)
+                log.info('Cannot fit essential service {} anywhere, reasons: {}'.format(service.id, self._unfit_reasons(service)))
                 return False
-            log.debug('Node selection for service {} with {} policy'.format(service.id, get_conf().placement_policy))
-            selected_node = self._select_node_policy(candidate_nodes)
-            selected_node.service_add(service)
+            if not selected_node.service_fits(service):
+                preempted += self._make_room(selected_node, service)
+            log.debug('Service {} placed on node {} with {} policy'.format(service.id, selected_node.name, get_conf().placement_policy))
+            self._service_add(selected_node, service)
+        preempted.sort(key=self._elastic_priority)
+        for service in preempted:
+            self._allocate_elastic_service(service)
         return True
 
+    def _elastic_priority(self, service: Service):
+        """Elastic services are allocated in this order, the ones of the executions allocated first come first."""
+        return self.elastic_order[service.execution_id], service.id
+
+    def _make_room(self, node: SimulatedNode, service: Service) -> List[Service]:
+        """Remove from the node the elastic services allocated last until the service fits, return the removed ones."""
+        removed = []
+        for elastic_service in sorted(node.elastic_services(), key=self._elastic_priority, reverse=True):
+            self._service_remove(elastic_service)
+            self._mark(elastic_service, Service.INACTIVE_STATUS)
+            removed.append(elastic_service)
+            if node.service_fits(service):
+                break
+        return removed
+
     def deallocate_essential(self, execution: Execution):
         """Remove all essential services from the simulated cluster"""
         for service in execution.essential_services:
-            for node_id_, node in self.nodes.items():
-                if node.service_remove(service):
-                    break
+            self._service_remove(service)
+
+    def _allocate_elastic_service(self, service: Service) -> bool:
+        selected_node = self.index.find(service)
+        if selected_node is None:  # this service does not fit anywhere
+            log.info('Cannot fit elastic service {} anywhere, reasons: {}'.format(service.id, self._unfit_reasons(service)))
+            return False
+        log.debug('Service {} placed on node {} with {} policy'.format(service.id, selected_node.name, get_conf().placement_policy))
+        self._service_add(selected_node, service)
+        self._mark(service, Service.RUNNABLE_STATUS)
+        return True
+
+    @staticmethod
+    def _elastic_to_allocate(execution: Execution) -> List[Service]:
+        """The elastic services of the execution that need a place, the active ones are already running."""
+        return [service for service in execution.elastic_services if service.status != service.ACTIVE_STATUS or service.backend_status == service.BACKEND_DIE_STATUS]
 
     def allocate_elastic(self, execution: Execution) -> bool:
-        """Try to find an allocation for elastic services"""
-        at_least_one_allocated = False
-        for service in execution.elastic_services:
-            if service.status == service.ACTIVE_STATUS and service.backend_status != service.BACKEND_DIE_STATUS:
-                continue
-            candidate_nodes = []
-            reasons = ''
-            for node_id_, node in self.nodes.items():
-                if node.service_fits(service):
-                    candidate_nodes.append(node)
-                else:
-                    reasons += 'node {}: {} ## '.format(node.name, node.service_why_unfit(service))
-            if len(candidate_nodes) == 0:  # this service does not fit anywhere
-                log.info('Cannot fit elastic service {} anywhere, reasons: {}'.format(service.id, reasons))
-                continue
-            log.debug('Node selection for service {} with {} policy'.format(service.id, get_conf().placement_policy))
-            selected_node = self._select_node_policy(candidate_nodes)
-            selected_node.service_add(service)
-            service.set_runnable()
-            at_least_one_allocated = True
-        return at_least_one_allocated
+        """
+        Try to find an allocation for elastic services.
+
+        The result is the one of a full re-placement, in allocation order, of all the elastic services over the essential ones: the elastic
+        services are added to the current placement only when the elastic slots on the nodes guarantee that all of them fit, as they would
+        with the full re-placement. Otherwise all the elastic services are placed again.
+        """
+        services = self._elastic_to_allocate(execution)
+        if execution.id not in self.elastic_order:
+            self.elastic_order[execution.id] = len(self.elastic_order)
+            self.elastic_executions.append(execution)
+            self.journal.append(('order', execution, self.elastic_demand))
+            self._set_elastic_demand(self.elastic_demand.add(services))
+        if self.elastic_demand.count <= self.elastic_capacity:
+            for service in services:
+                if service.id not in self.service_nodes:
+                    self._allocate_elastic_service(service)
+        else:
+            self._reallocate_elastic()
+        return any(service.id in self.service_nodes for service in services)
+
+    def _reallocate_elastic(self):
+        """Remove all the elastic services and allocate them again, in allocation order."""
+        for execution in self.elastic_executions:
+            self.deallocate_elastic(execution)
+        for execution in self.elastic_executions:
+            for service in self._elastic_to_allocate(execution):
+                self._allocate_elastic_service(service)
 
     def deallocate_elastic(self, execution: Execution):
         """Remove all elastic services from the simulated cluster"""
         for service in execution.elastic_services:
-            for node_id_, node in self.nodes.items():
-                if node.service_remove(service):
-                    service.set_inactive()
-                    break
+            if self._service_remove(service):
+                self._mark(service, Service.INACTIVE_STATUS)
+
+    def save_elastic_marks(self):
+        """Set the elastic services placed by the simulation as runnable and the removed ones as inactive, writing only the status changes."""
+        for service, status in self.elastic_marks.values():
+            if service.status == status:
+                continue
+            if status == Service.RUNNABLE_STATUS:
+                service.set_runnable()
+            else:
+                service.set_inactive()
+        self.elastic_marks.clear()
 
     def aggregated_free_memory(self):
         """Return the amount of free memory across all nodes"""
-        total = 0
-        for node_id_, node in self.nodes.items():
-            total += node.node_free_memory()
-        return total
+        return self.free_memory
 
     def get_service_allocation(self):
         """Return a map of service IDs to nodes where they have been allocated."""
         placements = {}
         for node_id, node in self.nodes.items():
-            for service in node.services:
-                placements[service.id] = node_id
+            for service_id in node.services:
+                placements[service_id] = node_id
         return placements
 
     def __repr__(self):
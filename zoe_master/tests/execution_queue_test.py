@@ -0,0 +1,80 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the scheduler execution queue."""
+
+import datetime
+
+from zoe_lib.state import Execution
+from zoe_master.scheduler.execution_queue import ExecutionQueue
+
+
+def _execution(exec_id, size):
+    return Execution({'id': exec_id, 'name': 'test', 'user_id': 'test', 'description': {}, 'status': Execution.SCHEDULED_STATUS, 'size': size,
+                      'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(), 'time_start': None, 'time_end': None,
+                      'error_message': None}, None)
+
+
+class TestExecutionQueue:
+    """The test class."""
+
+    def test_fifo(self):
+        """Executions are returned in arrival order."""
+        queue = ExecutionQueue('FIFO')
+        for exec_id, size in [(3, 10), (1, 30), (2, 20)]:
+            queue.push(_execution(exec_id, size))
+        assert [e.id for e in queue] == [3, 1, 2]
+
+    def test_size(self):
+        """Executions are ordered by size, then by arrival."""
+        queue = ExecutionQueue('SIZE')
+        executions = [_execution(exec_id, size) for exec_id, size in enumerate([50, 10, 40, 10, 30, 20])]
+        for execution in executions:
+            queue.push(execution)
+        assert [e.id for e in queue] == [1, 3, 5, 4, 2, 0]
+        assert queue.remove(executions[5])
+        assert not queue.remove(executions[5])
+        executions[0].size = 15
+        queue.update(executions[0])
+        assert [e.id for e in queue] == [1, 3, 0, 4, 2]
+        assert len(queue) == 5
+        assert executions[4] in queue and executions[5] not in queue
+
+    def test_change_while_iterating(self):
+        """Removing executions during an iteration does not affect it."""
+        queue = ExecutionQueue('SIZE')
+        executions = [_execution(exec_id, 100 - exec_id) for exec_id in range(100)]
+        for execution in executions:
+            queue.push(execution)
+        seen = []
+        for execution in queue:
+            seen.append(execution.id)
+            queue.remove(execution)
+        assert seen == list(range(99, -1, -1))
+        assert len(queue) == 0
+
+    def test_update_while_iterating(self):
+        """Changes made during an iteration are seen by the next iterations only."""
+        queue = ExecutionQueue('SIZE')
+        executions = [_execution(exec_id, exec_id * 10) for exec_id in range(10)]
+        for execution in executions:
+            queue.push(execution)
+        iteration = iter(queue)
+        assert [next(iteration).id for i_ in range(3)] == [0, 1, 2]
+        executions[9].size = 5
+        queue.update(executions[9])
+        queue.push(_execution(10, 1))
+        assert [e.id for e in iteration] == [3, 4, 5, 6, 7, 8, 9]
+        assert [e.id for e in queue] == [0, 10, 9, 1, 2, 3, 4, 5, 6, 7, 8]
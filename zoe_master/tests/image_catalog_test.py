@@ -0,0 +1,44 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the image catalog."""
+
+from zoe_master.image_catalog import ImageCatalog
+
+
+class TestImageCatalog:
+    """The test class."""
+
+    def test_update(self):
+        """Both the node and the image views follow the incremental updates."""
+        catalog = ImageCatalog()
+        catalog.update_node('node1', ['zapp/a', 'zapp/b'])
+        catalog.update_node('node2', ['zapp/b'])
+        assert catalog.node_images('node1') == {'zapp/a', 'zapp/b'}
+        assert catalog.image_nodes('zapp/b') == {'node1', 'node2'}
+        catalog.update_node('node1', ['zapp/b', 'zapp/c'])
+        assert not catalog.is_available('zapp/a')
+        assert catalog.image_nodes('zapp/c') == {'node1'}
+        assert catalog.image_nodes('zapp/b') == {'node1', 'node2'}
+
+    def test_remove_node(self):
+        """Removing a node forgets the images that were only on that node."""
+        catalog = ImageCatalog()
+        catalog.update_node('node1', ['zapp/a', 'zapp/b'])
+        catalog.update_node('node2', ['zapp/b'])
+        catalog.remove_node('node1')
+        assert catalog.node_images('node1') == frozenset()
+        assert not catalog.is_available('zapp/a')
+        assert catalog.image_nodes('zapp/b') == {'node2'}
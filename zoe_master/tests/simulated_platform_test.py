@@ -0,0 +1,123 @@
+# Copyright (c) 2018, Daniele Venzano
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test module for the placement simulation of the elastic scheduler."""
+
+from argparse import Namespace
+import datetime
+import random
+
+import pytest
+
+from zoe_lib.config import load_configuration
+from zoe_lib.state import Execution, Service
+from zoe_master.stats import ClusterStats, NodeStats
+from zoe_master.image_catalog import ImageCatalog
+from zoe_master.scheduler import simulated_platform
+from zoe_master.scheduler.elastic_scheduler import simulate_placement
+
+GB = 1024 ** 3
+
+
+def _full_replacement(cluster_status_snapshot, jobs_to_attempt_scheduling):
+    """The placement loop that removes and places again all the elastic services for every execution it examines."""
+    jobs_to_launch = []
+    free_resources = cluster_status_snapshot.aggregated_free_memory()
+    for job in jobs_to_attempt_scheduling:
+        jobs_to_launch_copy = jobs_to_launch.copy()
+        for job_aux in jobs_to_launch:
+            cluster_status_snapshot.deallocate_elastic(job_aux)
+        if job.is_running or cluster_status_snapshot.allocate_essential(job):
+            jobs_to_launch.append(job)
+        for job_aux in jobs_to_launch:
+            cluster_status_snapshot.allocate_elastic(job_aux)
+        current_free_resources = cluster_status_snapshot.aggregated_free_memory()
+        if current_free_resources >= free_resources:
+            return jobs_to_launch_copy
+        free_resources = current_free_resources
+    return jobs_to_launch
+
+
+def _platform(rnd):
+    stats = ClusterStats()
+    for i in range(rnd.randint(2, 8)):
+        node = NodeStats('node{}'.format(i))
+        node.status = 'online'
+        node.memory_total = rnd.randint(8, 32) * GB
+        node.cores_total = rnd.choice([2.5, 4, 8, 16])
+        node.labels = set(rnd.sample(['gpu', 'ssd'], rnd.randint(0, 2)))
+        stats.nodes.append(node)
+    return stats
+
+
+def _executions(rnd):
+    executions = []
+    service_id = 0
+    for exec_id in range(rnd.randint(5, 30)):
+        execution = Execution({'id': exec_id, 'name': 'test', 'user_id': 'test', 'description': {}, 'status': Execution.SCHEDULED_STATUS, 'size': 1,
+                               'execution_manager_id': None, 'time_submit': datetime.datetime.utcnow(), 'time_start': None, 'time_end': None,
+                               'error_message': None}, None)
+        execution.prefetched_services = []
+        for i in range(rnd.randint(1, 6)):
+            memory = rnd.randint(1, 6) * GB
+            cores = rnd.choice([0.5, 1, 2, 3])
+            description = {'image': rnd.choice(['test', 'test', 'other']), 'labels': rnd.sample(['gpu', 'ssd'], rnd.choice([0, 0, 0, 1])),
+                           'resources': {'memory': {'min': memory, 'max': memory}, 'cores': {'min': cores, 'max': cores}}}
+            execution.prefetched_services.append(Service({
+                'id': service_id, 'name': 's{}'.format(i), 'status': Service.CREATED_STATUS, 'error_message': None, 'execution_id': exec_id,
+                'description': description, 'service_group': 'test', 'backend_id': None, 'backend_status': Service.BACKEND_UNDEFINED_STATUS,
+                'backend_host': None, 'ip_address': None, 'essential': i == 0 or rnd.random() < 0.3, 'restart_count': 0
+            }, None))
+            service_id += 1
+        executions.append(execution)
+    return executions
+
+
+class TestSimulatePlacement:
+    """The test class."""
+
+    @pytest.fixture(autouse=True, params=['average', 'waterfill'])
+    def placement_policy(self, request, monkeypatch):
+        """Configure the placement policy and an image catalog where node0 has only one of the two images."""
+        load_configuration(Namespace(placement_policy=request.param))
+        catalog = ImageCatalog()
+        for i in range(8):
+            catalog.update_node('node{}'.format(i), ['test'] if i == 0 else ['test', 'other'])
+        monkeypatch.setattr(simulated_platform, 'image_catalog', lambda: catalog)
+
+    def test_same_as_full_replacement(self):
+        """The incremental placement starts the same executions as the full re-placement of the elastic services."""
+        for seed in range(100):
+            stats = _platform(random.Random(seed))
+            expected = _full_replacement(simulated_platform.SimulatedPlatform(stats), _executions(random.Random(seed)))
+            launched = simulate_placement(simulated_platform.SimulatedPlatform(stats), _executions(random.Random(seed)))
+            assert [e.id for e in launched] == [e.id for e in expected], 'seed {}'.format(seed)
+
+    def test_rejected_rolled_back(self):
+        """Only the services of the executions to launch stay in the simulation, the elastic marks follow the final placement."""
+        for seed in range(100):
+            snapshot = simulated_platform.SimulatedPlatform(_platform(random.Random(seed)))
+            executions = _executions(random.Random(seed))
+            launched = simulate_placement(snapshot, executions)
+            allocation = snapshot.get_service_allocation()
+            for execution in executions:
+                for service in execution.essential_services:
+                    assert (service.id in allocation) == (execution in launched), 'seed {}'.format(seed)
+                for service in execution.elastic_services:
+                    if execution not in launched:
+                        assert service.id not in allocation, 'seed {}'.format(seed)
+                    mark = snapshot.elastic_marks.get(service.id, (service, Service.INACTIVE_STATUS))[1]
+                    assert (mark == Service.RUNNABLE_STATUS) == (service.id in allocation), 'seed {}'.format(seed)
+            assert snapshot.aggregated_free_memory() == sum(node.node_free_memory() for node in snapshot.nodes.values())